@@ -0,0 +1,11 @@
+"""The app with fake upstreams installed, loaded by serve.py (see benchmarks/server.py)."""
+import os
+from benchmarks.fakes import install, parse_profiles
+
+install(
+    parse_profiles(os.getenv("BENCH_LATENCY", ""), os.getenv("BENCH_ERRORS", "")),
+    products=int(os.getenv("BENCH_PRODUCTS", "250")),
+    indexing_seconds=float(os.getenv("BENCH_INDEXING_SECONDS", "0")),
+)
+
+from main import app # noqa: E402 -- routers bind the providers install() replaced
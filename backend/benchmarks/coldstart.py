@@ -0,0 +1,103 @@
+"""
+Cold-start time of the production launcher (serve.py) with the fake upstreams.
+
+Starts the server again and again and measures the time from spawning the process to
+its first successful response, next to the phases the app reports on /metrics: loading
+the app (once, in the launcher) and the worker's lifespan (client warm-up included).
+--launchers uvicorn measures uvicorn's own --workers mode, which imports the app in
+every worker, for comparison.
+
+Run from backend/:
+    python -m benchmarks.coldstart
+    python -m benchmarks.coldstart --workers 1,4 --launchers serve,uvicorn --repeats 10
+"""
+import argparse
+import os
+import re
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+import httpx
+from benchmarks.run import prepare_data_dir, report
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STARTUP_GAUGE = re.compile(r'^shopecho_startup_seconds\{phase="(\w+)"\} ([\d.]+)$', re.MULTILINE)
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def launch_command(launcher: str, workers: int, port: int) -> List[str]:
+    if launcher == "serve":
+        return [sys.executable, "serve.py", "--app", "benchmarks.app:app", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)]
+    return [sys.executable, "-m", "uvicorn", "benchmarks.app:app", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)]
+
+def measure(launcher: str, workers: int, timeout: float) -> Dict[str, float]:
+    """Start one server, time its first 200 and read its startup phases, then stop it."""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        launch_command(launcher, workers, port), cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1) as client:
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError(f"{launcher} exited with {process.returncode} before answering")
+                if time.perf_counter() - started > timeout:
+                    raise RuntimeError(f"{launcher} didn't answer within {timeout:.0f}s")
+                try:
+                    if client.get("/").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass # not listening yet
+                time.sleep(0.01)
+            first_response = time.perf_counter() - started
+            phases = {phase: float(seconds) for phase, seconds in STARTUP_GAUGE.findall(client.get("/metrics").text)}
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+    return {"first_response": first_response, **phases}
+
+def milliseconds(samples: List[float], pick=statistics.median) -> str:
+    return f"{pick(samples) * 1000:.0f}" if samples else "-"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--launchers", default="serve", help='comma-separated: "serve" and/or "uvicorn"')
+    parser.add_argument("--workers", default="1,4", help="comma-separated worker counts")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for the first response")
+    args = parser.parse_args(argv)
+
+    launchers = args.launchers.split(",")
+    unknown = [launcher for launcher in launchers if launcher not in ("serve", "uvicorn")]
+    if unknown:
+        parser.error(f"unknown launchers: {unknown}")
+
+    # Servers inherit the environment: a fresh data dir, and quiet logs
+    prepare_data_dir()
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    report(f"{'launcher':<10}{'workers':>8}{'runs':>6}{'first p50 ms':>14}{'first max ms':>14}{'import ms':>11}{'lifespan ms':>13}")
+    for launcher in launchers:
+        for workers in (int(count) for count in args.workers.split(",")):
+            runs = [measure(launcher, workers, args.timeout) for _ in range(args.repeats)]
+            phases = {name: [run[name] for run in runs if name in run] for name in ("first_response", "import", "lifespan")}
+            report(
+                f"{launcher:<10}{workers:>8}{len(runs):>6}"
+                f"{milliseconds(phases['first_response']):>14}{milliseconds(phases['first_response'], max):>14}"
+                f"{milliseconds(phases['import']):>11}{milliseconds(phases['lifespan']):>13}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+In-process stand-ins for Backboard, TwelveLabs and the Shopify Admin GraphQL API.
+
+Each fake answers the calls the services actually make, after a configurable latency,
+optionally streamed in chunks, and fails a configurable fraction of calls with a 503
+(retryable, like a real upstream outage). `install()` swaps them into config before the
+app is imported, so every router and service runs its real code against them.
+"""
+import asyncio
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import AsyncIterator, Dict, Iterator, List
+import httpx
+
+@dataclass
+class FaultProfile:
+    latency: float = 0.1 # seconds before a call answers (or its first chunk)
+    jitter: float = 0.3 # +/- fraction of the latency, uniformly
+    error_rate: float = 0.0 # fraction of calls failing with `error_status`
+    error_status: int = 503
+    chunks: int = 20 # pieces a streamed response is split into
+    chunk_delay: float = 0.005 # seconds between streamed pieces
+    seed: int = None
+    _random: random.Random = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._random = random.Random(self.seed)
+
+    def delay(self) -> float:
+        return max(0.0, self.latency * (1 + self._random.uniform(-self.jitter, self.jitter)))
+
+    def fails(self) -> bool:
+        return self._random.random() < self.error_rate
+
+def parse_profiles(latency: str = "", errors: str = "", seed: int = None) -> Dict[str, FaultProfile]:
+    """"backboard=0.8,shopify=0.05" style overrides on top of DEFAULT_LATENCY."""
+    def pairs(spec):
+        return {key.strip(): float(value) for key, _, value in (item.partition("=") for item in filter(None, spec.split(",")))}
+    latencies, error_rates = {**DEFAULT_LATENCY, **pairs(latency)}, pairs(errors)
+    return {
+        name: FaultProfile(latency=latencies[name], error_rate=error_rates.get(name, 0.0), seed=seed)
+        for name in DEFAULT_LATENCY
+    }
+
+# Roughly the shape of the real services: LLM replies are slow, Shopify pages are quick
+DEFAULT_LATENCY = {"backboard": 0.4, "twelvelabs": 0.3, "shopify": 0.05}
+
+
+class FakeUpstreamError(Exception):
+    """Carries a status code so the outbound scheduler classifies it like an SDK error."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Injected upstream error {status_code}")
+        self.status_code = status_code
+        self.headers = {}
+
+def chunked(text: str, count: int) -> List[str]:
+    size = max(1, -(-len(text) // max(1, count)))
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+MANIFESTO_REPLY = (
+    "# Brand Manifesto\n\n## Voice\nQuiet confidence, built for the outdoors.\n\n"
+    "## Values\nDurability, craft and respect for the wild.\n\n## Audience\nPeople who go further."
+)
+EMAIL_REPLY = "Subject: Built for the long way round\n\nThe mountains saw it first. Our shells are ready when you are."
+PACKED_ID = re.compile(r"^\[(\d+)\]", re.MULTILINE)
+
+def backboard_reply(content: str) -> str:
+    """A plausible answer for each kind of prompt the services send."""
+    if "JSON array" in content:
+        ids = [int(i) for i in PACKED_ID.findall(content)]
+        return json.dumps([{"id": i, "verdict": "Yes" if i % 2 == 0 else "No", "reason": "Fits the brand voice."} for i in ids])
+    if "marketing email" in content:
+        return EMAIL_REPLY
+    if "MANIFESTO.md" in content:
+        return MANIFESTO_REPLY
+    return "Yes. The video's spirit of adventure matches our values."
+
+
+class FakeBackboard:
+    """The BackboardClient calls the services make: create_assistant, create_thread, add_message (and aclose on shutdown)."""
+
+    def __init__(self, profile: FaultProfile):
+        self.profile = profile
+        self._ids = itertools.count(1)
+        self.calls = {"create_assistant": 0, "create_thread": 0, "add_message": 0}
+
+    async def _wait(self, name: str):
+        self.calls[name] += 1
+        await asyncio.sleep(self.profile.delay())
+        if self.profile.fails():
+            raise FakeUpstreamError(self.profile.error_status)
+
+    async def aclose(self):
+        pass
+
+    async def create_assistant(self, name: str, description: str = None, **kwargs):
+        await self._wait("create_assistant")
+        return SimpleNamespace(assistant_id=f"asst_{next(self._ids)}")
+
+    async def create_thread(self, assistant_id: str, **kwargs):
+        await self._wait("create_thread")
+        return SimpleNamespace(thread_id=f"thread_{next(self._ids)}")
+
+    async def add_message(self, thread_id: str = None, content: str = "", stream: bool = False, **kwargs):
+        await self._wait("add_message")
+        reply = backboard_reply(content)
+        if stream:
+            return self._stream(reply)
+        return SimpleNamespace(content=reply, thread_id=thread_id)
+
+    async def _stream(self, reply: str) -> AsyncIterator[Dict]:
+        for piece in chunked(reply, self.profile.chunks):
+            await asyncio.sleep(self.profile.chunk_delay)
+            yield {"type": "content_streaming", "content": piece}
+        yield {"type": "message_complete"}
+
+
+ANALYSIS_REPLY = (
+    "The video follows climbers through snow and wind, an untamed spirit pushing into the wild. "
+    "Gear is shown as part of the landscape, never the hero. The tone is reverent and quiet."
+)
+
+class FakeTwelveLabs:
+    """
+    The synchronous TwelveLabs SDK surface the service uses: assets.create,
+    indexes.list/create, indexes.indexed_assets.create/retrieve and analyze_stream.
+    Indexed assets turn ready `indexing_seconds` after they are created.
+    """
+
+    def __init__(self, profile: FaultProfile, indexing_seconds: float = 0.0):
+        self.profile = profile
+        self.indexing_seconds = indexing_seconds
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._indexes: Dict[str, str] = {}
+        self._ready_at: Dict[str, float] = {}
+        self.assets = SimpleNamespace(create=self._create_asset)
+        self.indexes = SimpleNamespace(
+            list=self._list_indexes,
+            create=self._create_index,
+            indexed_assets=SimpleNamespace(create=self._create_indexed_asset, retrieve=self._retrieve_indexed_asset),
+        )
+
+    def _wait(self):
+        time.sleep(self.profile.delay())
+        if self.profile.fails():
+            raise FakeUpstreamError(self.profile.error_status)
+
+    def _new_id(self, prefix: str) -> str:
+        with self._lock:
+            return f"{prefix}_{next(self._ids)}"
+
+    def _create_asset(self, method: str = "url", url: str = None, **kwargs):
+        self._wait()
+        return SimpleNamespace(id=self._new_id("asset"))
+
+    def _list_indexes(self) -> Iterator:
+        self._wait()
+        return iter([SimpleNamespace(id=index_id, index_name=name) for name, index_id in self._indexes.items()])
+
+    def _create_index(self, index_name: str, models=None, **kwargs):
+        self._wait()
+        self._indexes[index_name] = self._new_id("index")
+        return SimpleNamespace(id=self._indexes[index_name])
+
+    def _create_indexed_asset(self, index_id: str, asset_id: str, **kwargs):
+        self._wait()
+        indexed_asset_id = self._new_id("indexed")
+        self._ready_at[indexed_asset_id] = time.monotonic() + self.indexing_seconds
+        return SimpleNamespace(id=indexed_asset_id)
+
+    def _retrieve_indexed_asset(self, index_id: str, indexed_asset_id: str, **kwargs):
+        self._wait()
+        ready = time.monotonic() >= self._ready_at.get(indexed_asset_id, 0)
+        return SimpleNamespace(id=indexed_asset_id, status="ready" if ready else "indexing")
+
+    def analyze_stream(self, video_id: str, prompt: str, **kwargs) -> Iterator:
+        self._wait()
+        return self._events()
+
+    def _events(self) -> Iterator:
+        yield SimpleNamespace(event_type="stream_start")
+        for piece in chunked(ANALYSIS_REPLY, self.profile.chunks):
+            time.sleep(self.profile.chunk_delay)
+            yield SimpleNamespace(event_type="text_generation", text=piece)
+        yield SimpleNamespace(event_type="stream_end")
+
+
+PRODUCT_WORDS = ("alpine", "trail", "shell", "down", "fleece", "summit", "storm", "merino", "approach", "glacier")
+PRODUCT_TYPES = ("Jacket", "Pack", "Base Layer", "Footwear", "Accessory")
+
+def fake_product(number: int) -> Dict:
+    words = [PRODUCT_WORDS[(number * step) % len(PRODUCT_WORDS)] for step in (1, 3, 7)]
+    return {
+        "id": f"gid://shopify/Product/{number}",
+        "title": " ".join(word.capitalize() for word in words) + f" {number}",
+        "descriptionHtml": f"<p>A {words[0]} {PRODUCT_TYPES[number % len(PRODUCT_TYPES)].lower()} for {words[1]} days in the {words[2]}.</p>",
+        "tags": words[:2],
+        "productType": PRODUCT_TYPES[number % len(PRODUCT_TYPES)],
+        "updatedAt": "2026-01-01T00:00:00Z",
+    }
+
+
+class FakeShopifyTransport(httpx.AsyncBaseTransport):
+    """
+    Answers the Admin GraphQL queries ShopifyClient sends (shop info, product pages, bulk
+    operations and the bulk JSONL download) for a catalog of `products` generated items,
+    with cost-bucket extensions so the client's throttling runs as it would in production.
+    """
+
+    BULK_URL = "https://fake-shopify.local/bulk/products.jsonl"
+
+    def __init__(self, profile: FaultProfile, products: int = 250):
+        self.profile = profile
+        self.catalog = [fake_product(number) for number in range(1, products + 1)]
+        self.requests = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        await asyncio.sleep(self.profile.delay())
+        if request.url == httpx.URL(self.BULK_URL):
+            lines = "".join(json.dumps(product) + "\n" for product in self.catalog)
+            return httpx.Response(200, content=lines.encode("utf-8"))
+        if self.profile.fails():
+            return httpx.Response(self.profile.error_status, json={"errors": "Injected upstream error"})
+
+        body = json.loads(request.content or b"{}")
+        return httpx.Response(200, json={"data": self._answer(body.get("query", ""), body.get("variables") or {}), "extensions": {
+            "cost": {"throttleStatus": {"maximumAvailable": 2000.0, "currentlyAvailable": 1990.0, "restoreRate": 100.0}},
+        }})
+
+    def _answer(self, query: str, variables: Dict) -> Dict:
+        if "bulkOperationRunQuery" in query:
+            return {"bulkOperationRunQuery": {"bulkOperation": {"id": "gid://shopify/BulkOperation/1", "status": "CREATED"}, "userErrors": []}}
+        if "BulkStatus" in query:
+            return {"node": {"id": variables.get("id"), "status": "COMPLETED", "objectCount": len(self.catalog), "url": self.BULK_URL}}
+        if "productsCount" in query:
+            return {"shop": {"name": "Benchmark Outfitters", "description": "Gear for the long way round"}, "productsCount": {"count": len(self.catalog)}}
+
+        start = int(variables.get("after") or 0)
+        page = self.catalog[start:start + int(variables.get("first") or 50)]
+        end = start + len(page)
+        return {"products": {
+            "edges": [{"node": product} for product in page],
+            "pageInfo": {"hasNextPage": end < len(self.catalog), "endCursor": str(end)},
+        }}
+
+
+def install(profiles: Dict[str, FaultProfile], products: int = 250, indexing_seconds: float = 0.0) -> Dict:
+    """
+    Point config's upstream clients at the fakes. Call before importing main: routers bind
+    these providers at import time. Returns the fakes so callers can read their counters.
+    """
+    from functools import lru_cache
+    import config
+    from services.shopify import ShopifyClient
+    backboard = FakeBackboard(profiles["backboard"])
+    twelvelabs = FakeTwelveLabs(profiles["twelvelabs"], indexing_seconds=indexing_seconds)
+    shopify = FakeShopifyTransport(profiles["shopify"], products=products)
+
+    config.get_backboard_client = lru_cache()(lambda: backboard)
+    config.get_twelvelabs_client = lru_cache()(lambda: twelvelabs)
+
+    @lru_cache()
+    def get_shopify_client():
+        settings = config.get_config()
+        return ShopifyClient(
+            httpx.AsyncClient(transport=shopify),
+            page_size=settings["shopify_page_size"],
+            bulk_threshold=settings["shopify_bulk_threshold"],
+        )
+    config.get_shopify_client = get_shopify_client
+    return {"backboard": backboard, "twelvelabs": twelvelabs, "shopify": shopify}
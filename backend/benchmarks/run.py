@@ -0,0 +1,289 @@
+"""
+Load driver for the backend against in-process fakes of every upstream service.
+
+Runs each scenario (one endpoint per router) at each concurrency level, reports
+throughput, p50/p95/p99 and max latency and the error count, and saves the results
+as JSON under benchmarks/results/ named by time and git commit. Pass --compare with an
+earlier results file (or "latest") to see the change per scenario and level.
+
+By default the app runs in this process on a fresh data directory with the fakes from
+benchmarks/fakes.py; --base-url drives a server started with `python -m benchmarks.server`
+(e.g. with several workers) instead.
+
+Run from backend/:
+    python -m benchmarks.run
+    python -m benchmarks.run --scenarios compare,email --concurrency 1,8,32 --requests 200
+    python -m benchmarks.run --latency backboard=1.0 --errors backboard=0.05 --compare latest
+"""
+import argparse
+import asyncio
+import contextlib
+import glob
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+def report(line: str):
+    print(line, file=sys.__stdout__, flush=True)
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+BENCH_VIDEO = "bench.mp4"
+
+def summary_text(tag: str) -> str:
+    # Unique per request so caches and single-flight don't hide the upstream calls
+    return (
+        "The video highlights technical shells on climbers in high winds, gear as part of the landscape, "
+        f"an untamed spirit and a quiet, reverent tone. Take {tag}."
+    )
+
+@dataclass
+class Scenario:
+    name: str
+    request: Callable[[int, str], Tuple[str, str, Dict]] # (request number, run id) -> (method, path, httpx kwargs)
+
+SCENARIOS = {
+    scenario.name: scenario for scenario in (
+        Scenario("analyze", lambda i, run: ("POST", "/api/twelvelabs/analyze", {"json": {"url": f"https://videos.bench/{run}/{i}.mp4"}})),
+        Scenario("compare", lambda i, run: ("POST", "/api/compare/compare", {"json": {"summary": summary_text(f"{run}-{i}")}})),
+        Scenario("compare_batch", lambda i, run: ("POST", "/api/compare/compare/batch", {
+            "json": {"summaries": [summary_text(f"{run}-{i}-{j}") for j in range(10)]},
+        })),
+        Scenario("email", lambda i, run: ("POST", "/api/campaign/email", {})),
+        Scenario("manifesto", lambda i, run: ("POST", "/api/manifesto/generate", {
+            "json": {"shop_domain": f"bench-{run}-{i}.myshopify.com", "access_token": "bench", "force_refresh": True},
+        })),
+        Scenario("video_range", lambda i, run: ("GET", f"/api/campaign/video/{BENCH_VIDEO}", {
+            "headers": {"Range": f"bytes={(i * 65536) % (4 << 20)}-{(i * 65536) % (4 << 20) + 262143}"},
+        })),
+        Scenario("pipeline", lambda i, run: ("POST", "/api/pipeline/run", {"json": {"url": f"https://videos.bench/{run}/p{i}.mp4"}})),
+        Scenario("stats", lambda i, run: ("GET", "/api/cache/stats", {})),
+    )
+}
+# The pipeline's video stage is a fixed 15 s wait, so it is opt-in
+DEFAULT_SCENARIOS = "analyze,compare,compare_batch,email,manifesto,video_range,stats"
+
+def percentile(ordered: List[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def failure(response) -> Optional[str]:
+    """Why a response counts as an error: a 4xx/5xx, an SSE `error` event or an "error" in the body."""
+    if response.status_code >= 400:
+        return f"HTTP {response.status_code}"
+    if response.headers.get("content-type", "").startswith("text/event-stream"):
+        return "stream error" if "event: error" in response.text else None
+    if response.headers.get("content-type", "").startswith("application/json"):
+        body = response.json()
+        result = body.get("email") if isinstance(body.get("email"), dict) else body
+        return str(result["error"])[:80] if isinstance(result, dict) and result.get("error") else None
+    return None
+
+async def run_level(client, scenario: Scenario, concurrency: int, requests: int, run_id: str) -> Dict:
+    """Send `requests` requests with `concurrency` in flight and summarize their latencies."""
+    counter = itertools.count()
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+
+    async def worker():
+        while (i := next(counter)) < requests:
+            method, path, kwargs = scenario.request(i, run_id)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                reason = failure(response)
+            except Exception as e:
+                reason = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            if reason:
+                errors[reason] = errors.get(reason, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 1) if seconds is not None else None
+    return {
+        "scenario": scenario.name,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": sum(errors.values()),
+        "error_reasons": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "p50_ms": ms(percentile(ordered, 0.50)),
+        "p95_ms": ms(percentile(ordered, 0.95)),
+        "p99_ms": ms(percentile(ordered, 0.99)),
+        "max_ms": ms(ordered[-1] if ordered else None),
+    }
+
+def git_commit() -> Dict:
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], capture_output=True, text=True, timeout=10).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+    return {"commit": git("rev-parse", "--short", "HEAD") or "unknown", "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+def prepare_data_dir(data_dir: str = None, rate_limits: bool = True) -> str:
+    """Point the app at a fresh data dir holding the test video. Must run before config is read."""
+    data_dir = data_dir or tempfile.mkdtemp(prefix="shopecho-bench-")
+    os.makedirs(data_dir, exist_ok=True)
+    os.environ["SHOPECHO_DATA_DIR"] = data_dir
+    os.environ["CAMPAIGN_VIDEO_DIR"] = data_dir
+    with open(os.path.join(data_dir, BENCH_VIDEO), "wb") as f:
+        f.write(random.Random(0).randbytes(4 << 20))
+    os.environ.setdefault("BACKBOARD_API_KEY", "bench") # turns on the assistant warm-up like production
+    if not rate_limits:
+        os.environ["OUTBOUND_RATE_LIMITS"] = ""
+    return data_dir
+
+def prepare_environment(args) -> Dict:
+    """Data dir and fakes, all before config and main are imported."""
+    prepare_data_dir(args.data_dir, rate_limits=not args.no_rate_limits)
+
+    from benchmarks.fakes import install, parse_profiles
+    profiles = parse_profiles(args.latency, args.errors, seed=args.seed)
+    install(profiles, products=args.products, indexing_seconds=args.indexing_seconds)
+    return {name: {"latency": p.latency, "error_rate": p.error_rate} for name, p in profiles.items()}
+
+async def drive(args, scenarios: List[Scenario], levels: List[int]) -> List[Dict]:
+    import httpx
+    run_id = f"{int(time.time())}"
+    timeout = httpx.Timeout(args.timeout)
+    results = []
+
+    async def each_level(client):
+        for scenario in scenarios:
+            for concurrency in levels:
+                if args.warmup:
+                    await run_level(client, scenario, min(concurrency, args.warmup), args.warmup, f"{run_id}w{concurrency}")
+                result = await run_level(client, scenario, concurrency, args.requests, f"{run_id}c{concurrency}")
+                results.append(result)
+                print_row(result)
+
+    print_header()
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=timeout) as client:
+            await each_level(client)
+        return results
+
+    import main
+    # ASGITransport doesn't run the lifespan; start the scheduler, job workers and warm-up the same way the server does
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=timeout) as client:
+            await each_level(client)
+    return results
+
+COLUMNS = ("scenario", "concurrency", "requests", "errors", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "max_ms")
+
+def print_header():
+    report(f"{'scenario':<14}{'conc':>6}{'reqs':>6}{'errs':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+
+def print_row(result: Dict):
+    values = [result[column] for column in COLUMNS]
+    report(f"{values[0]:<14}{values[1]:>6}{values[2]:>6}{values[3]:>6}" + "".join(f"{value:>10}" if i else f"{value:>9}" for i, value in enumerate(values[4:])))
+
+def load_baseline(path: str) -> Dict:
+    if path == "latest":
+        saved = sorted(glob.glob(os.path.join(RESULTS_DIR, "*.json")))
+        if not saved:
+            sys.exit("No saved results to compare against.")
+        path = saved[-1]
+    with open(path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    baseline["path"] = path
+    return baseline
+
+def compare(results: List[Dict], baseline: Dict, threshold: float) -> List[str]:
+    """Print p95 and throughput changes against the baseline; return the regressions beyond `threshold`."""
+    previous = {(row["scenario"], row["concurrency"]): row for row in baseline["results"]}
+    regressions = []
+    print(f"\nAgainst {baseline['path']} ({baseline['meta']['commit']}):")
+    for row in results:
+        before = previous.get((row["scenario"], row["concurrency"]))
+        if not before or not before["p95_ms"] or not before["throughput_rps"]:
+            continue
+        p95_change = row["p95_ms"] / before["p95_ms"] - 1
+        rps_change = row["throughput_rps"] / before["throughput_rps"] - 1
+        regressed = p95_change > threshold or rps_change < -threshold
+        label = f"{row['scenario']} @ {row['concurrency']}"
+        print(f"  {label:<24} p95 {p95_change:+7.1%}   rps {rps_change:+7.1%}{'   REGRESSION' if regressed else ''}")
+        if regressed:
+            regressions.append(label)
+    if not any((row["scenario"], row["concurrency"]) in previous for row in results):
+        print("  no scenario and concurrency level in common")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=DEFAULT_SCENARIOS, help=f"comma-separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=50, help="requests per scenario and level")
+    parser.add_argument("--warmup", type=int, default=2, help="unmeasured requests before each level")
+    parser.add_argument("--timeout", type=float, default=120, help="per-request timeout in seconds")
+    parser.add_argument("--latency", default="", help='fake upstream latency in seconds, e.g. "backboard=0.8,shopify=0.05"')
+    parser.add_argument("--errors", default="", help='fake upstream error rates, e.g. "backboard=0.05"')
+    parser.add_argument("--products", type=int, default=250, help="size of the fake Shopify catalog")
+    parser.add_argument("--indexing-seconds", type=float, default=0.0, help="how long fake TwelveLabs indexing takes")
+    parser.add_argument("--seed", type=int, default=None, help="seed the fakes' jitter and errors")
+    parser.add_argument("--no-rate-limits", action="store_true", help="turn off OUTBOUND_RATE_LIMITS to measure the app alone")
+    parser.add_argument("--data-dir", help="data directory for the in-process app (default: a fresh temp dir)")
+    parser.add_argument("--base-url", help="drive a running server (python -m benchmarks.server) instead")
+    parser.add_argument("--verbose", action="store_true", help="show the in-process app's own output")
+    parser.add_argument("--out", help=f"results file (default: {RESULTS_DIR}/<time>-<commit>.json)")
+    parser.add_argument("--compare", help='earlier results file to compare with, or "latest"')
+    parser.add_argument("--threshold", type=float, default=0.10, help="p95/throughput change counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 if any scenario regressed")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.scenarios.split(",") if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {unknown}")
+    scenarios = [SCENARIOS[name] for name in args.scenarios.split(",")]
+    levels = [int(level) for level in args.concurrency.split(",")]
+    baseline = load_baseline(args.compare) if args.compare else None # before this run's file becomes "latest"
+
+    if not args.verbose:
+        os.environ.setdefault("LOG_LEVEL", "WARNING") # the app logs a line per request; keep only the report on screen
+    profiles = None if args.base_url else prepare_environment(args)
+    if args.verbose or args.base_url:
+        results = asyncio.run(drive(args, scenarios, levels))
+    else:
+        # SDKs may still print to stdout
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            results = asyncio.run(drive(args, scenarios, levels))
+
+    meta = {
+        **git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "target": args.base_url or "in-process",
+        "fakes": profiles,
+        "requests": args.requests,
+        "rate_limits": not args.no_rate_limits,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{meta['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+    print(f"\nSaved {out}")
+
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Serve the app over HTTP with fake upstreams, to benchmark it as deployed:
+    python -m benchmarks.server --port 8100 --workers 4
+    python -m benchmarks.run --base-url http://127.0.0.1:8100
+
+It runs through serve.py, the production launcher: the app and its fakes are loaded once
+and the workers are forked from it, sharing the data directory like real workers.
+"""
+import argparse
+import os
+from benchmarks.run import prepare_data_dir
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--latency", default="", help='fake upstream latency in seconds, e.g. "backboard=0.8"')
+    parser.add_argument("--errors", default="", help='fake upstream error rates, e.g. "backboard=0.05"')
+    parser.add_argument("--products", type=int, default=250)
+    parser.add_argument("--indexing-seconds", type=float, default=0.0)
+    parser.add_argument("--no-rate-limits", action="store_true")
+    parser.add_argument("--data-dir")
+    parser.add_argument("--log-level", default="warning", help="app and server log level (info logs every request)")
+    args = parser.parse_args(argv)
+
+    data_dir = prepare_data_dir(args.data_dir, rate_limits=not args.no_rate_limits)
+    # Workers are separate processes: hand them the fake settings through the environment
+    os.environ.update({
+        "BENCH_LATENCY": args.latency,
+        "BENCH_ERRORS": args.errors,
+        "BENCH_PRODUCTS": str(args.products),
+        "BENCH_INDEXING_SECONDS": str(args.indexing_seconds),
+        "LOG_LEVEL": args.log_level.upper(),
+    })
+    print(f"Serving with fake upstreams on http://{args.host}:{args.port} (data in {data_dir})")
+
+    import serve
+    serve.main(["--app", "benchmarks.app:app", "--host", args.host, "--port", str(args.port), "--workers", str(args.workers)])
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,19 @@
 # config.py or inside main.py
 import os
 from functools import lru_cache
-from backboard import BackboardClient
 from dotenv import load_dotenv
 
 load_dotenv()
 
+DEFAULT_SHOP = "default" # used by endpoints that are not scoped to a shop yet
+
+# Budgets per LLM endpoint: (fallback chain, hard timeout in seconds, hedge, prompt tokens per call)
+LLM_ENDPOINT_DEFAULTS = {
+    "manifesto": ("google/gemini-2.5-flash,anthropic/claude-sonnet-4-20250514", "60", "false", "8000"),
+    "compare": ("google/gemini-2.5-flash,anthropic/claude-sonnet-4-20250514", "20", "true", "4000"),
+    "email": ("anthropic/claude-opus-4-20250514,anthropic/claude-sonnet-4-20250514,google/gemini-2.5-flash", "30", "true", "2000"),
+}
+
 @lru_cache() # caches the result so it doesn't read env vars every time
 def get_config():
     return {
@@ -13,8 +21,207 @@ def get_config():
         "shopify_api_secret": os.getenv("SHOPIFY_API_SECRET"),
         "backboard_api_key": os.getenv("BACKBOARD_API_KEY"),
         "twelvelabs_api_key": os.getenv("TWELVELABS_API_KEY"),
+        "data_dir": os.getenv("SHOPECHO_DATA_DIR", ".data"), # local state (jobs, registries, caches)
+        "job_workers": int(os.getenv("JOB_WORKERS", "4")),
+        "cache_max_entries": int(os.getenv("CACHE_MAX_ENTRIES", "256")),
+        "cache_max_disk_entries": int(os.getenv("CACHE_MAX_DISK_ENTRIES", "5000")),
+        "cache_ttl_seconds": float(os.getenv("CACHE_TTL_SECONDS", "86400")),
+        "thread_max_messages": int(os.getenv("BACKBOARD_THREAD_MAX_MESSAGES", "10")),
+        "thread_max_age_seconds": float(os.getenv("BACKBOARD_THREAD_MAX_AGE_SECONDS", "3600")),
+        "thread_max_idle": int(os.getenv("BACKBOARD_THREAD_MAX_IDLE", "4")),
+        "shopify_max_connections": int(os.getenv("SHOPIFY_MAX_CONNECTIONS", "20")),
+        "shopify_page_size": int(os.getenv("SHOPIFY_PAGE_SIZE", "100")),
+        "shopify_bulk_threshold": int(os.getenv("SHOPIFY_BULK_THRESHOLD", "2000")), # products; bigger catalogs use bulk operations
+        "shopify_bulk_timeout_seconds": float(os.getenv("SHOPIFY_BULK_TIMEOUT_SECONDS", "1800")), # before a stuck bulk operation fails the scan
+        "async_debug": os.getenv("ASYNC_DEBUG", "").lower() in ("1", "true", "yes"), # report event-loop stalls
+        "loop_stall_threshold_ms": float(os.getenv("LOOP_STALL_THRESHOLD_MS", "100")),
+        "compare_batch_concurrency": int(os.getenv("COMPARE_BATCH_CONCURRENCY", "4")), # LLM calls in flight per batch
+        "compare_pack_size": int(os.getenv("COMPARE_PACK_SIZE", "5")), # summaries judged per LLM call
+        "twelvelabs_index_timeout_seconds": float(os.getenv("TWELVELABS_INDEX_TIMEOUT_SECONDS", "1800")),
+        "twelvelabs_poll_initial_seconds": float(os.getenv("TWELVELABS_POLL_INITIAL_SECONDS", "1")),
+        "twelvelabs_poll_max_seconds": float(os.getenv("TWELVELABS_POLL_MAX_SECONDS", "15")),
+        "twelvelabs_webhook_secret": os.getenv("TWELVELABS_WEBHOOK_SECRET"), # unset: callbacks are accepted unsigned
+        # "provider[/model]=requests per second:burst"; the most specific key applies, unlisted ones are unthrottled
+        "outbound_rate_limits": os.getenv("OUTBOUND_RATE_LIMITS", "backboard=10:20,twelvelabs=10:20"), # per deployment; set to your plans' quotas
+        "outbound_max_retries": int(os.getenv("OUTBOUND_MAX_RETRIES", "4")),
+        "twelvelabs_batch_concurrency": int(os.getenv("TWELVELABS_BATCH_CONCURRENCY", "4")), # videos uploaded/indexed at once per batch
+        "llm_endpoints": {
+            endpoint: {
+                "chain": os.getenv(f"LLM_{endpoint.upper()}_CHAIN", chain), # provider/model fallbacks, in order
+                "timeout_seconds": float(os.getenv(f"LLM_{endpoint.upper()}_TIMEOUT_SECONDS", timeout)),
+                "hedge": os.getenv(f"LLM_{endpoint.upper()}_HEDGE", hedge).lower() in ("1", "true", "yes"),
+                "prompt_tokens": int(os.getenv(f"LLM_{endpoint.upper()}_PROMPT_TOKENS", prompt_tokens)),
+            }
+            for endpoint, (chain, timeout, hedge, prompt_tokens) in LLM_ENDPOINT_DEFAULTS.items()
+        },
+        "llm_breaker_failures": int(os.getenv("LLM_BREAKER_FAILURES", "3")), # consecutive failures before a provider is skipped
+        "llm_breaker_cooldown_seconds": float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30")),
+        "product_index_dimensions": int(os.getenv("PRODUCT_INDEX_DIMENSIONS", "4096")), # hashed term buckets (rows are sparse)
+        "product_index_top_k": int(os.getenv("PRODUCT_INDEX_TOP_K", "5")), # products matched to a video in email prompts
+        # Comparison pre-screen: similarity below/above these settles No/Yes without the LLM.
+        # Off by default (0 and >1); only enable it with thresholds fitted by scripts/evaluate_prescreen.py
+        "prescreen_no_below": float(os.getenv("PRESCREEN_NO_BELOW", "0")),
+        "prescreen_yes_above": float(os.getenv("PRESCREEN_YES_ABOVE", "2")),
+        "campaign_video_dir": os.getenv("CAMPAIGN_VIDEO_DIR", "services"), # generated campaign videos served by /video/{filename}
+        "campaign_video_max_age": int(os.getenv("CAMPAIGN_VIDEO_MAX_AGE", "31536000")), # browser cache lifetime in seconds
+        "log_level": os.getenv("LOG_LEVEL", "INFO"), # DEBUG adds a line per timed span
+        "web_workers": int(os.getenv("WEB_WORKERS", "1")), # processes forked by serve.py; they split OUTBOUND_RATE_LIMITS
+        "thread_pool_size": int(os.getenv("THREAD_POOL_SIZE", "0")), # threads for blocking SDK calls per worker; 0 keeps the defaults
+        "twelvelabs_max_connections": int(os.getenv("TWELVELABS_MAX_CONNECTIONS", "20")),
     }
 
+@lru_cache()
+def get_metrics(): # Prometheus counters and histograms served at /metrics
+    from services import component_metrics
+    from services.telemetry import Metrics
+    metrics = Metrics()
+    component_metrics.register(metrics) # the components' own stats, read on each scrape
+    return metrics
+
 @lru_cache()
 def get_backboard_client(): # caches client so we can have persistent memory (backboard)
+    from backboard import BackboardClient
     return BackboardClient(get_config()["backboard_api_key"])
+
+@lru_cache()
+def get_twelvelabs_http(): # the TwelveLabs SDK's connection pool, owned here so shutdown can close it
+    import httpx
+    max_connections = get_config()["twelvelabs_max_connections"]
+    return httpx.Client(
+        timeout=httpx.Timeout(60, connect=10),
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+    )
+
+@lru_cache()
+def get_twelvelabs_client(): # one SDK client for every analysis; the SDK is only imported once it's needed
+    from twelvelabs import TwelveLabs
+    return TwelveLabs(api_key=get_config()["twelvelabs_api_key"], httpx_client=get_twelvelabs_http())
+
+@lru_cache()
+def get_outbound_scheduler(): # rate limits, retries and priorities for every upstream API call
+    from services.outbound import OutboundScheduler, parse_rate_limits
+    settings = get_config()
+    return OutboundScheduler(
+        parse_rate_limits(settings["outbound_rate_limits"]),
+        max_retries=settings["outbound_max_retries"],
+        workers=settings["web_workers"], # the limits are split between serve.py's workers
+    )
+
+@lru_cache()
+def get_model_router(): # latency budgets, fallbacks and circuit breakers for LLM calls
+    from services.model_router import CircuitBreaker, LatencyPolicy, ModelRouter, parse_chain
+    settings = get_config()
+    policies = {
+        endpoint: LatencyPolicy(parse_chain(policy["chain"]), policy["timeout_seconds"], policy["hedge"])
+        for endpoint, policy in settings["llm_endpoints"].items()
+    }
+    breaker = CircuitBreaker(settings["llm_breaker_failures"], settings["llm_breaker_cooldown_seconds"])
+    return ModelRouter(policies, breaker)
+
+@lru_cache()
+def get_prompt_budget(endpoint: str): # per-call prompt token budget for one LLM endpoint
+    from services.prompt_budget import PromptBudget
+    return PromptBudget(endpoint, get_config()["llm_endpoints"][endpoint]["prompt_tokens"])
+
+@lru_cache()
+def get_indexing_waiter(): # wakes indexing waits when a TwelveLabs callback arrives
+    from services.indexing import IndexingWaiter
+    return IndexingWaiter()
+
+@lru_cache()
+def get_shopify_client(): # one pooled HTTP client for every Shopify Admin API call
+    import httpx
+    from services.shopify import ShopifyClient
+    settings = get_config()
+    http = httpx.AsyncClient(
+        timeout=httpx.Timeout(30, connect=10),
+        limits=httpx.Limits(
+            max_connections=settings["shopify_max_connections"],
+            max_keepalive_connections=settings["shopify_max_connections"],
+        ),
+    )
+    return ShopifyClient(
+        http,
+        page_size=settings["shopify_page_size"],
+        bulk_threshold=settings["shopify_bulk_threshold"],
+        bulk_timeout=settings["shopify_bulk_timeout_seconds"],
+    )
+
+@lru_cache()
+def get_fingerprint_store(): # catalog fingerprint each shop's manifesto was built from
+    from services.catalog_fingerprint import CatalogFingerprintStore
+    return CatalogFingerprintStore()
+
+@lru_cache()
+def get_job_manager(): # one bounded executor per process for long-running jobs
+    from services.jobs import JobManager, JobStore
+    return JobManager(JobStore(), max_workers=get_config()["job_workers"])
+
+@lru_cache()
+def get_asset_registry(): # canonical video URL -> TwelveLabs indexed asset
+    from services.asset_registry import AssetRegistry
+    return AssetRegistry()
+
+@lru_cache()
+def get_artifact_store(): # per-shop manifesto, video summary and comparison
+    from services.artifact_store import ArtifactStore
+    return ArtifactStore()
+
+@lru_cache()
+def get_product_index(): # per-shop TF-IDF product index for picking catalog context
+    from services.product_index import ProductIndex
+    return ProductIndex(dimensions=get_config()["product_index_dimensions"])
+
+@lru_cache()
+def get_prescreen(): # local similarity check that settles obvious comparisons without the LLM
+    from services.prescreen import PreScreen
+    settings = get_config()
+    return PreScreen(settings["prescreen_no_below"], settings["prescreen_yes_above"])
+
+@lru_cache()
+def get_video_index(): # allow-list of campaign video files, re-stat'ed per request for their size, mtime and ETag
+    from services.media_index import MediaIndex
+    return MediaIndex(get_config()["campaign_video_dir"], extensions=(".mp4",))
+
+@lru_cache()
+def get_stage_timings(pipeline: str): # per-stage durations and outcomes for one kind of pipeline run
+    from services.pipeline import StageTimings
+    return StageTimings()
+
+PIPELINE_NAMES = ("campaign",)
+
+CACHE_NAMESPACES = ("analysis", "comparison")
+
+@lru_cache()
+def get_result_cache(namespace: str): # one cache per kind of upstream result
+    from services.cache import ResultCache
+    settings = get_config()
+    return ResultCache(
+        namespace,
+        max_entries=settings["cache_max_entries"],
+        max_disk_entries=settings["cache_max_disk_entries"],
+        ttl_seconds=settings["cache_ttl_seconds"],
+    )
+
+SINGLE_FLIGHT_NAMES = ("analyze", "manifesto", "compare")
+
+@lru_cache()
+def get_single_flight(name: str): # shares one in-flight upstream call between identical requests
+    from services.single_flight import SingleFlight
+    return SingleFlight(name)
+
+@lru_cache()
+def get_assistant_registry(): # assistants are created once per (name, description)
+    from services.backboard_pool import AssistantRegistry
+    return AssistantRegistry(get_backboard_client())
+
+@lru_cache()
+def get_thread_pool(): # per-shop Backboard threads shared by every service
+    from services.backboard_pool import ThreadPool
+    settings = get_config()
+    return ThreadPool(
+        get_backboard_client(),
+        max_messages=settings["thread_max_messages"],
+        max_age_seconds=settings["thread_max_age_seconds"],
+        max_idle_per_key=settings["thread_max_idle"],
+    )
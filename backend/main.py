@@ -1,23 +1,111 @@
 import os
 import json
 import time
+import asyncio
+import logging
+import anyio.to_thread
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from typing import Optional
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from routers.manifesto import manifesto_router
 from routers.twelvelabs import twelvelabs_router
 from routers.compare_manifesto import compare_manifesto_router
 from routers.campaign import campaign_router
+from routers.cache import cache_router
+from routers.pipeline import pipeline_router
+from config import DEFAULT_SHOP, get_config, get_job_manager, get_assistant_registry, get_shopify_client, get_artifact_store, get_indexing_waiter, get_outbound_scheduler, get_metrics, get_backboard_client, get_twelvelabs_client, get_twelvelabs_http
+from services.loop_monitor import LoopStallMonitor
+from services.telemetry import PROMETHEUS_CONTENT_TYPE, RequestTelemetry, configure_logging
+from services.manifesto import MANIFESTO_ASSISTANT, MANIFESTO_DESCRIPTION
+from services.compare_manifesto import COMPARE_ASSISTANT, COMPARE_DESCRIPTION
+from services.campaign import BRAND_STRATEGIST_ASSISTANT, brand_strategist_description
 from dotenv import load_dotenv
 
 load_dotenv()
+configure_logging(get_config()["log_level"])
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
 
-app.include_router(manifesto_router, prefix="/api/manifesto")
-app.include_router(twelvelabs_router, prefix="/api/twelvelabs")
-app.include_router(compare_manifesto_router, prefix="/api/compare")
-app.include_router(campaign_router, prefix="/api/campaign")
+async def assistant_specs():
+    """Every Backboard assistant the services use, as (name, description) pairs."""
+    specs = [
+        (MANIFESTO_ASSISTANT, MANIFESTO_DESCRIPTION),
+        (COMPARE_ASSISTANT, COMPARE_DESCRIPTION),
+    ]
+    manifesto = await get_artifact_store().aread(DEFAULT_SHOP, "manifesto")
+    if manifesto is not None:
+        specs.append((BRAND_STRATEGIST_ASSISTANT, brand_strategist_description(manifesto)))
+    return specs
+
+def warm_clients(settings: dict):
+    """Build the shared upstream clients before taking traffic, so the first requests don't pay for it."""
+    get_shopify_client()
+    if settings["backboard_api_key"]:
+        get_backboard_client()
+    if settings["twelvelabs_api_key"]:
+        get_twelvelabs_client() # also loads the SDK, which is otherwise imported on first use
+
+async def close_clients():
+    """Close the connection pools of every upstream client that was built."""
+    await get_shopify_client().aclose()
+    if get_backboard_client.cache_info().currsize:
+        await get_backboard_client().aclose()
+    if get_twelvelabs_http.cache_info().currsize:
+        get_twelvelabs_http().close()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    settings = get_config()
+    loop = asyncio.get_running_loop()
+
+    if settings["thread_pool_size"]:
+        # Blocking SDK calls run on the loop's default executor (asyncio.to_thread) and file
+        # responses on anyio's; size both so neither caps the other
+        loop.set_default_executor(ThreadPoolExecutor(settings["thread_pool_size"], thread_name_prefix="io"))
+        anyio.to_thread.current_default_thread_limiter().total_tokens = settings["thread_pool_size"]
+
+    monitor = None
+    if settings["async_debug"]:
+        monitor = LoopStallMonitor(threshold_ms=settings["loop_stall_threshold_ms"])
+        monitor.start(loop)
+
+    get_outbound_scheduler().start(loop)
+    jobs = get_job_manager()
+    # serve.py lets one worker resume everything, and a replacement resume what the dead worker left
+    jobs.start(loop, resume=getattr(app.state, "resume_jobs", True), owner=getattr(app.state, "jobs_owner", None))
+    warm_clients(settings)
+    if not settings["twelvelabs_webhook_secret"]:
+        # Tolerable only because the poll stays the source of truth: a forged callback costs one re-poll
+        logger.warning("TWELVELABS_WEBHOOK_SECRET is not set: indexing callbacks are accepted unsigned")
+    # Warm up in the background; requests arriving meanwhile wait on the same creation
+    warm_up = None
+    if settings["backboard_api_key"]:
+        warm_up = asyncio.create_task(get_assistant_registry().warm_up(await assistant_specs()))
+
+    seconds = time.perf_counter() - started
+    get_metrics().startup_seconds.set(seconds, "lifespan")
+    logger.info("Worker %d ready in %.3fs", os.getpid(), seconds)
+    yield
+    if warm_up:
+        warm_up.cancel()
+    jobs.shutdown()
+    get_indexing_waiter().close() # unblock jobs waiting on indexing; they resume on the next start
+    await close_clients()
+    if monitor:
+        monitor.stop()
+
+app = FastAPI(lifespan=lifespan)
+
+app.include_router(manifesto_router)
+app.include_router(twelvelabs_router)
+app.include_router(compare_manifesto_router)
+app.include_router(campaign_router)
+app.include_router(cache_router)
+app.include_router(pipeline_router)
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,13 +113,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
+# Outermost, so request ids and timings cover everything below it
+app.add_middleware(RequestTelemetry)
 
 @app.get("/")
 async def root():
     return {"message": "API is running"}
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint: stage spans, HTTP timings, log counts and component stats for this process."""
+    return PlainTextResponse(get_metrics().render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 
 if __name__ == "__main__":
+    # Development server; run serve.py in production
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
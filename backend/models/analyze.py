@@ -1,5 +1,17 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from config import DEFAULT_SHOP
 
 class AnalyzeRequest(BaseModel):
-    url: str
\ No newline at end of file
+    url: str
+    shop: str = DEFAULT_SHOP
+
+class BatchAnalyzeRequest(BaseModel):
+    urls: List[str] = Field(..., min_length=1, max_length=100)
+    shop: str = DEFAULT_SHOP
+    concurrency: Optional[int] = Field(None, ge=1, le=16) # defaults to TWELVELABS_BATCH_CONCURRENCY
+
+class RegisterAssetRequest(BaseModel):
+    url: str
+    indexed_asset_id: str
+    index_id: Optional[str] = None
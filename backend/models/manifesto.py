@@ -2,4 +2,5 @@ from pydantic import BaseModel
 
 class ManifestoRequest(BaseModel):
     shop_domain: str
-    access_token: str
\ No newline at end of file
+    access_token: str
+    force_refresh: bool = False # regenerate even if the catalog fingerprint is unchanged
\ No newline at end of file
@@ -0,0 +1,6 @@
+from pydantic import BaseModel
+from config import DEFAULT_SHOP
+
+class PipelineRequest(BaseModel):
+    url: str # the viral video to build a campaign from
+    shop: str = DEFAULT_SHOP
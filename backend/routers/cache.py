@@ -0,0 +1,27 @@
+import asyncio
+from fastapi import APIRouter, HTTPException
+from config import CACHE_NAMESPACES, SINGLE_FLIGHT_NAMES, get_result_cache, get_single_flight
+
+cache_router = APIRouter(prefix="/api/cache")
+
+@cache_router.get("/stats")
+async def cache_stats():
+    """
+    Hit/miss counters per cache, plus how much duplicate in-flight work was coalesced.
+    Everything else (outbound calls, LLM routing, prompts, pre-screen, pipelines, jobs) is on /metrics.
+    """
+    return {
+        "status": "success",
+        "caches": {
+            namespace: await asyncio.to_thread(get_result_cache(namespace).stats)
+            for namespace in CACHE_NAMESPACES
+        },
+        "single_flight": {name: get_single_flight(name).stats() for name in SINGLE_FLIGHT_NAMES},
+    }
+
+@cache_router.delete("/{namespace}")
+async def clear_cache(namespace: str):
+    if namespace not in CACHE_NAMESPACES:
+        raise HTTPException(status_code=404, detail=f"Unknown cache: {namespace}")
+    await asyncio.to_thread(get_result_cache(namespace).clear)
+    return {"status": "success"}
@@ -1,20 +1,26 @@
-from fastapi import APIRouter, Depends
-from fastapi.responses import FileResponse
-from config import get_config, get_backboard_client
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from config import DEFAULT_SHOP, get_config, get_backboard_client, get_video_index
 from services.campaign import CampaignService
+from services.media_index import MediaIndex, MediaResponse, not_modified
+from services.streaming import result_events, sse_response
 from backboard import BackboardClient
 
-campaign_router = APIRouter()
+logger = logging.getLogger(__name__)
+
+campaign_router = APIRouter(prefix="/api/campaign")
 
 @campaign_router.post("/video")
 async def create_campaign_video(
+    shop: str = DEFAULT_SHOP,
     client: BackboardClient = Depends(get_backboard_client)
 ):
     """
     Synchronous endpoint to generate videos.
     """
     service = CampaignService(
-        client=client
+        client=client,
+        shop=shop
     )
     
     # Blocking call to service
@@ -26,32 +32,65 @@ async def create_campaign_video(
         ]
     }
 
-    print(resp)
+    logger.debug("Campaign videos: %s", resp)
 
     return resp
 
-@campaign_router.get("/video/{filename}")
-async def get_campaign_video_file(filename: str):
+@campaign_router.api_route("/video/{filename}", methods=["GET", "HEAD"])
+async def get_campaign_video_file(
+    filename: str,
+    request: Request,
+    settings: dict = Depends(get_config),
+    videos: MediaIndex = Depends(get_video_index)
+):
     """
     Endpoint to retrieve generated video files.
+    Only indexed files are served. Range requests get 206 so players can seek, and
+    conditional requests get 304 while the file's ETag is unchanged.
     """
-    file_path = f"services/{filename}"
-    return FileResponse(path=file_path, filename=filename, media_type='video/mp4')
+    video = await videos.aget(filename)
+    if video is None:
+        raise HTTPException(status_code=404, detail="Video not found")
+
+    headers = {
+        "ETag": video.etag,
+        "Last-Modified": video.last_modified,
+        "Cache-Control": f"public, max-age={settings['campaign_video_max_age']}",
+    }
+    if not_modified(video, request.headers):
+        return Response(status_code=304, headers=headers)
+
+    # The stat taken by the lookup is passed on, so the headers match the file being sent
+    return MediaResponse(path=video.path, filename=filename, media_type="video/mp4", stat_result=video.stat, headers=headers)
 
 @campaign_router.post("/email")
 async def create_campaign_email(
+    shop: str = DEFAULT_SHOP,
     client: BackboardClient = Depends(get_backboard_client)
 ):
     """
     Endpoint to publish and track AI-generated campaigns to Shopify.
     """
     service = CampaignService(
-        client=client
+        client=client,
+        shop=shop
     )
     
     # Blocking call to service
     email = await service.generate_draft_email()
 
-    print(email)
+    logger.debug("Draft email: %s", email)
 
-    return {"status": "success", "email": email}
\ No newline at end of file
+    return {"status": "success", "email": email}
+
+@campaign_router.post("/email/stream")
+async def stream_campaign_email(
+    shop: str = DEFAULT_SHOP,
+    client: BackboardClient = Depends(get_backboard_client)
+):
+    """SSE variant of /email: `token` events as the draft is written, then `done`."""
+    service = CampaignService(
+        client=client,
+        shop=shop
+    )
+    return sse_response(result_events(service.stream_draft_email()))
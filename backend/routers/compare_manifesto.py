@@ -1,30 +1,125 @@
-from fastapi import APIRouter, Depends
-from pydantic import BaseModel
-from config import get_config, get_backboard_client
-from services.compare_manifesto import CompareManifestoService
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from config import DEFAULT_SHOP, get_config, get_backboard_client, get_result_cache
+from services.cache import ResultCache, content_key
+from services.compare_manifesto import CompareManifestoService, ComparisonError, compare_with_cache, format_verdict, load_cached_manifesto, parse_verdict
+from services.streaming import result_events, sse_response
 from backboard import BackboardClient
 
-compare_manifesto_router = APIRouter()
+compare_manifesto_router = APIRouter(prefix="/api/compare")
 
 class CompareManifestoRequest(BaseModel):
     summary: str
+    shop: str = DEFAULT_SHOP
+
+class BatchCompareRequest(BaseModel):
+    summaries: List[str] = Field(..., min_length=1, max_length=100)
+    shop: str = DEFAULT_SHOP
+    concurrency: Optional[int] = Field(None, ge=1, le=16) # defaults to COMPARE_BATCH_CONCURRENCY
+
+def get_comparison_cache() -> ResultCache:
+    return get_result_cache("comparison")
 
 @compare_manifesto_router.post("/compare")
 async def compare_manifesto(
     request: CompareManifestoRequest,
     settings: dict = Depends(get_config),
-    client: BackboardClient = Depends(get_backboard_client)    
+    client: BackboardClient = Depends(get_backboard_client),
+    cache: ResultCache = Depends(get_comparison_cache)
 ):
     """Compare a video summary against the brand manifesto"""
     
     service = CompareManifestoService(
         summary=request.summary,
         backboard_api_key=settings["backboard_api_key"],
-        client=client
+        client=client,
+        shop=request.shop
     )
-    
-    result = await service._generate_comparison_with_backboard(
-        summary=request.summary
+
+    try:
+        result = await compare_with_cache(service, request.summary, cache)
+    except ComparisonError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    return {"status": "success", **result}
+
+@compare_manifesto_router.post("/compare/stream")
+async def stream_compare_manifesto(
+    request: CompareManifestoRequest,
+    settings: dict = Depends(get_config),
+    client: BackboardClient = Depends(get_backboard_client),
+    cache: ResultCache = Depends(get_comparison_cache)
+):
+    """SSE variant of /compare: `token` events as the verdict is generated, then `done`."""
+    service = CompareManifestoService(
+        summary=request.summary,
+        backboard_api_key=settings["backboard_api_key"],
+        client=client,
+        shop=request.shop
     )
-    
-    return {"status": "success", "comparison": result}
\ No newline at end of file
+    manifesto = await load_cached_manifesto(service, cache)
+    key = content_key(manifesto, request.summary)
+
+    async def comparison():
+        result = await cache.aget(key)
+        if result is not None:
+            await service._save_comparison(result)
+            yield result
+            yield {"comparison": result, "cached": True, "model": None, "source": "model"}
+            return
+
+        async for item in service.stream_comparison(request.summary):
+            if isinstance(item, dict):
+                if item["source"] == "model":
+                    await cache.aset(key, item["comparison"], scope=request.shop)
+                item = {**item, "cached": False}
+            yield item
+
+    return sse_response(result_events(comparison()))
+
+
+@compare_manifesto_router.post("/compare/batch")
+async def compare_manifesto_batch(
+    request: BatchCompareRequest,
+    settings: dict = Depends(get_config),
+    client: BackboardClient = Depends(get_backboard_client),
+    cache: ResultCache = Depends(get_comparison_cache)
+):
+    """
+    Screen many video summaries against the manifesto in one call.
+    Returns a Yes/No verdict and reason per summary, in request order, and stores the batch.
+    """
+    service = CompareManifestoService(
+        summary=None,
+        backboard_api_key=settings["backboard_api_key"],
+        client=client,
+        shop=request.shop
+    )
+
+    manifesto = await load_cached_manifesto(service, cache)
+    keys = [content_key(manifesto, summary) for summary in request.summaries]
+    cached = await asyncio.gather(*(cache.aget(key) for key in keys))
+    misses = [index for index, comparison in enumerate(cached) if comparison is None]
+
+    verdicts = await service.compare_batch(
+        [request.summaries[index] for index in misses],
+        concurrency=request.concurrency or settings["compare_batch_concurrency"],
+        pack_size=settings["compare_pack_size"],
+    )
+    fresh = dict(zip(misses, verdicts))
+    if len(fresh) == len(keys) and all("error" in verdict for verdict in verdicts):
+        # Not one verdict to return: the model is down, not the summaries at fault
+        raise HTTPException(status_code=502, detail=verdicts[0]["reason"])
+    await asyncio.gather(*(
+        cache.aset(keys[index], format_verdict(verdict), scope=request.shop)
+        for index, verdict in fresh.items() if verdict["verdict"] is not None and verdict["source"] == "model"
+    ))
+
+    results = []
+    for index, summary in enumerate(request.summaries):
+        verdict = fresh[index] if index in fresh else parse_verdict(cached[index])
+        results.append({"summary": summary, "model": None, "source": "model", **verdict, "cached": index not in fresh})
+    await service.save_batch(results)
+
+    return {"status": "success", "results": results}
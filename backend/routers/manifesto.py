@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Depends
-from config import get_config, get_backboard_client
+import json
+import logging
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from config import get_config, get_backboard_client, get_fingerprint_store, get_product_index, get_single_flight
+from services.cache import content_key
+from services.catalog_fingerprint import CatalogFingerprintStore
 from services.manifesto import ManifestoService
+from services.product_index import ProductIndex, webhook_product
+from services.shopify import verify_webhook
 from models.manifesto import ManifestoRequest
 from backboard import BackboardClient
 
-manifesto_router = APIRouter()
+logger = logging.getLogger(__name__)
+
+manifesto_router = APIRouter(prefix="/api/manifesto")
 
 @manifesto_router.post("/generate")
 async def generate_manifesto(
@@ -12,13 +20,57 @@ async def generate_manifesto(
     client: BackboardClient = Depends(get_backboard_client)
 ):
     
-    print("🚀 Generating manifesto...")
+    logger.info("Generating manifesto for %s", request.shop_domain)
 
     manifesto_service = ManifestoService(
         shop=request.shop_domain,
         token=request.access_token,
         client=client
     )
-    manifesto = await manifesto_service.create_manifesto()
+    # Double clicks and several open tabs share one generation per shop; the token is part
+    # of the key (content_key only keeps its hash) so a caller can't ride on another's access
+    manifesto = await get_single_flight("manifesto").do(
+        content_key(request.shop_domain, request.access_token, str(request.force_refresh)),
+        lambda: manifesto_service.create_manifesto(force_refresh=request.force_refresh),
+    )
+    if not isinstance(manifesto, dict):
+        # "Failed to retrieve store data." and the like
+        raise HTTPException(status_code=502, detail=manifesto)
+
+    return {"status": "success", "manifesto": manifesto["manifesto"], "model": manifesto.get("model")}
+
+@manifesto_router.post("/webhooks/products")
+async def products_webhook(
+    request: Request,
+    x_shopify_shop_domain: str = Header(...),
+    x_shopify_hmac_sha256: str = Header(None),
+    x_shopify_topic: str = Header(None),
+    settings: dict = Depends(get_config),
+    fingerprints: CatalogFingerprintStore = Depends(get_fingerprint_store),
+    products: ProductIndex = Depends(get_product_index)
+):
+    """products/create, products/update and products/delete: the next manifesto request rechecks the catalog
+    and the product index is patched right away."""
+    body = await request.body()
+    secret = settings["shopify_api_secret"]
+    if not secret:
+        # Unsigned calls could mark any shop stale and write product text that ends up in prompts
+        raise HTTPException(status_code=503, detail="Webhooks need SHOPIFY_API_SECRET to be configured")
+    if not verify_webhook(body, x_shopify_hmac_sha256, secret):
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+    try:
+        payload = json.loads(body or b"{}")
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Webhook body must be a JSON object")
+
+    await fingerprints.amark_stale(x_shopify_shop_domain)
 
-    return {"status": "success", "manifesto": manifesto["manifesto"]}
\ No newline at end of file
+    # Keep the product index current between full scans
+    if payload.get("id") is not None:
+        if x_shopify_topic == "products/delete":
+            await products.aremove(x_shopify_shop_domain, [f"gid://shopify/Product/{payload['id']}"])
+        else:
+            await products.aupsert(x_shopify_shop_domain, [webhook_product(payload)])
+    return {"status": "success"}
@@ -0,0 +1,102 @@
+import logging
+import time
+from fastapi import APIRouter, Depends
+from config import get_config, get_backboard_client, get_result_cache, get_single_flight, get_stage_timings
+from models.pipeline import PipelineRequest
+from services.asset_registry import canonicalize_video_url
+from services.cache import content_key
+from services.campaign import CampaignService
+from services.compare_manifesto import CompareManifestoService, compare_with_cache, parse_verdict
+from services.pipeline import Pipeline, Stage
+from services.streaming import sse_event, sse_response
+from services.twelvelabs import TwelveLabsService
+from backboard import BackboardClient
+
+logger = logging.getLogger(__name__)
+
+pipeline_router = APIRouter(prefix="/api/pipeline")
+
+def campaign_stages(request: PipelineRequest, settings: dict, client: BackboardClient):
+    """analyze -> compare -> (email, video); the campaign stages only run on a "Yes" verdict."""
+
+    async def analyze(results):
+        twelvelabs = TwelveLabsService(shop=request.shop)
+        # Shares the upload and analysis with any /analyze call for the same video
+        return await get_single_flight("analyze").do(
+            content_key(request.shop, canonicalize_video_url(request.url)),
+            lambda: twelvelabs.analyze_video(video_url=request.url),
+        )
+
+    async def compare(results):
+        summary = results["analyze"]["analysis"]
+        service = CompareManifestoService(
+            summary=summary,
+            backboard_api_key=settings["backboard_api_key"],
+            client=client,
+            shop=request.shop
+        )
+        result = await compare_with_cache(service, summary, get_result_cache("comparison")) # fails the stage on ComparisonError
+        return {**result, **parse_verdict(result["comparison"])}
+
+    def unless_approved(results):
+        verdict = results["compare"]["verdict"]
+        return None if verdict == "Yes" else f"verdict was {verdict or 'unclear'}"
+
+    async def email(results):
+        service = CampaignService(client=client, shop=request.shop)
+        draft = await service.generate_draft_email(
+            summary=results["analyze"]["analysis"],
+            comparison=results["compare"]["comparison"],
+        )
+        if "error" in draft:
+            raise RuntimeError(draft["error"])
+        return draft
+
+    async def video(results):
+        service = CampaignService(client=client, shop=request.shop)
+        video = await service.generate_video_scripts()
+        return {"videos": [{"file_path": path} for path in video["elevenlabs_video_file_paths"]]}
+
+    return [
+        Stage("analyze", analyze),
+        Stage("compare", compare, after=("analyze",)),
+        Stage("email", email, after=("compare",), skip=unless_approved),
+        Stage("video", video, after=("compare",), skip=unless_approved),
+    ]
+
+@pipeline_router.post("/run")
+async def run_campaign_pipeline(
+    request: PipelineRequest,
+    settings: dict = Depends(get_config),
+    client: BackboardClient = Depends(get_backboard_client)
+):
+    """
+    Analyze a video, judge it against the manifesto and, if it fits, draft the email and
+    videos in parallel. Streams a `stage` event as each stage finishes, then `done` with
+    every result, per-stage timings and the overall status (completed, stopped or failed).
+    """
+    pipeline = Pipeline("campaign", campaign_stages(request, settings, client), get_stage_timings("campaign"))
+
+    async def events():
+        started = time.perf_counter()
+        results, timings, outcomes = {}, {}, {}
+        async for event in pipeline.run():
+            outcomes[event["stage"]] = event["status"]
+            if "seconds" in event:
+                timings[event["stage"]] = event["seconds"]
+            if event["status"] == "done":
+                results[event["stage"]] = event["result"]
+            yield sse_event("stage", event)
+
+        statuses = set(outcomes.values())
+        status = "failed" if "failed" in statuses else "stopped" if "skipped" in statuses else "completed"
+        seconds = round(time.perf_counter() - started, 3)
+        logger.info("Campaign pipeline %s in %ss: %s", status, seconds, timings)
+        yield sse_event("done", {
+            "status": status,
+            "results": results,
+            "timings": timings,
+            "seconds": seconds,
+        })
+
+    return sse_response(events())
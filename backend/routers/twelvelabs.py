@@ -1,18 +1,147 @@
-from config import get_config
-from models.analyze import AnalyzeRequest
-from fastapi import Depends
+import asyncio
+from config import DEFAULT_SHOP, get_config, get_job_manager, get_asset_registry, get_indexing_waiter, get_single_flight
+from models.analyze import AnalyzeRequest, BatchAnalyzeRequest, RegisterAssetRequest
+from fastapi import Depends, Header, HTTPException, Query, Request
 from fastapi.routing import APIRouter
+from services.asset_registry import AssetRegistry, canonicalize_video_url
+from services.cache import content_key
+from services.indexing import IndexingWaiter, verify_callback
+from services.jobs import JobManager
+from services.streaming import result_events, sse_event, sse_response
 from services.twelvelabs import TwelveLabsService
 
-twelvelabs_router = APIRouter()
+twelvelabs_router = APIRouter(prefix="/api/twelvelabs")
+
+ANALYZE_JOB = "twelvelabs.analyze"
+
+def run_analyze_job(payload: dict, stage):
+    """Background job handler: runs the full upload/index/analyze flow."""
+    twelvelabs = TwelveLabsService(shop=payload.get("shop", DEFAULT_SHOP))
+    return twelvelabs.analyze_video_sync(payload["url"], stage=stage)
+
+get_job_manager().register(ANALYZE_JOB, run_analyze_job)
 
 @twelvelabs_router.post("/analyze")
 async def analyze_video(
+    request: AnalyzeRequest
+):
+    twelvelabs = TwelveLabsService(shop=request.shop)
+    # Two requests for the same video share one upload, indexing wait and analysis
+    analysis_result = await get_single_flight("analyze").do(
+        content_key(request.shop, canonicalize_video_url(request.url)),
+        lambda: twelvelabs.analyze_video(video_url=request.url),
+    )
+    return {"status": "success", "data": analysis_result}
+
+@twelvelabs_router.post("/analyze/stream")
+async def stream_analyze_video(
+    request: AnalyzeRequest
+):
+    """SSE variant of /analyze: `token` events as Pegasus generates, then `done` with the analysis."""
+    twelvelabs = TwelveLabsService(shop=request.shop)
+    return sse_response(result_events(twelvelabs.stream_analysis(request.url)))
+
+@twelvelabs_router.post("/analyze/batch")
+async def analyze_video_batch(
+    request: BatchAnalyzeRequest,
+    settings: dict = Depends(get_config)
+):
+    """
+    Analyze a shortlist of videos concurrently. Streams one `result` event per URL
+    as it finishes (succeeded or failed), then `done` with the totals.
+    """
+    # Links to the same video are analyzed once; the original link is kept since signed URLs need their query
+    unique = {}
+    for url in request.urls:
+        unique.setdefault(canonicalize_video_url(url), url)
+    urls = list(unique.values())
+    concurrency = min(request.concurrency or settings["twelvelabs_batch_concurrency"], len(urls))
+    twelvelabs = TwelveLabsService(shop=request.shop)
+
+    async def results():
+        totals = {"succeeded": 0, "failed": 0}
+        async for result in twelvelabs.analyze_batch(urls, concurrency):
+            totals[result["status"]] += 1
+            yield sse_event("result", result)
+        yield sse_event("done", totals)
+
+    return sse_response(results())
+
+@twelvelabs_router.post("/analyze/jobs", status_code=202)
+async def submit_analyze_job(
     request: AnalyzeRequest,
-    settings: dict = Depends(get_config)    
+    jobs: JobManager = Depends(get_job_manager)
 ):
-    twelvelabs = TwelveLabsService(twelve_labs_api_key=settings["twelvelabs_api_key"])
-    analysis_result = await twelvelabs.analyze_video(
-        video_url=request.url,
+    """Queue an analysis and return its job id immediately."""
+    job = await asyncio.to_thread(
+        jobs.submit,
+        ANALYZE_JOB,
+        {"url": request.url, "shop": request.shop},
+        dedupe_key=content_key(request.shop, canonicalize_video_url(request.url)),
     )
-    return {"status": "success", "data": analysis_result}
\ No newline at end of file
+    return {"status": "accepted", "job_id": job["id"], "job": job}
+
+@twelvelabs_router.get("/jobs/{job_id}")
+async def get_analyze_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=60, description="Long-poll for up to this many seconds"),
+    jobs: JobManager = Depends(get_job_manager)
+):
+    job = await jobs.wait(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"status": "success", "job": job}
+
+@twelvelabs_router.put("/assets")
+async def register_asset(
+    request: RegisterAssetRequest,
+    registry: AssetRegistry = Depends(get_asset_registry)
+):
+    """Register a video that was already indexed in TwelveLabs so it is never uploaded again."""
+    await asyncio.to_thread(
+        registry.record,
+        request.url,
+        request.indexed_asset_id,
+        index_id=request.index_id,
+        status="ready",
+    )
+    return {"status": "success", "asset": await asyncio.to_thread(registry.get, request.url)}
+
+@twelvelabs_router.get("/assets")
+async def get_asset(
+    url: str,
+    registry: AssetRegistry = Depends(get_asset_registry)
+):
+    entry = await asyncio.to_thread(registry.get, url)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"No asset registered for {canonicalize_video_url(url)}")
+    return {"status": "success", "asset": entry}
+
+
+@twelvelabs_router.post("/webhooks/indexing")
+async def indexing_callback(
+    request: Request,
+    tl_signature: str = Header(None),
+    settings: dict = Depends(get_config),
+    waiter: IndexingWaiter = Depends(get_indexing_waiter)
+):
+    """
+    TwelveLabs completion callback: wakes any analysis waiting on the indexed asset so it
+    re-polls now instead of at its next backoff interval. Accepts the event envelope
+    ({"data": {"id": ...}}) or a bare {"indexed_asset_id": ...}.
+    """
+    body = await request.body()
+    secret = settings["twelvelabs_webhook_secret"]
+    if secret and not verify_callback(body, tl_signature, secret):
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+
+    try:
+        event = await request.json()
+    except ValueError:
+        event = None
+    if not isinstance(event, dict):
+        raise HTTPException(status_code=400, detail="Expected a JSON object")
+    data = event.get("data") if isinstance(event.get("data"), dict) else event
+    ids = {str(data[field]) for field in ("indexed_asset_id", "id") if data.get(field)}
+
+    return {"status": "success", "woken": waiter.notify(ids)}
@@ -0,0 +1,132 @@
+"""
+Offline evaluation of the comparison pre-screen thresholds.
+
+Scores labelled (manifesto, summary, verdict) examples with the same similarity the
+/compare endpoints use and reports, for a sweep of thresholds, how many LLM calls each
+cutoff would skip and how often its local verdict would disagree with the label.
+
+Labels come from a JSONL file ({"manifesto", "summary", "verdict"} per line; a missing
+manifesto falls back to --manifesto) or, by default, from the model verdicts of past
+/compare/batch runs stored for --shop, scored against that shop's current manifesto.
+
+Run from backend/:
+    python -m scripts.evaluate_prescreen --shop my-store.myshopify.com
+    python -m scripts.evaluate_prescreen --data labelled.jsonl --manifesto MANIFESTO.md --precision 0.99
+"""
+import argparse
+import json
+import sys
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from services.prescreen import PreScreen
+
+def load_jsonl(path: str, manifesto: Optional[str]) -> List[Tuple[str, str, str]]:
+    examples = []
+    with open(path, encoding="utf-8") as f:
+        for line in filter(str.strip, f):
+            item = json.loads(line)
+            examples.append((item.get("manifesto") or manifesto or "", item["summary"], item["verdict"]))
+    return examples
+
+def load_batches(shop: str) -> List[Tuple[str, str, str]]:
+    """Model verdicts from every stored /compare/batch run for the shop (latest wins per summary)."""
+    from config import get_artifact_store
+    from services.db import connect
+    manifesto = get_artifact_store().read(shop, "manifesto") or ""
+    with connect() as conn:
+        rows = conn.execute(
+            "SELECT content FROM artifacts WHERE shop = ? AND kind = 'comparisons' ORDER BY version",
+            (shop,),
+        ).fetchall()
+
+    labelled: Dict[str, str] = {}
+    for row in rows:
+        for result in json.loads(row["content"]):
+            if result.get("verdict") in ("Yes", "No") and result.get("source", "model") == "model":
+                labelled[result["summary"]] = result["verdict"]
+    return [(manifesto, summary, verdict) for summary, verdict in labelled.items()]
+
+def sweep(scores: np.ndarray, labels: np.ndarray, target: str, thresholds: np.ndarray, below: bool) -> List[Dict]:
+    """Coverage and precision of deciding `target` for every score below (or at/above) each threshold."""
+    rows = []
+    for threshold in thresholds:
+        decided = scores < threshold if below else scores >= threshold
+        count = int(decided.sum())
+        correct = int((labels[decided] == target).sum())
+        rows.append({
+            "threshold": round(float(threshold), 4),
+            "decided": count,
+            "coverage": round(count / len(scores), 4),
+            "precision": round(correct / count, 4) if count else None,
+        })
+    return rows
+
+def recommend(rows: List[Dict], precision: float, widest_first: bool) -> Optional[Dict]:
+    """The threshold deciding the most examples while keeping precision at the target."""
+    ordered = sorted(rows, key=lambda row: row["coverage"], reverse=widest_first)
+    for row in ordered:
+        if row["decided"] and row["precision"] >= precision:
+            return row
+    return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", help="labelled JSONL file")
+    parser.add_argument("--manifesto", help="manifesto file for JSONL lines without one")
+    parser.add_argument("--shop", help="use stored batch verdicts for this shop")
+    parser.add_argument("--precision", type=float, default=0.98, help="minimum agreement with the label for a cutoff")
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    args = parser.parse_args(argv)
+
+    if args.data:
+        manifesto = open(args.manifesto, encoding="utf-8").read() if args.manifesto else None
+        examples = load_jsonl(args.data, manifesto)
+    elif args.shop:
+        examples = load_batches(args.shop)
+    else:
+        parser.error("pass --data or --shop")
+    if not examples:
+        sys.exit("No labelled examples found.")
+
+    screen = PreScreen(no_below=0.0, yes_above=2.0)
+    scores = np.array([screen.score(manifesto, summary) for manifesto, summary, _ in examples])
+    labels = np.array([verdict for _, _, verdict in examples])
+    thresholds = np.unique(np.round(np.quantile(scores, np.linspace(0, 1, 41)), 4))
+
+    no_rows = sweep(scores, labels, "No", np.append(thresholds, thresholds[-1] + 1e-4), below=True)
+    yes_rows = sweep(scores, labels, "Yes", thresholds, below=False)
+    no_pick = recommend(no_rows, args.precision, widest_first=True)
+    yes_pick = recommend(yes_rows, args.precision, widest_first=True)
+    if no_pick and yes_pick and no_pick["threshold"] > yes_pick["threshold"]:
+        yes_pick = None # the bands overlap; settle only the No side
+
+    report = {
+        "examples": len(examples),
+        "labels": {verdict: int((labels == verdict).sum()) for verdict in ("Yes", "No")},
+        "score_quantiles": {
+            verdict: [round(float(q), 4) for q in np.quantile(scores[labels == verdict], [0, 0.25, 0.5, 0.75, 1])]
+            for verdict in ("Yes", "No") if (labels == verdict).any()
+        },
+        "no_below": no_rows,
+        "yes_above": yes_rows,
+        "recommended": {
+            "PRESCREEN_NO_BELOW": no_pick["threshold"] if no_pick else 0.0,
+            "PRESCREEN_YES_ABOVE": yes_pick["threshold"] if yes_pick else 2.0,
+            "llm_calls_skipped": round(((no_pick or {}).get("coverage", 0) + (yes_pick or {}).get("coverage", 0)), 4),
+        },
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{report['examples']} examples: {report['labels']}")
+    for verdict, quantiles in report["score_quantiles"].items():
+        print(f"  {verdict:>3} similarity min/q1/median/q3/max: {quantiles}")
+    for name, rows in (("No below", no_rows), ("Yes at/above", yes_rows)):
+        print(f"\n{name}:   threshold  coverage  precision")
+        for row in rows:
+            print(f"{'':>14}{row['threshold']:>9}  {row['coverage']:>8}  {row['precision'] if row['precision'] is not None else '-':>9}")
+    print(f"\nRecommended at precision >= {args.precision}: {report['recommended']}")
+
+if __name__ == "__main__":
+    main()
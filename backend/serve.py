@@ -0,0 +1,137 @@
+"""
+Production entry point:
+    python serve.py --workers 4 --threads 32
+
+The app is imported once, then the workers are forked from this process and share its
+listening socket, so every worker starts with the modules already loaded (uvicorn's own
+--workers re-imports the app in each one, and main.py's dev server reloads on changes).
+Each worker runs the app's lifespan: it builds and warms its upstream clients before
+taking traffic and closes them on shutdown. A worker that dies is replaced, and the new one
+resumes the jobs it left behind; SIGINT or SIGTERM stops them all gracefully.
+"""
+import argparse
+import importlib
+import logging
+import os
+import signal
+import sys
+import time
+
+STARTED = time.perf_counter() # before the app and its SDKs load
+
+logger = logging.getLogger("serve")
+
+STARTUP_FAILURE = 3 # uvicorn's exit code when the lifespan fails
+
+def load_app(target: str):
+    """"module:attribute" -> the ASGI app."""
+    module, _, attribute = target.partition(":")
+    return getattr(importlib.import_module(module), attribute or "app")
+
+def run_worker(app, config, sock, resume_jobs: bool, replaces: int = None) -> bool:
+    """
+    Serve on the shared socket until told to stop; False if the app never started.
+    A worker that `replaces` a dead one (by pid) picks up the jobs it left queued or running.
+    """
+    import uvicorn
+    app.state.resume_jobs = resume_jobs
+    app.state.jobs_owner = replaces
+    # uvicorn handles SIGINT/SIGTERM while serving, then re-raises the signal once it has shut
+    # down: ignore it then so the worker exits normally and the log queue is flushed (a forked
+    # worker would otherwise also inherit the supervisor's handler)
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, signal.SIG_IGN)
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+    return server.started
+
+def fork_worker(app, config, sock, resume_jobs: bool, replaces: int = None) -> int:
+    pid = os.fork()
+    if pid:
+        return pid
+    # In the worker: exit through SystemExit so atexit handlers (the log queue) still run
+    sys.exit(0 if run_worker(app, config, sock, resume_jobs, replaces) else STARTUP_FAILURE)
+
+def supervise(app, config, sock, count: int):
+    # Only the first worker resumes jobs left over from the last run, or each would rerun them
+    workers = {fork_worker(app, config, sock, resume_jobs=index == 0): index for index in range(count)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = workers.pop(pid, None)
+        if index is None or stopping:
+            continue
+        code = os.waitstatus_to_exitcode(status)
+        if code == STARTUP_FAILURE:
+            logger.error("Worker %d failed to start; stopping", pid)
+            stop(signal.SIGTERM, None)
+            continue
+        logger.warning("Worker %d exited with %d; starting a new one", pid, code)
+        time.sleep(1) # don't spin on a worker that keeps dying
+        if not stopping:
+            workers[fork_worker(app, config, sock, resume_jobs=True, replaces=pid)] = index
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, help="worker processes (default: WEB_WORKERS)")
+    parser.add_argument("--threads", type=int, help="threads for blocking SDK calls per worker (default: THREAD_POOL_SIZE)")
+    parser.add_argument("--app", default="main:app", help='the app to serve, as "module:attribute"')
+    parser.add_argument("--graceful-timeout", type=float, default=30, help="seconds in-flight requests get on shutdown")
+    args = parser.parse_args(argv)
+
+    # Read when config is first loaded, below; workers also split the outbound rate limits
+    if args.threads is not None:
+        os.environ["THREAD_POOL_SIZE"] = str(args.threads)
+    if args.workers is not None:
+        os.environ["WEB_WORKERS"] = str(args.workers)
+
+    app = load_app(args.app)
+    from config import get_config, get_metrics
+    settings = get_config()
+    # Workers build their clients in the lifespan; load what that imports once here so every
+    # fork shares it (httpx loads its transport with the first client)
+    preload = ["httpcore"] + (["twelvelabs"] if settings["twelvelabs_api_key"] else [])
+    for module in preload:
+        importlib.import_module(module)
+    import uvicorn
+
+    seconds = time.perf_counter() - STARTED
+    get_metrics().startup_seconds.set(seconds, "import") # workers inherit it
+    logger.info("Loaded %s in %.3fs", args.app, seconds)
+
+    workers = settings["web_workers"]
+    config = uvicorn.Config(
+        app,
+        host=args.host,
+        port=args.port,
+        lifespan="on",
+        log_config=None, # keep the app's queued log handler for uvicorn's messages too
+        access_log=False, # the request telemetry middleware already logs a line per request
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
+    sock = config.bind_socket()
+    if workers <= 1:
+        sys.exit(0 if run_worker(app, config, sock, resume_jobs=True) else STARTUP_FAILURE)
+
+    logger.info("Forking %d workers", workers)
+    supervise(app, config, sock, workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from config import DEFAULT_SHOP
+from services.db import connect
+from services.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_KINDS = ("manifesto", "summary", "comparison", "comparisons") # comparisons: JSON of the last batch
+
+# Files every service used to share in the working directory
+LEGACY_FILES = {
+    "manifesto": "MANIFESTO.md",
+    "summary": "SUMMARY.md",
+    "comparison": "COMPARISON.md",
+}
+
+class ArtifactStore:
+    """
+    Versioned per-shop artifacts (manifesto, video summary, comparison) in the shared
+    SQLite database, so several shops and several worker processes can run side by side.
+
+    Every write is a new version inside one transaction, so readers never see a partial
+    write. Reads go through an in-process cache that is revalidated with `PRAGMA data_version`,
+    which only changes when some connection commits; unchanged reads never touch the table.
+    """
+
+    def __init__(self, path: str = None, max_versions: int = 10):
+        self.path = path
+        self.max_versions = max_versions
+        self._cache: Dict[Tuple[str, str], Dict] = {}
+        self._cache_data_version: Optional[int] = None
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS artifacts (
+                    shop TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (shop, kind, version)
+                )
+                """
+            )
+        # Dedicated connection used only to probe for commits from other connections
+        self._probe = connect(path, check_same_thread=False)
+        self._probe.execute("PRAGMA data_version")
+        self._import_legacy_files()
+
+    def _connect(self):
+        return connect(self.path)
+
+    def _data_version(self) -> int:
+        with self._lock:
+            return self._probe.execute("PRAGMA data_version").fetchone()[0]
+
+    def get(self, shop: str, kind: str) -> Optional[Dict]:
+        """Latest version of an artifact, or None if it was never written."""
+        data_version = self._data_version()
+        key = (shop, kind)
+        with self._lock:
+            if data_version != self._cache_data_version:
+                # Something was committed since the last read; revalidate entries by version
+                self._cache_data_version = data_version
+                stale = dict(self._cache)
+                self._cache.clear()
+            else:
+                stale = {}
+                if key in self._cache:
+                    return self._cache[key]
+
+        with self._connect() as conn:
+            cached = stale.get(key)
+            if cached is not None:
+                row = conn.execute(
+                    "SELECT MAX(version) FROM artifacts WHERE shop = ? AND kind = ?", key
+                ).fetchone()
+                if row[0] == cached["version"]:
+                    return self._remember(key, cached)
+            row = conn.execute(
+                "SELECT * FROM artifacts WHERE shop = ? AND kind = ? ORDER BY version DESC LIMIT 1",
+                key,
+            ).fetchone()
+
+        return self._remember(key, dict(row)) if row else None
+
+    def read(self, shop: str, kind: str) -> Optional[str]:
+        artifact = self.get(shop, kind)
+        return artifact["content"] if artifact else None
+
+    def put(self, shop: str, kind: str, content: str) -> int:
+        """Atomically store a new version and return its number."""
+        if kind not in ARTIFACT_KINDS:
+            raise ValueError(f"Unknown artifact kind: {kind}")
+
+        with span("artifacts.write", kind=kind):
+            with self._connect() as conn:
+                # IMMEDIATE takes the write lock up front so two workers can't pick the same version
+                conn.execute("BEGIN IMMEDIATE")
+                version = conn.execute(
+                    "SELECT COALESCE(MAX(version), 0) + 1 FROM artifacts WHERE shop = ? AND kind = ?",
+                    (shop, kind),
+                ).fetchone()[0]
+                now = time.time()
+                conn.execute(
+                    "INSERT INTO artifacts (shop, kind, version, content, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (shop, kind, version, content, now),
+                )
+                conn.execute(
+                    "DELETE FROM artifacts WHERE shop = ? AND kind = ? AND version <= ?",
+                    (shop, kind, version - self.max_versions),
+                )
+
+        self._remember((shop, kind), {"shop": shop, "kind": kind, "version": version, "content": content, "created_at": now})
+        return version
+
+    def history(self, shop: str, kind: str) -> List[Dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT shop, kind, version, created_at FROM artifacts WHERE shop = ? AND kind = ? ORDER BY version DESC",
+                (shop, kind),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def _cached(self, key: Tuple[str, str]) -> Optional[Dict]:
+        """Cache hit only if nothing was committed since it was read; never touches the table."""
+        data_version = self._data_version()
+        with self._lock:
+            if data_version == self._cache_data_version:
+                return self._cache.get(key)
+        return None
+
+    async def aget(self, shop: str, kind: str) -> Optional[Dict]:
+        # A valid cache entry is served inline; only real reads leave the event loop
+        return self._cached((shop, kind)) or await asyncio.to_thread(self.get, shop, kind)
+
+    async def aread(self, shop: str, kind: str) -> Optional[str]:
+        artifact = await self.aget(shop, kind)
+        return artifact["content"] if artifact else None
+
+    async def aput(self, shop: str, kind: str, content: str) -> int:
+        return await asyncio.to_thread(self.put, shop, kind, content)
+
+    def _remember(self, key: Tuple[str, str], artifact: Dict) -> Dict:
+        with self._lock:
+            current = self._cache.get(key)
+            if current is None or current["version"] <= artifact["version"]:
+                self._cache[key] = artifact
+        return artifact
+
+    def _import_legacy_files(self):
+        """One-time import of the old working-directory files as the default shop's artifacts."""
+        for kind, filename in LEGACY_FILES.items():
+            if not os.path.isfile(filename):
+                continue
+            try:
+                if self.get(DEFAULT_SHOP, kind) is None:
+                    with open(filename, "r") as f:
+                        self.put(DEFAULT_SHOP, kind, f.read())
+                    logger.info("Imported %s as %s/%s", filename, DEFAULT_SHOP, kind)
+            except (OSError, sqlite3.Error) as e:
+                logger.warning("Legacy import failed for %s: %s", filename, e)
@@ -0,0 +1,139 @@
+import re
+import time
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from services.db import connect
+
+YOUTUBE_HOSTS = ("youtube.com", "youtu.be", "youtube-nocookie.com")
+YOUTUBE_ID = re.compile(r"^[A-Za-z0-9_-]{11}$")
+
+# Query params that only identify where a click came from, never which video it is
+TRACKING_PARAMS = {"fbclid", "gclid", "igshid", "si", "feature", "ref", "ref_src", "mc_cid", "mc_eid", "pp"}
+TRACKING_PREFIXES = ("utm_",)
+
+# Videos indexed by hand before the registry existed
+SEED_ASSETS = {
+    "https://www.youtube.com/watch?v=KhLensmQfEQ": "696c12c8684c0432bbde7e69", # walmart
+}
+
+def _youtube_id(host: str, path: str, query: Dict[str, str]) -> Optional[str]:
+    if host == "youtu.be":
+        candidate = path.strip("/").split("/")[0]
+    elif path == "/watch":
+        candidate = query.get("v", "")
+    else:
+        parts = path.strip("/").split("/")
+        candidate = parts[1] if len(parts) > 1 and parts[0] in ("shorts", "embed", "live", "v") else ""
+    return candidate if YOUTUBE_ID.match(candidate) else None
+
+def canonicalize_video_url(url: str) -> str:
+    """
+    Normalize a video URL so every way of linking the same video maps to one key.
+    youtu.be, /shorts/, /embed/ and watch?v= links collapse to a single watch URL;
+    other URLs lose tracking params, fragments and trailing slashes.
+    """
+    url = url.strip()
+    if "://" not in url:
+        url = f"https://{url}" # pasted without a scheme, which urlsplit would read as a path
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    for prefix in ("www.", "m.", "music."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    ]
+
+    if host in YOUTUBE_HOSTS:
+        video_id = _youtube_id(host, parts.path, dict(query))
+        if video_id:
+            return f"https://www.youtube.com/watch?v={video_id}"
+
+    netloc = host if not parts.port else f"{host}:{parts.port}"
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((scheme, netloc, path, urlencode(sorted(query)), ""))
+
+def is_youtube_url(url: str) -> bool:
+    return canonicalize_video_url(url).startswith("https://www.youtube.com/watch?v=")
+
+
+class AssetRegistry:
+    """Maps canonical video URLs to their TwelveLabs asset and indexed-asset ids."""
+
+    def __init__(self, path: str = None):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS video_assets (
+                    canonical_url TEXT PRIMARY KEY,
+                    source_url TEXT NOT NULL,
+                    index_id TEXT,
+                    asset_id TEXT,
+                    indexed_asset_id TEXT,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            now = time.time()
+            conn.executemany(
+                """
+                INSERT OR IGNORE INTO video_assets
+                    (canonical_url, source_url, indexed_asset_id, status, created_at, updated_at)
+                VALUES (?, ?, ?, 'ready', ?, ?)
+                """,
+                [(url, url, video_id, now, now) for url, video_id in SEED_ASSETS.items()],
+            )
+
+    def _connect(self):
+        return connect(self.path)
+
+    def get(self, video_url: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM video_assets WHERE canonical_url = ?",
+                (canonicalize_video_url(video_url),),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def record(
+        self,
+        video_url: str,
+        indexed_asset_id: str,
+        index_id: Optional[str] = None,
+        asset_id: Optional[str] = None,
+        status: str = "indexing",
+    ):
+        """
+        Remember an upload as soon as it exists so a retry resumes instead of re-uploading.
+        Videos indexed outside this service can be registered directly as `ready`.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO video_assets
+                    (canonical_url, source_url, index_id, asset_id, indexed_asset_id, status, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(canonical_url) DO UPDATE SET
+                    source_url = excluded.source_url,
+                    index_id = excluded.index_id,
+                    asset_id = excluded.asset_id,
+                    indexed_asset_id = excluded.indexed_asset_id,
+                    status = excluded.status,
+                    updated_at = excluded.updated_at
+                """,
+                (canonicalize_video_url(video_url), video_url, index_id, asset_id, indexed_asset_id, status, now, now),
+            )
+
+    def set_status(self, video_url: str, status: str):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE video_assets SET status = ?, updated_at = ? WHERE canonical_url = ?",
+                (status, time.time(), canonicalize_video_url(video_url)),
+            )
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Iterable, Optional, Set, Tuple
+from backboard import BackboardClient
+from services.cache import content_hash
+from services.db import connect
+from services.outbound import OutboundScheduler
+from services.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+async def send_message(client: BackboardClient, *, llm_provider: str, model_name: str, **kwargs) -> Any:
+    """add_message through the outbound scheduler, throttled per model it routes to."""
+    from config import get_outbound_scheduler
+    # A streamed reply is timed to its opening; the rest is paced by the consumer
+    with span("llm.stream_open" if kwargs.get("stream") else "llm.call", model=f"{llm_provider}/{model_name}"):
+        return await get_outbound_scheduler().call(
+            f"backboard/{llm_provider}/{model_name}",
+            lambda: client.add_message(llm_provider=llm_provider, model_name=model_name, **kwargs),
+        )
+
+
+class AssistantRegistry:
+    """
+    Process-wide map of (name, description hash) -> Backboard assistant id.
+    Ids are persisted locally so restarts and other workers reuse the same assistants
+    instead of creating a new one per request.
+    """
+
+    def __init__(self, client: BackboardClient, path: str = None, outbound: OutboundScheduler = None):
+        from config import get_outbound_scheduler
+        self.client = client
+        self.path = path
+        self.outbound = outbound or get_outbound_scheduler()
+        self._ids: Dict[Tuple[str, str], str] = {}
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS backboard_assistants (
+                    name TEXT NOT NULL,
+                    description_hash TEXT NOT NULL,
+                    assistant_id TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (name, description_hash)
+                )
+                """
+            )
+
+    def _connect(self):
+        return connect(self.path)
+
+    async def get_or_create(self, name: str, description: str) -> str:
+        key = (name, content_hash(description))
+        if key in self._ids:
+            return self._ids[key]
+
+        # Only one coroutine per key may hit the network; the rest wait for its id
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            if key in self._ids:
+                return self._ids[key]
+
+            assistant_id = await asyncio.to_thread(self._load, key)
+            if assistant_id is None:
+                with span("backboard.assistant_create", name=name):
+                    assistant = await self.outbound.call(
+                        "backboard",
+                        lambda: self.client.create_assistant(name=name, description=description),
+                    )
+                assistant_id = str(assistant.assistant_id)
+                logger.info("Created Backboard assistant %s: id=%s", name, assistant_id)
+                await asyncio.to_thread(self._store, key, assistant_id)
+
+            self._ids[key] = assistant_id
+            return assistant_id
+
+    def _load(self, key: Tuple[str, str]) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT assistant_id FROM backboard_assistants WHERE name = ? AND description_hash = ?",
+                key,
+            ).fetchone()
+        return row["assistant_id"] if row else None
+
+    def _store(self, key: Tuple[str, str], assistant_id: str):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO backboard_assistants VALUES (?, ?, ?, ?)",
+                (*key, assistant_id, time.time()),
+            )
+
+    async def warm_up(self, specs: Iterable[Tuple[str, str]]):
+        """Resolve every known assistant at startup so the first request skips creation."""
+        results = await asyncio.gather(
+            *(self.get_or_create(name, description) for name, description in specs),
+            return_exceptions=True,
+        )
+        for (name, _), result in zip(specs, results):
+            if isinstance(result, Exception):
+                logger.warning("Assistant warm-up failed for %s: %s", name, result)
+
+
+@dataclass
+class PooledThread:
+    thread_id: str
+    created_at: float = field(default_factory=time.monotonic)
+    messages: int = 0
+    context: Set[str] = field(default_factory=set) # static prompt sections this thread already carries
+
+
+class ThreadPool:
+    """
+    Per-shop pool of Backboard threads shared by every service.
+    A thread is leased to one request at a time, returned to the pool afterwards and
+    recycled once it has carried `max_messages` messages or is older than `max_age_seconds`,
+    which keeps its accumulated context (and prompt size) bounded.
+    """
+
+    def __init__(
+        self,
+        client: BackboardClient,
+        max_messages: int = 10,
+        max_age_seconds: float = 3600,
+        max_idle_per_key: int = 4,
+        outbound: OutboundScheduler = None,
+    ):
+        from config import get_outbound_scheduler
+        self.client = client
+        self.outbound = outbound or get_outbound_scheduler()
+        self.max_messages = max_messages
+        self.max_age_seconds = max_age_seconds
+        self.max_idle_per_key = max_idle_per_key
+        self._idle: Dict[Tuple[str, str], Deque[PooledThread]] = {}
+        self._stats = {"created": 0, "reused": 0, "recycled": 0}
+
+    @asynccontextmanager
+    async def lease(self, shop: str, assistant_id: str):
+        """
+        Borrow a thread for one exchange. A failed exchange discards the thread,
+        since its server-side state is unknown.
+        """
+        pooled = await self._acquire(shop, assistant_id)
+        try:
+            yield pooled
+        except BaseException:
+            self._stats["recycled"] += 1
+            raise
+        else:
+            pooled.messages += 1
+            self._release(shop, assistant_id, pooled)
+
+    async def _acquire(self, shop: str, assistant_id: str) -> PooledThread:
+        idle = self._idle.get((shop, assistant_id))
+        while idle:
+            pooled = idle.popleft()
+            if not self._expired(pooled):
+                self._stats["reused"] += 1
+                return pooled
+            self._stats["recycled"] += 1
+
+        with span("backboard.thread_create"):
+            thread = await self.outbound.call("backboard", lambda: self.client.create_thread(assistant_id))
+        self._stats["created"] += 1
+        return PooledThread(thread_id=str(thread.thread_id))
+
+    def _release(self, shop: str, assistant_id: str, pooled: PooledThread):
+        idle = self._idle.setdefault((shop, assistant_id), deque())
+        if self._expired(pooled) or len(idle) >= self.max_idle_per_key:
+            self._stats["recycled"] += 1
+            return
+        idle.append(pooled)
+
+    def _expired(self, pooled: PooledThread) -> bool:
+        return (
+            pooled.messages >= self.max_messages
+            or time.monotonic() - pooled.created_at >= self.max_age_seconds
+        )
+
+    def stats(self) -> Dict:
+        return {**self._stats, "idle": sum(len(idle) for idle in self._idle.values())}
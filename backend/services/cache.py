@@ -0,0 +1,209 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from services.db import connect
+
+logger = logging.getLogger(__name__)
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def content_key(*parts: str) -> str:
+    """Build a cache key from the content itself, so equal inputs always hit the same entry."""
+    return content_hash("\x1f".join(content_hash(part) for part in parts))
+
+
+class ResultCache:
+    """
+    Two-tier cache for expensive upstream results.
+    A size-bounded in-memory LRU sits in front of a SQLite tier shared by every worker,
+    and both tiers honour the same TTL. Values must be JSON-serializable.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        max_entries: int = 256,
+        max_disk_entries: int = 5000,
+        ttl_seconds: float = 86400,
+        path: str = None,
+    ):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict() # key -> (value, expires_at, scope)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expirations": 0}
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS result_cache (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    scope TEXT NOT NULL DEFAULT '',
+                    PRIMARY KEY (namespace, key)
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS result_cache_scopes (
+                    namespace TEXT NOT NULL,
+                    scope TEXT NOT NULL,
+                    generation TEXT NOT NULL,
+                    PRIMARY KEY (namespace, scope)
+                )
+                """
+            )
+
+    def _connect(self):
+        return connect(self.path)
+
+    def get(self, key: str) -> Optional[Any]:
+        found, value = self._get_memory(key)
+        return value if found else self._get_disk(key)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """Async lookup: memory hits return inline, only the disk tier leaves the event loop."""
+        found, value = self._get_memory(key)
+        return value if found else await asyncio.to_thread(self._get_disk, key)
+
+    async def aset(self, key: str, value: Any, ttl_seconds: float = None, scope: str = ""):
+        await asyncio.to_thread(self.set, key, value, ttl_seconds, scope)
+
+    def _get_memory(self, key: str):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return False, None
+            value, expires_at, _ = entry
+            if expires_at > time.time():
+                self._memory.move_to_end(key)
+                self._stats["hits"] += 1
+                self._stats["memory_hits"] += 1
+                return True, value
+            # Expired here means expired on disk too; counted once in _get_disk
+            del self._memory[key]
+            return False, None
+
+    def _get_disk(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, expires_at, scope FROM result_cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is not None and row["expires_at"] <= now:
+                conn.execute("DELETE FROM result_cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+                self._count("expirations")
+                row = None
+            if row is not None:
+                conn.execute(
+                    "UPDATE result_cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                    (now, self.namespace, key),
+                )
+
+        if row is None:
+            self._count("misses")
+            return None
+
+        value = json.loads(row["value"])
+        self._remember(key, value, row["expires_at"], row["scope"])
+        with self._lock:
+            self._stats["hits"] += 1
+            self._stats["disk_hits"] += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl_seconds: float = None, scope: str = ""):
+        """`scope` groups entries that ensure_generation can drop together, e.g. one shop's."""
+        now = time.time()
+        expires_at = now + (ttl_seconds or self.ttl_seconds)
+        self._remember(key, value, expires_at, scope)
+        self._count("sets")
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO result_cache (namespace, key, value, expires_at, accessed_at, scope)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (self.namespace, key, json.dumps(value), expires_at, now, scope),
+            )
+            # Trim the disk tier back to its bound, dropping expired and least recently used rows first
+            conn.execute("DELETE FROM result_cache WHERE namespace = ? AND expires_at <= ?", (self.namespace, now))
+            conn.execute(
+                """
+                DELETE FROM result_cache WHERE namespace = ? AND key IN (
+                    SELECT key FROM result_cache WHERE namespace = ?
+                    ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.namespace, self.namespace, self.max_disk_entries),
+            )
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM result_cache WHERE namespace = ?", (self.namespace,))
+
+    def ensure_generation(self, generation: str, scope: str = "") -> bool:
+        """
+        Drop a scope's entries when the content they depend on has changed.
+        Returns True if entries were invalidated.
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT generation FROM result_cache_scopes WHERE namespace = ? AND scope = ?",
+                (self.namespace, scope),
+            ).fetchone()
+            if row is not None and row["generation"] == generation:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO result_cache_scopes (namespace, scope, generation) VALUES (?, ?, ?)",
+                (self.namespace, scope, generation),
+            )
+            if row is None:
+                return False
+            conn.execute("DELETE FROM result_cache WHERE namespace = ? AND scope = ?", (self.namespace, scope))
+
+        with self._lock:
+            for key in [key for key, entry in self._memory.items() if entry[2] == scope]:
+                del self._memory[key]
+        logger.info("Cache '%s' invalidated for '%s': dependency changed", self.namespace, scope)
+        return True
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        with self._connect() as conn:
+            stats["disk_entries"] = conn.execute(
+                "SELECT COUNT(*) FROM result_cache WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+        return stats
+
+    def _remember(self, key: str, value: Any, expires_at: float, scope: str = ""):
+        with self._lock:
+            self._memory[key] = (value, expires_at, scope)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
@@ -1,35 +1,66 @@
-import requests
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional
 from backboard import BackboardClient
-import time
+from config import DEFAULT_SHOP
+from services.artifact_store import ArtifactStore
+from services.backboard_pool import AssistantRegistry, ThreadPool, send_message
+from services.model_router import ModelRoute, ModelRouter
+from services.product_index import ProductIndex, product_line
+from services.prompt_budget import PromptBudget, PromptSection
+from services.streaming import backboard_content
+import asyncio
 import random
 
+BRAND_STRATEGIST_ASSISTANT = "BrandGuardianStrategist"
+
+def brand_strategist_description(manifesto: str) -> str:
+    return (
+        "You are the Lead Brand Strategist. Your mission is to protect our brand identity "
+        "while scaling the success of viral content. Use the provided Manifesto "
+        "as your absolute law for voice, tone, and decision-making.\n\n"
+        f"MANIFESTO:\n{manifesto}"
+    )
+
 class CampaignService:
-    def __init__(self, client: BackboardClient):
+    def __init__(
+        self,
+        client: BackboardClient,
+        shop: str = DEFAULT_SHOP,
+        assistants: AssistantRegistry = None,
+        threads: ThreadPool = None,
+        artifacts: ArtifactStore = None,
+        models: ModelRouter = None,
+        budget: PromptBudget = None,
+        products: ProductIndex = None,
+    ):
+        from config import get_assistant_registry, get_thread_pool, get_artifact_store, get_model_router, get_prompt_budget, get_product_index, get_config
         self.backboard_client = client
-        self.manifesto = self._load_manifesto()
-        self.assistant = None
+        self.shop = shop
+        self.manifesto = None
+        self.assistant_id = None
+        self.assistants = assistants or get_assistant_registry()
+        self.threads = threads or get_thread_pool()
+        self.artifacts = artifacts or get_artifact_store()
+        self.models = models or get_model_router()
+        self.budget = budget or get_prompt_budget("email")
+        self.products = products or get_product_index()
+        self.top_k = get_config()["product_index_top_k"]
 
-    def _load_manifesto(self) -> str:
-        with open("MANIFESTO.md", "r") as f:
-            return f.read()
+    async def _load_manifesto(self) -> str:
+        if self.manifesto is None:
+            self.manifesto = await self.artifacts.aread(self.shop, "manifesto") or ""
+        return self.manifesto
         
     async def _ensure_assistant(self):
         """Internal helper to ensure the Brand Guardian exists."""
-        if not self.assistant:
-            description = (
-                "You are the Lead Brand Strategist. Your mission is to protect our brand identity "
-                "while scaling the success of viral content. Use the provided Manifesto "
-                "as your absolute law for voice, tone, and decision-making.\n\n"
-                f"MANIFESTO:\n{self.manifesto}"
-            )
-            self.assistant = await self.backboard_client.create_assistant(
-                name="BrandGuardianStrategist",
-                description=description,
+        await self._load_manifesto()
+        if not self.assistant_id:
+            self.assistant_id = await self.assistants.get_or_create(
+                BRAND_STRATEGIST_ASSISTANT,
+                brand_strategist_description(self.manifesto),
             )
 
     async def generate_video_scripts(self) -> Dict:
-            time.sleep(15)
+            await asyncio.sleep(15)
 
             list = ["elevenlabs1.mp4", "elevenlabs2.mp4", "elevenlabs3.mp4", "elevenlabs4.mp4", "elevenlabs5.mp4"]
     
@@ -40,41 +71,97 @@ class CampaignService:
                 "elevenlabs_video_file_paths": random_selection,
             }
     
-    async def generate_draft_email(self) -> Dict:
-        """Generates email draft. Can reuse a thread to maintain context."""
-        try:
-            await self._ensure_assistant()
-            
-            thread_id = None
+    async def _email_prompt(self, summary: Optional[str] = None, comparison: Optional[str] = None) -> str:
+        await self._ensure_assistant()
 
-            # Reuse existing thread if provided, otherwise create new
-            active_thread_id = thread_id or (await self.backboard_client.create_thread(self.assistant.assistant_id)).thread_id
+        # Callers that already hold the video context (the pipeline) pass it in; otherwise use the saved one
+        if summary is None or comparison is None:
+            saved_summary, saved_comparison = await asyncio.gather(
+                self.artifacts.aread(self.shop, "summary"),
+                self.artifacts.aread(self.shop, "comparison"),
+            )
+            summary = saved_summary if summary is None else summary
+            comparison = saved_comparison if comparison is None else comparison
 
-            hit_video_summary = ""
+        # Only the few catalog items that match this video, not the whole catalog
+        matches = await self.products.atop_k(self.shop, summary, self.top_k) if summary else []
+        featured = "\n".join(product_line(product) for product in matches)
 
-            with open("SUMMARY.md", "r") as f:
-                hit_video_summary += f.read()
+        # The manifesto is already in the assistant's instructions, so it isn't repeated here;
+        # if the video context is too long, the summary is cut before the products and the verdict
+        prompt, _ = self.budget.build([
+            PromptSection("summary", f"Context: {summary or ''}", priority=0),
+            PromptSection("products", f"Our products that fit this video (feature them where natural):\n{featured}" if featured else "", priority=1),
+            PromptSection("comparison", comparison or "", priority=2),
+            PromptSection("manifesto", self.manifesto, in_assistant=True),
+            PromptSection(
+                "task",
+                "TASK: Create a marketing email draft that leverages this viral momentum. Make it less than 60 words. "
+                "Replace all mentions of brand to align with our Manifesto (in your instructions).\n"
+                "STRATEGY: Do not be pushy. Align with the Manifesto's values. Drive traffic without devaluing the brand.",
+                required=True,
+            ),
+        ])
+        return prompt
 
-            with open("COMPARISON.md", "r") as f:
-                hit_video_summary += "\n\n" + f.read()
+    async def generate_draft_email(self, summary: Optional[str] = None, comparison: Optional[str] = None) -> Dict:
+        """Generates email draft within the "email" latency budget, falling back to faster models."""
+        try:
+            prompt = await self._email_prompt(summary, comparison)
 
-            prompt = f"""
-            Context: {hit_video_summary}
-            TASK: Create a marketing email draft that leverages this viral momentum. Make it less than 60 words. Replace all mentions of brand to align with our Manifesto ({self.manifesto}).
-            STRATEGY: Do not be pushy. Align with the Manifesto's values. Drive traffic without devaluing the brand.
-            """
+            async def send(route: ModelRoute):
+                # Reuse a pooled thread for this shop, otherwise create new
+                async with self.threads.lease(self.shop, self.assistant_id) as thread:
+                    response = await send_message(
+                        self.backboard_client,
+                        thread_id=thread.thread_id,
+                        content=prompt,
+                        llm_provider=route.provider,
+                        model_name=route.model,
+                        stream=False
+                    )
+                return thread.thread_id, response.content
 
-            response = await self.backboard_client.add_message(
-                thread_id=active_thread_id,
-                content=prompt,
-                llm_provider="anthropic",
-                model_name="claude-opus-4-20250514", 
-                stream=False
-            )
+            (thread_id, email_content), route = await self.models.run("email", send)
 
             return {
-                "thread_id": active_thread_id,
-                "email_content": response.content,
+                "thread_id": thread_id,
+                "email_content": email_content,
+                "model": route.name,
             }
         except Exception as e:
-            return {"error": f"Email Draft Failed: {str(e)}"}
\ No newline at end of file
+            return {"error": f"Email Draft Failed: {str(e)}"}
+
+    async def stream_draft_email(self) -> AsyncIterator:
+        """Yield the draft as it is written, then the same dict generate_draft_email returns."""
+        prompt = await self._email_prompt()
+        thread_id = None
+
+        async def open_stream(route: ModelRoute) -> AsyncIterator[str]:
+            nonlocal thread_id
+            async with self.threads.lease(self.shop, self.assistant_id) as thread:
+                thread_id = thread.thread_id
+                chunks = await send_message(
+                    self.backboard_client,
+                    thread_id=thread.thread_id,
+                    content=prompt,
+                    llm_provider=route.provider,
+                    model_name=route.model,
+                    stream=True
+                )
+                async for text in backboard_content(chunks):
+                    yield text
+
+        parts, model = [], None
+        async for item in self.models.stream("email", open_stream):
+            if isinstance(item, ModelRoute):
+                model = item.name
+                continue
+            parts.append(item)
+            yield item
+
+        yield {
+            "thread_id": thread_id,
+            "email_content": "".join(parts),
+            "model": model,
+        }
@@ -0,0 +1,94 @@
+import asyncio
+import hashlib
+import time
+from typing import Dict, Optional
+from services.db import connect
+
+class CatalogFingerprint:
+    """
+    Order-independent hash over product ids, updatedAt and tags.
+    Per-product digests are summed, so the catalog streams through in O(1) memory
+    and pagination order does not matter.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.count = 0
+
+    def add(self, product: Dict):
+        tags = ",".join(sorted(product["tags"]))
+        digest = hashlib.sha256(f"{product['id']}|{product['updated_at']}|{tags}".encode("utf-8")).digest()
+        self.total = (self.total + int.from_bytes(digest, "big")) % (1 << 256)
+        self.count += 1
+
+    def hexdigest(self) -> str:
+        return f"{self.count}:{self.total:064x}"
+
+
+class CatalogFingerprintStore:
+    """
+    Remembers the catalog fingerprint each shop's manifesto was built from, and whether
+    a products webhook has marked it stale since. Every webhook also bumps a generation,
+    so a manifesto built from a scan that a webhook overtook doesn't clear the flag.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS catalog_fingerprints (
+                    shop TEXT PRIMARY KEY,
+                    fingerprint TEXT NOT NULL,
+                    stale INTEGER NOT NULL DEFAULT 0,
+                    generation INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _connect(self):
+        return connect(self.path)
+
+    def get(self, shop: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM catalog_fingerprints WHERE shop = ?", (shop,)).fetchone()
+        if row is None:
+            return None
+        state = dict(row)
+        state["stale"] = bool(state["stale"])
+        return state
+
+    def save(self, shop: str, fingerprint: str, generation: int):
+        """
+        Record a freshly computed fingerprint. The stale flag is cleared only if the
+        generation is still the one read before the scan started.
+        """
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO catalog_fingerprints (shop, fingerprint, stale, generation, updated_at) VALUES (?, ?, 0, 0, ?)
+                ON CONFLICT (shop) DO UPDATE SET
+                    fingerprint = excluded.fingerprint,
+                    stale = CASE WHEN generation = ? THEN 0 ELSE stale END,
+                    updated_at = excluded.updated_at
+                """,
+                (shop, fingerprint, time.time(), generation),
+            )
+
+    def mark_stale(self, shop: str) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE catalog_fingerprints SET stale = 1, generation = generation + 1, updated_at = ? WHERE shop = ?",
+                (time.time(), shop),
+            )
+        return cursor.rowcount > 0
+
+    async def aget(self, shop: str) -> Optional[Dict]:
+        return await asyncio.to_thread(self.get, shop)
+
+    async def asave(self, shop: str, fingerprint: str, generation: int):
+        await asyncio.to_thread(self.save, shop, fingerprint, generation)
+
+    async def amark_stale(self, shop: str) -> bool:
+        return await asyncio.to_thread(self.mark_stale, shop)
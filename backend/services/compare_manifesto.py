@@ -1,23 +1,30 @@
-import os
-import requests
+import asyncio
+import json
+import logging
+import re
 from backboard import BackboardClient
-from typing import List
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from config import DEFAULT_SHOP
+from services.artifact_store import ArtifactStore
+from services.cache import ResultCache, content_hash, content_key
+from services.backboard_pool import AssistantRegistry, ThreadPool, send_message
+from services.model_router import ModelRoute, ModelRouter
+from services.outbound import batch_priority
+from services.prescreen import PreScreen
+from services.prompt_budget import PromptBudget, PromptSection
+from services.streaming import backboard_content
 
-class CompareManifestoService:
-    def __init__(self, summary: str, backboard_api_key: str, client: BackboardClient = None):
-        with open("MANIFESTO.md", "r") as f:
-            self.manifesto = f.read()
-        self.summary = summary
-        self.backboard_api_key = backboard_api_key
-        self.backboard_client = client
+logger = logging.getLogger(__name__)
 
-    
-    async def _generate_comparison_with_backboard(self, summary: str) -> str:
-        prompt = f"The store manifesto file is a source of truth that represents the branding of the company. It is here:\n{self.manifesto}. The summary is a short summary of a given video, describing the indentity and storytelling method of the video. It is here:\n{summary}"
-        
+COMPARISON_ERROR = "Error generating comparison."
 
+class ComparisonError(Exception):
+    """The model could not give a verdict, even after the outbound scheduler's retries."""
 
-        description= """
+# One assistant serves every shop, and Backboard memory is per assistant, so comparisons
+# never turn memory on: it would carry one shop's manifesto and verdicts into another's.
+COMPARE_ASSISTANT = "Compare Manifesto"
+COMPARE_DESCRIPTION = """
         You are an expert marketing director. Using the manifesto file as a source of truth, leverage the video summary
         to determine if the video is appropriate for the company to use as inspiration. Output a binary answer of "Yes" or "No",
         and then provide a short summary of why. The summary should not be longer than 30 words.
@@ -27,30 +34,303 @@ class CompareManifestoService:
         DO NOT BE CRINGE OR GENERIC. KEEP YOUR SENTENCES SHORT AND CLEARLY SUPPORT YOUR OWN REASONING
 """
 
+# Packed batch prompts stay well inside the model's context next to the manifesto
+MAX_PACK_PROMPT_CHARS = 16000
+
+VERDICT_PATTERN = re.compile(r"^\W*(yes|no)\b\W*(.*)$", re.IGNORECASE | re.DOTALL)
+
+def parse_verdict(comparison: str) -> Dict:
+    """Split a free-text comparison ("Yes. Because ...") into {"verdict": "Yes"|"No"|None, "reason"}."""
+    match = VERDICT_PATTERN.match(comparison or "")
+    if match is None:
+        return {"verdict": None, "reason": (comparison or "").strip()}
+    return {"verdict": match.group(1).capitalize(), "reason": match.group(2).strip()}
+
+def parse_packed(answer: str) -> Dict[int, Dict]:
+    """
+    Read the {"id", "verdict", "reason"} objects a packed prompt asks for, keyed by id.
+    Every complete object counts, so a truncated or chatty answer still settles the
+    summaries it covers; anything malformed is skipped and retried on its own.
+    """
+    decoder = json.JSONDecoder()
+    verdicts = {}
+    position = answer.find("{")
+    while position != -1:
         try:
-            assistant = await self.backboard_client.create_assistant(
-                name="Compare Manifesto",
-                description=description,
-            )
-
-            thread = await self.backboard_client.create_thread(assistant.assistant_id)
-
-            response = await self.backboard_client.add_message(
-                thread_id=thread.thread_id,
-                content=prompt,
-                llm_provider="google",
-                model_name="gemini-2.5-flash",
-                memory="Auto",
-                stream=False
-            )
+            item, end = decoder.raw_decode(answer, position)
+        except ValueError:
+            position = answer.find("{", position + 1)
+            continue
+        position = answer.find("{", end)
+        if not isinstance(item, dict):
+            continue
+        index = item.get("id")
+        if isinstance(index, str) and index.strip().isdigit():
+            index = int(index)
+        parsed = parse_verdict(str(item.get("verdict", "")))
+        if parsed["verdict"] is not None and isinstance(index, int) and not isinstance(index, bool):
+            verdicts[index] = {"verdict": parsed["verdict"], "reason": str(item.get("reason", "")).strip()}
+    return verdicts
+
+def format_verdict(verdict: Dict) -> str:
+    return f"{verdict['verdict']}. {verdict['reason']}"
+
+def pack_summaries(summaries: List[str], pack_size: int, max_chars: int = MAX_PACK_PROMPT_CHARS) -> List[List[int]]:
+    """Group summary indexes into packs of at most `pack_size` that fit in `max_chars`."""
+    packs, current, size = [], [], 0
+    for index, summary in enumerate(summaries):
+        if current and (len(current) >= pack_size or size + len(summary) > max_chars):
+            packs.append(current)
+            current, size = [], 0
+        current.append(index)
+        size += len(summary)
+    if current:
+        packs.append(current)
+    return packs
+
+class CompareManifestoService:
+    def __init__(
+        self,
+        summary: str,
+        backboard_api_key: str,
+        client: BackboardClient = None,
+        shop: str = DEFAULT_SHOP,
+        assistants: AssistantRegistry = None,
+        threads: ThreadPool = None,
+        artifacts: ArtifactStore = None,
+        models: ModelRouter = None,
+        budget: PromptBudget = None,
+        prescreen: PreScreen = None,
+    ):
+        from config import get_assistant_registry, get_thread_pool, get_artifact_store, get_model_router, get_prompt_budget, get_prescreen
+        self.manifesto = None
+        self.model = None # provider/model that served the last single comparison
+        self.source = None # "prescreen" or "model": what decided the last single comparison
+        self.summary = summary
+        self.shop = shop
+        self.backboard_api_key = backboard_api_key
+        self.backboard_client = client
+        self.assistants = assistants or get_assistant_registry()
+        self.threads = threads or get_thread_pool()
+        self.artifacts = artifacts or get_artifact_store()
+        self.models = models or get_model_router()
+        self.budget = budget or get_prompt_budget("compare")
+        self.prescreen = prescreen or get_prescreen()
+
+    
+    async def load_manifesto(self) -> str:
+        if self.manifesto is None:
+            self.manifesto = await self.artifacts.aread(self.shop, "manifesto") or ""
+        return self.manifesto
+
+    async def _manifesto_section(self) -> PromptSection:
+        # The context, not the subject: a long manifesto is cut to fit before anything being judged
+        await self.load_manifesto()
+        return PromptSection(
+            "manifesto",
+            f"The store manifesto file is a source of truth that represents the branding of the company. It is here:\n{self.manifesto}.",
+            static=True,
+            reference="The store manifesto given earlier in this conversation is the source of truth for the company's branding.",
+        )
+
+    async def _comparison_sections(self, summary: str) -> List[PromptSection]:
+        return [
+            await self._manifesto_section(),
+            PromptSection(
+                "summary",
+                f"The summary is a short summary of a given video, describing the indentity and storytelling method of the video. It is here:\n{summary}",
+                required=True,
+            ),
+        ]
+
+    async def _packed_sections(self, summaries: Dict[int, str]) -> List[PromptSection]:
+        listed = "\n".join(f"[{index}] {summary}" for index, summary in summaries.items())
+        return [
+            await self._manifesto_section(),
+            PromptSection(
+                "summaries",
+                f"Below are {len(summaries)} short video summaries, each with an id, describing the identity and storytelling method of a video. "
+                "For each one, decide if the video is appropriate for the company to use as inspiration.\n"
+                'Respond with only a JSON array holding one object per summary: {"id": <id>, "verdict": "Yes" or "No", "reason": "<at most 30 words>"}.\n'
+                f"{listed}",
+                required=True,
+            ),
+        ]
+
+    async def _ask(self, sections: List[PromptSection], memory: Optional[str] = None) -> Tuple[str, str]:
+        """(answer, provider/model that gave it) within the "compare" latency and prompt budgets."""
+        assistant_id = await self.assistants.get_or_create(COMPARE_ASSISTANT, COMPARE_DESCRIPTION)
+
+        async def send(route: ModelRoute) -> str:
+            # Each attempt leases its own thread so a hedge never shares a conversation
+            async with self.threads.lease(self.shop, assistant_id) as thread:
+                prompt, carried = self.budget.build(sections, thread.context)
+                response = await send_message(
+                    self.backboard_client,
+                    thread_id=thread.thread_id,
+                    content=prompt,
+                    llm_provider=route.provider,
+                    model_name=route.model,
+                    memory=memory,
+                    stream=False
+                )
+                thread.context |= carried
+            return response.content
+
+        content, route = await self.models.run("compare", send)
+        return content, route.name
+
+    async def _screen(self, summary: str) -> Optional[Dict]:
+        verdict = self.prescreen.screen(await self.load_manifesto(), summary)
+        return {**verdict, "source": "prescreen"} if verdict is not None else None
+
+    async def generate_comparison(self, summary: str) -> str:
+        """Verdict for one summary: decided locally when the pre-screen is sure, otherwise by the model."""
+        screened = await self._screen(summary)
+        if screened is None:
+            return await self._generate_comparison_with_backboard(summary)
+
+        self.source, self.model = "prescreen", None
+        comparison = format_verdict(screened)
+        await self._save_comparison(comparison)
+        return comparison
 
+    async def _generate_comparison_with_backboard(self, summary: str) -> str:
+        sections = await self._comparison_sections(summary)
+
+        try:
+            comparison, self.model = await self._ask(sections)
+            self.source = "model"
+            await self._save_comparison(comparison)
+
+            return comparison
+        except Exception as e:
+            logger.error("Backboard Error: %s", e)
+            raise ComparisonError(COMPARISON_ERROR) from e
+
+    async def compare_batch(self, summaries: List[str], concurrency: int = 4, pack_size: int = 5) -> List[Dict]:
+        """
+        Verdicts for many summaries against one manifesto load, in input order.
+        Clear cases are settled by the local pre-screen; the rest are packed several to a
+        prompt, packs run concurrently, and any summary a packed answer leaves out is retried
+        on its own. Failures get verdict None and an error.
+        """
+        await self.load_manifesto()
+        semaphore = asyncio.Semaphore(concurrency)
+        verdicts: Dict[int, Dict] = {}
+        for index, summary in enumerate(summaries):
+            screened = await self._screen(summary)
+            if screened is not None:
+                verdicts[index] = screened
+        ambiguous = [index for index in range(len(summaries)) if index not in verdicts]
+
+        async def compare_one(index: int):
             try:
-                with open("COMPARISON.md", "w") as f:
-                    f.write(response.content)
+                comparison, model = await self._ask(await self._comparison_sections(summaries[index]))
+                verdicts[index] = {**parse_verdict(comparison), "model": model, "source": "model"}
             except Exception as e:
-                print(f"File Write Error: {e}")
+                logger.error("Backboard Error: %s", e)
+                verdicts[index] = {"verdict": None, "reason": COMPARISON_ERROR, "error": str(e) or type(e).__name__}
 
-            return response.content
+        async def compare_pack(pack: List[int]):
+            async with semaphore:
+                if len(pack) > 1:
+                    try:
+                        answer, model = await self._ask(await self._packed_sections({i: summaries[i] for i in pack}))
+                        verdicts.update({i: {**v, "model": model, "source": "model"} for i, v in parse_packed(answer).items() if i in pack})
+                    except Exception as e:
+                        logger.warning("Packed comparison failed, comparing one by one: %s", e)
+                for index in pack:
+                    if index not in verdicts:
+                        await compare_one(index)
+
+        # Batch screening yields upstream capacity to interactive requests
+        with batch_priority():
+            packs = [[ambiguous[i] for i in pack] for pack in pack_summaries([summaries[i] for i in ambiguous], pack_size)]
+            await asyncio.gather(*(compare_pack(pack) for pack in packs))
+        return [verdicts[index] for index in range(len(summaries))]
+
+    async def save_batch(self, results: List[Dict]):
+        try:
+            await self.artifacts.aput(self.shop, "comparisons", json.dumps(results))
+        except Exception as e:
+            logger.error("Artifact Write Error: %s", e)
+
+    async def _save_comparison(self, comparison: str):
+        try:
+            await self.artifacts.aput(self.shop, "comparison", comparison)
         except Exception as e:
-            print(f"Backboard Error: {e}")
-            return "Error generating comparison."
\ No newline at end of file
+            logger.error("Artifact Write Error: %s", e)
+
+    async def stream_comparison(self, summary: str) -> AsyncIterator:
+        """Yield the verdict as it is generated, then {"comparison", "model", "source"} once it is saved."""
+        screened = await self._screen(summary)
+        if screened is not None:
+            comparison = format_verdict(screened)
+            await self._save_comparison(comparison)
+            yield comparison
+            yield {"comparison": comparison, "model": None, "source": "prescreen"}
+            return
+
+        sections = await self._comparison_sections(summary)
+        assistant_id = await self.assistants.get_or_create(COMPARE_ASSISTANT, COMPARE_DESCRIPTION)
+
+        async def open_stream(route: ModelRoute) -> AsyncIterator[str]:
+            async with self.threads.lease(self.shop, assistant_id) as thread:
+                prompt, carried = self.budget.build(sections, thread.context)
+                chunks = await send_message(
+                    self.backboard_client,
+                    thread_id=thread.thread_id,
+                    content=prompt,
+                    llm_provider=route.provider,
+                    model_name=route.model,
+                    memory=None,
+                    stream=True
+                )
+                async for text in backboard_content(chunks):
+                    yield text
+                thread.context |= carried
+
+        parts = []
+        async for item in self.models.stream("compare", open_stream):
+            if isinstance(item, ModelRoute):
+                self.model = item.name
+                continue
+            parts.append(item)
+            yield item
+
+        comparison = "".join(parts)
+        await self._save_comparison(comparison)
+        yield {"comparison": comparison, "model": self.model, "source": "model"}
+
+
+async def load_cached_manifesto(service: CompareManifestoService, cache: ResultCache) -> str:
+    manifesto = await service.load_manifesto()
+
+    # A new manifesto makes every cached verdict for that shop stale
+    await asyncio.to_thread(cache.ensure_generation, content_hash(manifesto), service.shop)
+    return manifesto
+
+async def compare_with_cache(service: CompareManifestoService, summary: str, cache: ResultCache) -> Dict:
+    """
+    One summary the way /compare judges it: a cached model verdict if there is one, otherwise
+    the pre-screen or the model. Identical comparisons already running are joined, not repeated.
+    """
+    from config import get_single_flight
+    manifesto = await load_cached_manifesto(service, cache)
+    key = content_key(manifesto, summary)
+
+    async def compare():
+        result = await cache.aget(key)
+        if result is not None:
+            await service._save_comparison(result)
+            return {"comparison": result, "cached": True, "model": None, "source": "model"}
+
+        result = await service.generate_comparison(summary)
+        # Pre-screen verdicts are instant and follow the current thresholds, so only model verdicts are cached
+        if service.source == "model":
+            await cache.aset(key, result, scope=service.shop)
+
+        return {"comparison": result, "cached": False, "model": service.model, "source": service.source}
+
+    return await get_single_flight("compare").do(content_key(service.shop, key), compare)
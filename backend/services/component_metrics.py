@@ -0,0 +1,105 @@
+from typing import Dict, Iterable, List, Tuple
+from services.telemetry import Collected, Metrics
+
+Samples = List[Tuple[Tuple[str, ...], float]]
+
+def _flatten(stats: Dict, depth: int) -> Iterable[Tuple[List[str], Dict]]:
+    """Nested {a: {b: leaf}} -> ([a, b], leaf) for `depth` levels of keys."""
+    if depth == 0:
+        yield [], stats
+        return
+    for key, value in stats.items():
+        for labels, leaf in _flatten(value, depth - 1):
+            yield [key, *labels], leaf
+
+def _quantiles(stats: Dict, depth: int) -> Samples:
+    """p50/p95 out of rolling-window stats nested `depth` keys deep, labelled by quantile."""
+    return [
+        ((*labels, quantile), leaf[name])
+        for labels, leaf in _flatten(stats, depth)
+        for name, quantile in (("p50", "0.5"), ("p95", "0.95"))
+        if name in leaf
+    ]
+
+def _outbound() -> Dict:
+    from config import get_outbound_scheduler
+    return get_outbound_scheduler().stats()
+
+def _llm() -> Dict:
+    from config import get_model_router
+    return get_model_router().stats()
+
+def _prompts() -> Dict:
+    from config import LLM_ENDPOINT_DEFAULTS, get_prompt_budget
+    return {endpoint: get_prompt_budget(endpoint).stats() for endpoint in LLM_ENDPOINT_DEFAULTS}
+
+def _prescreen() -> Dict:
+    from config import get_prescreen
+    return get_prescreen().stats()
+
+def _pipelines() -> Dict:
+    from config import PIPELINE_NAMES, get_stage_timings
+    return {name: get_stage_timings(name).stats() for name in PIPELINE_NAMES}
+
+def _jobs() -> Dict:
+    from config import get_job_manager
+    return get_job_manager().stats()
+
+def register(metrics: Metrics):
+    """
+    Export the counters the outbound scheduler, model router, prompt budgets, pre-screen,
+    pipelines and job manager keep for themselves, read from their `stats()` on each scrape.
+    """
+    metrics.add(Collected(
+        "shopecho_outbound_calls_total", "Upstream API attempts, retries, throttles and final failures by limit key.",
+        "counter", ("key", "event"),
+        lambda: [((key, event), count) for key, counters in _outbound()["calls"].items() for event, count in counters.items()],
+    ))
+    metrics.add(Collected(
+        "shopecho_outbound_waiting", "Calls waiting for a rate limit token.", "gauge", ("key",),
+        lambda: [((key,), waiting) for key, waiting in _outbound()["waiting"].items()],
+    ))
+    metrics.add(Collected(
+        "shopecho_llm_served_total", "LLM calls answered, by endpoint and the route that served them.", "counter", ("endpoint", "route"),
+        lambda: [(tuple(labels), count) for labels, count in _flatten(_llm()["served"], 2)],
+    ))
+    metrics.add(Collected(
+        "shopecho_llm_latency_seconds", "Rolling LLM latency per route.", "gauge", ("route", "quantile"),
+        lambda: _quantiles(_llm()["latency"], 1),
+    ))
+    metrics.add(Collected(
+        "shopecho_llm_breaker_open", "1 while a provider's circuit is open or half-open.", "gauge", ("provider",),
+        lambda: [((provider,), float(state != "closed")) for provider, state in _llm()["breakers"].items()],
+    ))
+    metrics.add(Collected(
+        "shopecho_prompt_tokens_total", "Prompt tokens sent, and saved by dedup and truncation, per endpoint.", "counter", ("endpoint", "kind"),
+        lambda: [
+            ((endpoint, kind), stats[name])
+            for endpoint, stats in _prompts().items()
+            for name, kind in (("tokens_sent", "sent"), ("saved_dedup", "saved_dedup"), ("saved_truncated", "saved_truncated"))
+        ],
+    ))
+    metrics.add(Collected(
+        "shopecho_prompt_builds_total", "Prompts built per endpoint.", "counter", ("endpoint",),
+        lambda: [((endpoint,), stats["calls"]) for endpoint, stats in _prompts().items()],
+    ))
+    metrics.add(Collected(
+        "shopecho_prescreen_total", "Comparisons pre-screened, by verdict.", "counter", ("verdict",),
+        lambda: [((verdict,), _prescreen()[verdict]) for verdict in ("yes", "no", "ambiguous")],
+    ))
+    metrics.add(Collected(
+        "shopecho_pipeline_stages_total", "Pipeline stage runs by outcome.", "counter", ("pipeline", "stage", "outcome"),
+        lambda: [
+            ((*labels, outcome), stats[outcome])
+            for labels, stats in _flatten(_pipelines(), 2)
+            for outcome in ("done", "failed", "skipped")
+        ],
+    ))
+    metrics.add(Collected(
+        "shopecho_pipeline_stage_seconds", "Rolling pipeline stage duration.", "gauge", ("pipeline", "stage", "quantile"),
+        lambda: _quantiles(_pipelines(), 2),
+    ))
+    metrics.add(Collected(
+        "shopecho_jobs_total", "Background jobs submitted, and submissions joined to a running job.", "counter", ("event",),
+        lambda: [((event,), _jobs()[event]) for event in ("submitted", "coalesced")],
+    ))
@@ -0,0 +1,40 @@
+import os
+import sqlite3
+import threading
+from config import get_config
+
+DB_FILENAME = "shopecho.sqlite3"
+
+_wal_paths = set()
+_wal_lock = threading.Lock()
+
+def data_path(filename: str) -> str:
+    """Resolve a file inside the local data directory, creating the directory if needed."""
+    data_dir = get_config()["data_dir"]
+    os.makedirs(data_dir, exist_ok=True)
+    return os.path.join(data_dir, filename)
+
+class Connection(sqlite3.Connection):
+    """A connection whose `with` block commits (or rolls back) and then closes it."""
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            return super().__exit__(exc_type, exc, tb)
+        finally:
+            self.close()
+
+def connect(path: str = None, **kwargs) -> Connection:
+    """
+    Open a connection to the local state database; use it as `with connect() as conn:`.
+    WAL mode lets several worker processes read while one writes. It is stored in the file,
+    so it is only switched on the first time a process opens each path.
+    """
+    path = path or data_path(DB_FILENAME)
+    conn = sqlite3.connect(path, timeout=30, factory=Connection, **kwargs)
+    conn.row_factory = sqlite3.Row
+    if path not in _wal_paths:
+        conn.execute("PRAGMA journal_mode=WAL")
+        with _wal_lock:
+            _wal_paths.add(path)
+    conn.execute("PRAGMA synchronous=NORMAL") # per connection, and costs no I/O
+    return conn
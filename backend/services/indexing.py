@@ -0,0 +1,90 @@
+import hashlib
+import hmac
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Set
+
+class IndexingTimeout(TimeoutError):
+    """The indexed asset did not finish before the deadline; it may still finish later."""
+
+
+class IndexingCancelled(Exception):
+    pass
+
+
+class IndexingWaiter:
+    """
+    Wakes threads waiting on a TwelveLabs indexed asset.
+    A completion webhook calls `notify`, which makes every waiter on that asset re-poll
+    right away instead of sleeping out its backoff interval. The poll, not the webhook
+    body, stays the source of truth, so a forged or stale callback only costs one request.
+    """
+
+    def __init__(self):
+        self._waiters: Dict[str, Set[threading.Event]] = {}
+        self._lock = threading.Lock()
+        self.closed = False
+
+    @contextmanager
+    def watch(self, indexed_asset_id: str, wake: threading.Event):
+        with self._lock:
+            self._waiters.setdefault(indexed_asset_id, set()).add(wake)
+        try:
+            yield wake
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(indexed_asset_id, set())
+                waiters.discard(wake)
+                if not waiters:
+                    self._waiters.pop(indexed_asset_id, None)
+
+    def notify(self, indexed_asset_ids: Iterable[str]) -> int:
+        """Wake every waiter on these ids; returns how many were woken."""
+        woken = 0
+        with self._lock:
+            for indexed_asset_id in indexed_asset_ids:
+                for wake in self._waiters.get(indexed_asset_id, ()):
+                    wake.set()
+                    woken += 1
+        return woken
+
+    def close(self):
+        """On shutdown: wake everyone so no thread is left sleeping on an index."""
+        with self._lock:
+            self.closed = True
+            for waiters in self._waiters.values():
+                for wake in waiters:
+                    wake.set()
+
+    def waiting(self) -> int:
+        with self._lock:
+            return sum(len(waiters) for waiters in self._waiters.values())
+
+
+def backoff_intervals(initial: float, factor: float, maximum: float):
+    """1s, 1.5s, 2.25s, ... capped: short clips are seen quickly, long ones aren't hammered."""
+    interval = initial
+    while True:
+        yield interval
+        interval = min(interval * factor, maximum)
+
+
+def verify_callback(body: bytes, signature: Optional[str], secret: str, tolerance_seconds: float = 300) -> bool:
+    """
+    Check a `TL-Signature: t=<unix time>,v1=<hex>` header: HMAC-SHA256 of "<t>.<body>"
+    with the webhook secret, rejecting timestamps outside the tolerance to stop replays.
+    """
+    if not signature:
+        return False
+    fields = dict(part.split("=", 1) for part in signature.split(",") if "=" in part)
+    timestamp, received = fields.get("t"), fields.get("v1")
+    if not timestamp or not received:
+        return False
+    try:
+        if abs(time.time() - int(timestamp)) > tolerance_seconds:
+            return False
+    except ValueError:
+        return False
+    expected = hmac.new(secret.encode("utf-8"), f"{timestamp}.".encode("utf-8") + body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, received)
@@ -0,0 +1,253 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+from services.db import connect
+
+logger = logging.getLogger(__name__)
+
+PENDING_STATUSES = ("queued", "running")
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+class JobStore:
+    """Persists job state locally so queued and running jobs survive a worker restart."""
+
+    def __init__(self, path: str = None):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    current_stage TEXT,
+                    stages TEXT NOT NULL DEFAULT '{}',
+                    owner INTEGER,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+                """
+            )
+
+    def _connect(self):
+        return connect(self.path)
+
+    def create(self, kind: str, payload: Dict) -> Dict:
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, payload, owner, created_at) VALUES (?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), os.getpid(), time.time()),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["stages"] = json.loads(job["stages"])
+        return job
+
+    def claim(self, owner: Optional[int] = None) -> List[str]:
+        """
+        Take over the queued and running jobs, all of them or those of the worker process `owner`,
+        and return their ids in submission order.
+        """
+        condition, params = ("status IN (?, ?)", PENDING_STATUSES)
+        if owner is not None:
+            condition, params = (f"{condition} AND owner = ?", (*params, owner))
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(f"SELECT id FROM jobs WHERE {condition} ORDER BY created_at", params).fetchall()
+            conn.execute(f"UPDATE jobs SET owner = ? WHERE {condition}", (os.getpid(), *params))
+        return [row["id"] for row in rows]
+
+    def mark_running(self, job_id: str):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, started_at = ?, stages = '{}', current_stage = NULL WHERE id = ?",
+                (os.getpid(), time.time(), job_id),
+            )
+
+    def update_stages(self, job_id: str, current_stage: Optional[str], stages: Dict):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET current_stage = ?, stages = ? WHERE id = ?",
+                (current_stage, json.dumps(stages), job_id),
+            )
+
+    def finish(self, job_id: str, result: Any = None, error: str = None):
+        status = "failed" if error else "succeeded"
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, current_stage = NULL, finished_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id),
+            )
+
+
+class JobManager:
+    """
+    Runs registered job handlers on a bounded thread pool.
+    Handlers are plain sync callables `handler(payload, stage)` where `stage(name)`
+    is a context manager that records how long each step took.
+    """
+
+    def __init__(self, store: JobStore, max_workers: int = 4):
+        self.store = store
+        self.max_workers = max_workers
+        self.handlers: Dict[str, Callable] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._events: Dict[str, asyncio.Event] = {}
+        self._waiters: Dict[str, int] = {} # long-polls currently parked on each job's event
+        self._stopping = False
+        self._active: Dict[str, str] = {} # dedupe key -> id of the queued/running job
+        self._active_lock = threading.Lock()
+        self._stats = {"submitted": 0, "coalesced": 0}
+
+    def register(self, kind: str, handler: Callable):
+        self.handlers[kind] = handler
+
+    def start(self, loop: asyncio.AbstractEventLoop, resume: bool = True, owner: Optional[int] = None):
+        """
+        Start the executor and re-queue anything a previous worker left unfinished.
+        With several workers sharing the store only one should `resume`, or each would rerun it;
+        a worker replacing one that died resumes just that process's jobs, given as `owner`.
+        """
+        self._loop = loop
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+        if not resume:
+            return
+        for job_id in self.store.claim(owner):
+            logger.info("Resuming job %s", job_id)
+            self._executor.submit(self._run, job_id)
+
+    def shutdown(self):
+        self._stopping = True
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, kind: str, payload: Dict, dedupe_key: Optional[str] = None) -> Dict:
+        """
+        Queue a job. With a `dedupe_key`, a job with the same key that is still queued or
+        running in this process is returned instead of starting a second one.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if self._executor is None:
+            raise RuntimeError("Job manager has not been started")
+
+        key = f"{kind}:{dedupe_key}" if dedupe_key else None
+        with self._active_lock:
+            if key in self._active:
+                job = self.store.get(self._active[key])
+                if job and job["status"] in PENDING_STATUSES:
+                    self._stats["coalesced"] += 1
+                    return job
+            job = self.store.create(kind, payload)
+            self._stats["submitted"] += 1
+            if key:
+                self._active[key] = job["id"]
+
+        self._executor.submit(self._run, job["id"], key)
+        return job
+
+    def stats(self) -> Dict:
+        with self._active_lock:
+            return {**self._stats, "active_keys": len(self._active)}
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        return self.store.get(job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict]:
+        """Long-poll: return as soon as the job finishes or the timeout expires (0 = no wait)."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            job = await asyncio.to_thread(self.store.get, job_id)
+            remaining = deadline - loop.time()
+            if job is None or job["status"] in TERMINAL_STATUSES or remaining <= 0:
+                return job
+
+            # The event is only set by this process; the short cap also picks up
+            # jobs finished by another worker sharing the same store.
+            event = self._events.setdefault(job_id, asyncio.Event())
+            self._waiters[job_id] = self._waiters.get(job_id, 0) + 1
+            try:
+                await asyncio.wait_for(event.wait(), timeout=min(remaining, 1.0))
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                # Don't keep events for jobs nobody is polling (unknown ids, jobs that never finish)
+                self._waiters[job_id] -= 1
+                if not self._waiters[job_id]:
+                    del self._waiters[job_id]
+                    if self._events.get(job_id) is event:
+                        del self._events[job_id]
+
+    def _run(self, job_id: str, dedupe_key: Optional[str] = None):
+        try:
+            self._execute(job_id)
+        finally:
+            if dedupe_key:
+                with self._active_lock:
+                    if self._active.get(dedupe_key) == job_id:
+                        del self._active[dedupe_key]
+
+    def _execute(self, job_id: str):
+        job = self.store.get(job_id)
+        if job is None:
+            return
+
+        self.store.mark_running(job_id)
+        stages: Dict[str, float] = {}
+
+        @contextmanager
+        def stage(name: str):
+            self.store.update_stages(job_id, name, stages)
+            started = time.perf_counter()
+            try:
+                yield
+            finally:
+                stages[name] = round(time.perf_counter() - started, 3)
+                self.store.update_stages(job_id, None, stages)
+
+        try:
+            handler = self.handlers[job["kind"]]
+            result = handler(job["payload"], stage)
+            self.store.finish(job_id, result=result)
+        except Exception as e:
+            if self._stopping:
+                # Interrupted by shutdown: leave it running/queued so the next start resumes it
+                logger.warning("Job %s interrupted by shutdown: %s", job_id, e)
+                return
+            logger.error("Job %s failed: %s", job_id, e)
+            self.store.finish(job_id, error=str(e) or type(e).__name__)
+        finally:
+            self._notify(job_id)
+
+    def _notify(self, job_id: str):
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._wake, job_id)
+
+    def _wake(self, job_id: str):
+        event = self._events.pop(job_id, None)
+        if event:
+            event.set()
@@ -0,0 +1,62 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+class LoopStallMonitor:
+    """
+    Debug helper that reports event-loop stalls.
+    A heartbeat coroutine ticks on the loop; a watchdog thread notices when the heartbeat
+    stops and logs the loop thread's stack, which points at the blocking call itself.
+    Asyncio debug mode is switched on as well so slow callbacks get logged.
+    """
+
+    def __init__(self, threshold_ms: float = 100):
+        self.threshold = threshold_ms / 1000
+        self.interval = self.threshold / 4
+        self.stalls = 0
+        self._last_beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        loop.set_debug(True)
+        loop.slow_callback_duration = self.threshold
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._task = loop.create_task(self._heartbeat())
+        threading.Thread(target=self._watchdog, name="loop-watchdog", daemon=True).start()
+        logger.info("Loop stall monitor enabled (threshold=%.0fms)", self.threshold * 1000)
+
+    def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+
+    async def _heartbeat(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._last_beat = time.monotonic()
+            lag = self._last_beat - started - self.interval
+            if lag > self.threshold:
+                self.stalls += 1
+                logger.warning("Event loop stalled for %.0fms", lag * 1000)
+
+    def _watchdog(self):
+        reported_beat = None
+        while not self._stop.wait(self.interval):
+            beat = self._last_beat
+            if time.monotonic() - beat <= self.threshold or beat == reported_beat:
+                continue
+            # Report each stall once, while it is still happening
+            reported_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame, limit=12)) if frame else "<unavailable>"
+            logger.warning("Event loop blocked for more than %.0fms at:\n%s", self.threshold * 1000, stack)
@@ -1,118 +1,178 @@
-import os
-import requests
+import httpx
+import logging
 from backboard import BackboardClient
-from typing import List
-import time
+from typing import Optional, Tuple
+from services.artifact_store import ArtifactStore
+from services.backboard_pool import AssistantRegistry, ThreadPool, send_message
+from services.model_router import ModelRoute, ModelRouter
+from services.product_index import ProductIndex, product_line
+from services.prompt_budget import PromptBudget, PromptSection
+from services.catalog_fingerprint import CatalogFingerprint, CatalogFingerprintStore
+from services.shopify import ShopifyClient, ShopifyError
+from services.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+MANIFESTO_ASSISTANT = "Manifesto Generator"
+MANIFESTO_DESCRIPTION = """
+        You are an expert manifesto generator. Create a compelling and unique manifesto
+        based on the store data provided. The manifesto should reflect the brand's values,
+        mission, and vision in a concise and engaging manner. Manifesto should be formatted in markdown,
+        and it must be shorter than 100 words.
+
+        DO NOT BE CRINGE OR GENERIC. MAKE IT UNIQUE TO THE STORE AND THE VISION OF WHAT IT REPRESENTS.
+"""
+
+MANIFESTO_ERROR = "Error generating manifesto."
+
+# The manifesto is under 100 words; a sample of the catalog this size is plenty of signal
+MAX_STORE_DATA_CHARS = 24000
+MAX_PRODUCT_DESCRIPTION_CHARS = 200
 
 class ManifestoService:
-    def __init__(self, shop: str, token: str, client: BackboardClient = None):
+    def __init__(
+        self,
+        shop: str,
+        token: str,
+        client: BackboardClient = None,
+        assistants: AssistantRegistry = None,
+        threads: ThreadPool = None,
+        shopify: ShopifyClient = None,
+        fingerprints: CatalogFingerprintStore = None,
+        artifacts: ArtifactStore = None,
+        models: ModelRouter = None,
+        budget: PromptBudget = None,
+        products: ProductIndex = None,
+    ):
+        from config import get_assistant_registry, get_thread_pool, get_shopify_client, get_fingerprint_store, get_artifact_store, get_model_router, get_prompt_budget, get_product_index
         self.shop = shop
         self.token = token
         self.backboard_client = client
-
-    async def create_manifesto(self):
-        if self._check_manifesto_exists():
-            time.sleep(3)
-
-            return self.view_manifesto()
-
-        print("Scanning store for data...")
-        store_data = self._scan_store()
+        self.assistants = assistants or get_assistant_registry()
+        self.threads = threads or get_thread_pool()
+        self.shopify = shopify or get_shopify_client()
+        self.fingerprints = fingerprints or get_fingerprint_store()
+        self.artifacts = artifacts or get_artifact_store()
+        self.models = models or get_model_router()
+        self.budget = budget or get_prompt_budget("manifesto")
+        self.products = products or get_product_index()
+        self.model = None # provider/model that generated the manifesto, when it was regenerated
+
+    async def create_manifesto(self, force_refresh: bool = False):
+        """
+        Serve the stored manifesto unless the catalog changed since it was generated.
+        A clean fingerprint answers without calling Shopify; a stale one (set by the
+        products webhook) costs one catalog scan, and only a real change regenerates,
+        from that same scan.
+        """
+        state = await self.fingerprints.aget(self.shop)
+        generation = state["generation"] if state else 0 # read before scanning; webhooks bump it
+        if not force_refresh and await self._check_manifesto_exists():
+            if state and not state["stale"]:
+                return await self.view_manifesto()
+
+            store_data, fingerprint = await self._scan_store()
+            if fingerprint is None:
+                return await self.view_manifesto()
+            if state is None or state["fingerprint"] == fingerprint:
+                # Unchanged, or generated before fingerprints existed: keep it
+                await self.fingerprints.asave(self.shop, fingerprint, generation)
+                return await self.view_manifesto()
+
+            logger.info("Catalog changed since the manifesto was generated for %s", self.shop)
+            return await self._regenerate_manifesto(store_data, fingerprint, generation)
+
+        store_data, fingerprint = await self._scan_store()
+        return await self._regenerate_manifesto(store_data, fingerprint, generation)
+
+    async def _regenerate_manifesto(self, store_data: Optional[str], fingerprint: Optional[str], generation: int):
         if not store_data:
             return "Failed to retrieve store data."
 
         manifesto = await self._generate_manifesto_with_backboard(store_data)
+        if manifesto == MANIFESTO_ERROR:
+            return {"manifesto": manifesto}
 
-        self._save_manifesto_to_file(manifesto)
+        await self._save_manifesto_to_file(manifesto)
+        await self.fingerprints.asave(self.shop, fingerprint, generation)
 
-        return {"manifesto": manifesto}
+        return {"manifesto": manifesto, "model": self.model}
 
-    def view_manifesto(self):
-        if not self._check_manifesto_exists():
+    async def view_manifesto(self):
+        manifesto_content = await self.artifacts.aread(self.shop, "manifesto")
+        if manifesto_content is None:
             return "No manifesto found."
 
-        print("Reading existing manifesto...")
-
-        with open("MANIFESTO.md", "r") as f:
-            manifesto_content = f.read()
-
         return {"manifesto": manifesto_content}
 
-    def _scan_store(self):
-        url = f"https://{self.shop}/admin/api/2026-01/graphql.json"
-        headers = {
-            "Content-Type": "application/json",
-            "X-Shopify-Access-Token": self.token
-        }
-        
-        query = """
-        {
-            shop { name description }
-            products(first: 17) {
-            edges { node { title descriptionHtml tags } }
-            }
-        }
+    async def _scan_store(self) -> Tuple[Optional[str], Optional[str]]:
         """
-        
-        try:
-            response = requests.post(url, json={"query": query}, headers=headers)
-            if response.status_code != 200:
-                print(f"Shopify API Error: {response.text}")
-                return None
-                
-            data = response.json().get("data", {})
-            shop_desc = data.get("shop", {}).get("description", "No description")
-            products = data.get("products", {}).get("edges", [])
-            
-            product_text = "\n".join([
-                f"- Product: {p['node']['title']} | Tags: {p['node']['tags']}" 
-                for p in products
-            ])
-            
-            return product_text
-        except Exception as e:
-            print(f"Fetch Error: {e}")
-            return None
-    
-    async def _generate_manifesto_with_backboard(self, store_data: List[str]) -> str:
-        prompt = f"Generate a MANIFESTO.md for the following store data:\n{store_data}. Send me just the MD content."
-        
-        description= """
-        You are an expert manifesto generator. Create a compelling and unique manifesto
-        based on the store data provided. The manifesto should reflect the brand's values,
-        mission, and vision in a concise and engaging manner. Manifesto should be formatted in markdown,
-        and it must be shorter than 100 words.
+        (store data, catalog fingerprint) from one catalog scan, or (None, None) if it failed.
+        The scan streams into the product index, then the store is described by its most
+        representative products (closest to the catalog's centroid) until the prompt
+        budget is full, instead of by whichever products happen to come first.
+        """
+        fingerprint = CatalogFingerprint()
 
-        DO NOT BE CRINGE OR GENERIC. MAKE IT UNIQUE TO THE STORE AND THE VISION OF WHAT IT REPRESENTS.
-"""
+        async def scan(product_count: int):
+            async for product in self.shopify.iter_catalog(self.shop, self.token, product_count):
+                fingerprint.add(product)
+                yield product
 
         try:
-            assistant = await self.backboard_client.create_assistant(
-                name="Manifesto Generator",
-                description=description,
-            )
-
-            thread = await self.backboard_client.create_thread(assistant.assistant_id)
-
-            response = await self.backboard_client.add_message(
-                thread_id=thread.thread_id,
-                content=prompt,
-                llm_provider="google",
-                model_name="gemini-2.5-flash",
-                stream=False    
-            )
-
-            return response.content
+            with span("shopify.catalog_scan", shop=self.shop):
+                info = await self.shopify.shop_info(self.shop, self.token)
+                count = await self.products.areplace(self.shop, scan(info["product_count"]))
+        except (ShopifyError, httpx.HTTPError) as e:
+            logger.error("Fetch Error: %s", e)
+            return None, None
+        if not count:
+            return None, None # the catalog could not be read
+
+        parts = [f"Store: {info['name']}\nDescription: {info['description']}"]
+        size = len(parts[0])
+        for product in await self.products.arepresentative(self.shop, count):
+            line = product_line(product, MAX_PRODUCT_DESCRIPTION_CHARS)
+            if size + len(line) > MAX_STORE_DATA_CHARS:
+                break
+            parts.append(line)
+            size += len(line) + 1
+        return "\n".join(parts), fingerprint.hexdigest()
+
+    async def _generate_manifesto_with_backboard(self, store_data: str) -> str:
+        prompt, _ = self.budget.build([
+            PromptSection("task", "Generate a MANIFESTO.md for the following store data:", required=True),
+            PromptSection("store_data", store_data),
+            PromptSection("format", "Send me just the MD content.", required=True),
+        ])
+        
+        try:
+            assistant_id = await self.assistants.get_or_create(MANIFESTO_ASSISTANT, MANIFESTO_DESCRIPTION)
+
+            async def send(route: ModelRoute) -> str:
+                async with self.threads.lease(self.shop, assistant_id) as thread:
+                    response = await send_message(
+                        self.backboard_client,
+                        thread_id=thread.thread_id,
+                        content=prompt,
+                        llm_provider=route.provider,
+                        model_name=route.model,
+                        stream=False
+                    )
+                return response.content
+
+            manifesto, route = await self.models.run("manifesto", send)
+            self.model = route.name
+            return manifesto
         except Exception as e:
-            print(f"Backboard Error: {e}")
-            return "Error generating manifesto."
+            logger.error("Backboard Error: %s", e)
+            return MANIFESTO_ERROR
         
-    def _save_manifesto_to_file(self, manifesto: str, filename: str = "MANIFESTO.md"):
+    async def _save_manifesto_to_file(self, manifesto: str):
         try:
-            with open(filename, "w") as f:
-                f.write(manifesto)
+            await self.artifacts.aput(self.shop, "manifesto", manifesto)
         except Exception as e:
-            print(f"File Write Error: {e}")
+            logger.error("Artifact Write Error: %s", e)
     
-    def _check_manifesto_exists(self, filename: str = "MANIFESTO.md") -> bool:
-        return os.path.isfile(filename)
+    async def _check_manifesto_exists(self) -> bool:
+        return await self.artifacts.aget(self.shop, "manifesto") is not None
@@ -0,0 +1,113 @@
+import asyncio
+import os
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Iterable, Mapping, Optional
+from fastapi.responses import FileResponse
+
+@dataclass(frozen=True)
+class MediaFile:
+    name: str
+    path: str
+    stat: os.stat_result
+    etag: str
+    last_modified: str
+
+def media_file(name: str, path: str, stat: os.stat_result) -> MediaFile:
+    return MediaFile(
+        name=name,
+        path=path,
+        stat=stat,
+        etag=f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"',
+        last_modified=formatdate(stat.st_mtime, usegmt=True),
+    )
+
+def not_modified(file: MediaFile, headers: Mapping[str, str]) -> bool:
+    """Whether a conditional GET can be answered with 304 (If-None-Match wins over If-Modified-Since)."""
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or file.etag in tags
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(file.stat.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class MediaIndex:
+    """
+    Allow-list of the files in one directory, keyed by bare filename. Requests are only
+    ever matched against these names, so a path parameter never reaches the filesystem
+    until it has matched. An unknown name rescans at most every `miss_rescan_seconds`
+    (new videos show up without a restart). A known one is re-stat'ed on every lookup,
+    so the validators and Content-Length always describe the file as it is now, even
+    after it was replaced or removed.
+    """
+
+    def __init__(self, directory: str, extensions: Iterable[str], miss_rescan_seconds: float = 5.0):
+        self.directory = directory
+        self.extensions = tuple(extension.lower() for extension in extensions)
+        self.miss_rescan_seconds = miss_rescan_seconds
+        self._files: Dict[str, MediaFile] = {}
+        self._scanned_at = 0.0
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self):
+        files = {}
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            entries = []
+        for entry in entries:
+            if entry.name.lower().endswith(self.extensions) and entry.is_file():
+                files[entry.name] = media_file(entry.name, os.path.abspath(entry.path), entry.stat())
+        with self._lock:
+            self._files = files
+            self._scanned_at = time.monotonic()
+
+    def _rescan_due(self, name: str) -> bool:
+        return name not in self._files and time.monotonic() - self._scanned_at >= self.miss_rescan_seconds
+
+    def _current(self, name: str) -> Optional[MediaFile]:
+        """The indexed entry checked against a fresh stat: new validators if it changed, None if it's gone."""
+        file = self._files.get(name)
+        if file is None:
+            return None
+        try:
+            stat = os.stat(file.path)
+        except FileNotFoundError:
+            with self._lock:
+                self._files.pop(name, None)
+            return None
+        if (stat.st_size, stat.st_mtime_ns) != (file.stat.st_size, file.stat.st_mtime_ns):
+            file = media_file(name, file.path, stat)
+            with self._lock:
+                self._files[name] = file
+        return file
+
+    def get(self, name: str) -> Optional[MediaFile]:
+        if self._rescan_due(name):
+            self.refresh()
+        return self._current(name)
+
+    async def aget(self, name: str) -> Optional[MediaFile]:
+        # Only the occasional rescan goes to a worker thread; one stat of a local file is
+        # cheaper than the hop
+        if self._rescan_due(name):
+            await asyncio.to_thread(self.refresh)
+        return self._current(name)
+
+
+class MediaResponse(FileResponse):
+    """
+    FileResponse with larger reads for video. Full responses already go out as a
+    `http.response.pathsend` (sendfile) on servers that support it; range responses
+    are read in these chunks.
+    """
+    chunk_size = 1024 * 1024
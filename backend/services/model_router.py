@@ -0,0 +1,292 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class ModelRoute:
+    provider: str
+    model: str
+
+    @property
+    def name(self) -> str:
+        return f"{self.provider}/{self.model}"
+
+
+@dataclass
+class LatencyPolicy:
+    chain: List[ModelRoute] # tried in order; the first is the preferred model
+    timeout: float # hard budget for the whole call, fallbacks included
+    hedge: bool = False # race the next model in the chain once the first runs past its p95
+
+
+class LLMUnavailable(Exception):
+    """Every route failed, was skipped by its breaker, or ran out of time."""
+
+
+def parse_chain(spec: str) -> List[ModelRoute]:
+    """"anthropic/claude-opus-4-20250514,google/gemini-2.5-flash" -> routes."""
+    routes = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        provider, _, model = item.partition("/")
+        routes.append(ModelRoute(provider, model))
+    return routes
+
+
+class LatencyTracker:
+    """Rolling window of successful latencies per route, for hedge delays and stats."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, route: ModelRoute, seconds: float):
+        self._samples.setdefault(route.name, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, route: ModelRoute, q: float, min_samples: int = 1) -> Optional[float]:
+        samples = sorted(self._samples.get(route.name, ()))
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def stats(self) -> Dict:
+        return {
+            name: {
+                "count": len(samples),
+                "p50": round(sorted(samples)[len(samples) // 2], 3),
+                "p95": round(sorted(samples)[min(len(samples) - 1, int(0.95 * len(samples)))], 3),
+            }
+            for name, samples in self._samples.items() if samples
+        }
+
+
+class CircuitBreaker:
+    """
+    Per-provider breaker: after `failures` consecutive errors or hard timeouts the provider is
+    skipped for `cooldown` seconds, then one trial call decides whether it closes again.
+    """
+
+    def __init__(self, failures: int = 3, cooldown: float = 30.0):
+        self.failures = failures
+        self.cooldown = cooldown
+        self._consecutive: Dict[str, int] = {}
+        self._opened_at: Dict[str, float] = {}
+        self._trial_at: Dict[str, float] = {}
+
+    def allow(self, provider: str) -> bool:
+        opened_at = self._opened_at.get(provider)
+        if opened_at is None:
+            return True
+        now = time.monotonic()
+        if now - opened_at < self.cooldown:
+            return False
+        # Half-open: let one trial through; if it never reports back (cancelled), allow another later
+        if now - self._trial_at.get(provider, 0.0) < self.cooldown:
+            return False
+        self._trial_at[provider] = now
+        return True
+
+    def success(self, provider: str):
+        self._consecutive[provider] = 0
+        self._opened_at.pop(provider, None)
+        self._trial_at.pop(provider, None)
+
+    def failure(self, provider: str):
+        self._consecutive[provider] = self._consecutive.get(provider, 0) + 1
+        if self._consecutive[provider] >= self.failures or provider in self._opened_at:
+            if provider not in self._opened_at:
+                logger.warning("Circuit open for %s", provider)
+            self._opened_at[provider] = time.monotonic()
+
+    def state(self, provider: str) -> str:
+        if provider not in self._opened_at:
+            return "closed"
+        return "open" if time.monotonic() - self._opened_at[provider] < self.cooldown else "half-open"
+
+
+class ModelRouter:
+    """
+    Runs an LLM call within an endpoint's latency budget:
+    - the whole call, fallbacks and hedges included, is cut off at the policy timeout
+    - a failed route falls through to the next one in the chain right away
+    - once a request runs past its route's p95 the next route is started: with hedging
+      both race and whichever answers first wins, without it the slow one is abandoned
+    - routes whose provider's breaker is open are skipped
+    """
+
+    def __init__(
+        self,
+        policies: Dict[str, LatencyPolicy],
+        breaker: CircuitBreaker = None,
+        tracker: LatencyTracker = None,
+        min_hedge_samples: int = 20,
+    ):
+        self.policies = policies
+        self.breaker = breaker or CircuitBreaker()
+        self.tracker = tracker or LatencyTracker()
+        self.min_hedge_samples = min_hedge_samples
+        self._served: Dict[str, Dict[str, int]] = {}
+
+    def pick(self, endpoint: str) -> ModelRoute:
+        """First route whose provider's breaker lets it through (for streams, which can't hedge)."""
+        for route in self.policies[endpoint].chain:
+            if self.breaker.allow(route.provider):
+                return route
+        raise LLMUnavailable(f"No healthy model for {endpoint}")
+
+    def record(self, endpoint: str, route: ModelRoute, seconds: Optional[float] = None, error: bool = False):
+        """Report the outcome of a call made outside `run` (a stream) to the breaker and stats."""
+        if error:
+            self.breaker.failure(route.provider)
+            return
+        self.breaker.success(route.provider)
+        if seconds is not None:
+            self.tracker.record(route, seconds)
+        self._count(endpoint, route)
+
+    def hedge_delay(self, endpoint: str, route: ModelRoute) -> float:
+        p95 = self.tracker.percentile(route, 0.95, self.min_hedge_samples)
+        # Until there is enough history, move on halfway through the budget
+        return p95 if p95 is not None else self.policies[endpoint].timeout / 2
+
+    async def run(self, endpoint: str, send: Callable[[ModelRoute], Awaitable[Any]]) -> Tuple[Any, ModelRoute]:
+        """Call `send(route)` under the endpoint's policy; returns (result, route that served it)."""
+        policy = self.policies[endpoint]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + policy.timeout
+        candidates = deque(policy.chain)
+        pending: Dict[asyncio.Task, ModelRoute] = {}
+        errors: List[str] = []
+        next_at: Optional[float] = None # when the running route counts as too slow
+
+        def launch() -> bool:
+            nonlocal next_at
+            while candidates:
+                route = candidates.popleft()
+                if not self.breaker.allow(route.provider):
+                    errors.append(f"{route.name}: circuit open")
+                    continue
+                pending[asyncio.create_task(self._timed(route, send))] = route
+                next_at = loop.time() + self.hedge_delay(endpoint, route) if candidates else None
+                return True
+            next_at = None
+            return False
+
+        if not launch():
+            raise LLMUnavailable(f"No healthy model for {endpoint}")
+        try:
+            while pending:
+                now = loop.time()
+                if now >= deadline:
+                    break
+                wake_at = min(deadline, next_at) if next_at is not None else deadline
+                done, _ = await asyncio.wait(pending, timeout=max(0.0, wake_at - now), return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    route = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        self.breaker.failure(route.provider)
+                        errors.append(f"{route.name}: {str(e) or type(e).__name__}")
+                        logger.warning("LLM %s via %s failed: %s", endpoint, route.name, str(e) or type(e).__name__)
+                        continue
+                    self.breaker.success(route.provider)
+                    self._count(endpoint, route)
+                    return result, route
+
+                if not done and next_at is not None and loop.time() >= next_at:
+                    if not policy.hedge:
+                        # Abandoned, not failed: slower than usual isn't the provider being down
+                        for task, route in pending.items():
+                            task.cancel()
+                            errors.append(f"{route.name}: too slow")
+                        pending.clear()
+                    logger.info("LLM %s: %s with %s", endpoint, "hedging" if policy.hedge else "falling back", candidates[0].name)
+                    if not launch() and not pending:
+                        break
+                elif not pending and not launch():
+                    break # fall back right away, if anything is left
+        finally:
+            for task, route in pending.items():
+                task.cancel()
+                if loop.time() >= deadline:
+                    self.breaker.failure(route.provider) # a timeout counts against the provider
+
+        if loop.time() >= deadline:
+            errors.append(f"timed out after {policy.timeout:.0f}s")
+        raise LLMUnavailable(f"{endpoint}: " + "; ".join(errors))
+
+    async def stream(self, endpoint: str, open_stream: Callable[[ModelRoute], AsyncIterator[str]]) -> AsyncIterator:
+        """
+        Streaming counterpart of `run`: routes are tried in order until one produces its
+        first token within the budget. From then on the stream is committed to that model
+        (tokens can't be taken back, so there is no hedging). Yields the text, then the route.
+        """
+        policy = self.policies[endpoint]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + policy.timeout
+        errors: List[str] = []
+
+        for route in policy.chain:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                errors.append(f"timed out after {policy.timeout:.0f}s")
+                break
+            if not self.breaker.allow(route.provider):
+                errors.append(f"{route.name}: circuit open")
+                continue
+
+            # Leave time for the rest of the chain if this route is slower than usual
+            if route is not policy.chain[-1]:
+                remaining = min(remaining, self.hedge_delay(endpoint, route))
+
+            tokens = open_stream(route)
+            try:
+                first = await asyncio.wait_for(tokens.__anext__(), remaining)
+            except StopAsyncIteration:
+                first = None
+            except Exception as e:
+                await tokens.aclose()
+                if not isinstance(e, asyncio.TimeoutError) or loop.time() >= deadline:
+                    self.breaker.failure(route.provider) # moving on from a slow first token isn't a failure
+                errors.append(f"{route.name}: {str(e) or type(e).__name__}")
+                logger.warning("LLM %s stream via %s failed: %s", endpoint, route.name, str(e) or type(e).__name__)
+                continue
+
+            self.breaker.success(route.provider)
+            self._count(endpoint, route)
+            if first is not None:
+                yield first
+                try:
+                    async for text in tokens:
+                        yield text
+                except Exception:
+                    self.breaker.failure(route.provider)
+                    raise
+            yield route
+            return
+
+        raise LLMUnavailable(f"{endpoint}: " + "; ".join(errors))
+
+    async def _timed(self, route: ModelRoute, send: Callable[[ModelRoute], Awaitable[Any]]) -> Any:
+        started = time.perf_counter()
+        result = await send(route)
+        self.tracker.record(route, time.perf_counter() - started)
+        return result
+
+    def _count(self, endpoint: str, route: ModelRoute):
+        served = self._served.setdefault(endpoint, {})
+        served[route.name] = served.get(route.name, 0) + 1
+
+    def stats(self) -> Dict:
+        providers = {route.provider for policy in self.policies.values() for route in policy.chain}
+        return {
+            "served": self._served,
+            "latency": self.tracker.stats(),
+            "breakers": {provider: self.breaker.state(provider) for provider in sorted(providers)},
+        }
@@ -0,0 +1,261 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import httpx
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BATCH = 1
+
+# Priority of outbound calls made by the current request; batch endpoints lower it
+request_priority: ContextVar[int] = ContextVar("request_priority", default=INTERACTIVE)
+
+@contextmanager
+def batch_priority():
+    token = request_priority.set(BATCH)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+# SDK errors raised without a status code that are still worth retrying
+TRANSIENT_MESSAGES = ("Request timed out", "Connection error")
+
+def parse_rate_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    """"backboard/anthropic=1:3,twelvelabs=2:4" -> {key: (requests per second, burst)}."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+        key, _, value = item.partition("=")
+        rate, _, burst = value.partition(":")
+        limits[key.strip()] = (float(rate), float(burst or rate))
+    return limits
+
+def retry_after_seconds(headers) -> Optional[float]:
+    value = (headers or {}).get("retry-after") or (headers or {}).get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def classify_error(exc: BaseException) -> Tuple[bool, Optional[int], Optional[float]]:
+    """(retryable, status code, Retry-After seconds) for Backboard, TwelveLabs and httpx errors."""
+    if isinstance(exc, (httpx.TimeoutException, httpx.NetworkError)):
+        return True, None, None
+    if isinstance(exc, httpx.HTTPStatusError):
+        status, headers = exc.response.status_code, exc.response.headers
+    else:
+        status = getattr(exc, "status_code", None)
+        response = getattr(exc, "response", None)
+        headers = getattr(exc, "headers", None) or getattr(response, "headers", None)
+
+    if status is None:
+        return str(exc) in TRANSIENT_MESSAGES, None, None
+    return status == 429 or status >= 500, status, retry_after_seconds(headers)
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Full-jitter exponential backoff, so retrying callers spread out instead of stampeding."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class TokenBucket:
+    """
+    Async token bucket with a priority queue: when tokens run out, waiting interactive
+    calls are always granted before waiting batch calls. Lives on one event loop.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _ready(self) -> bool:
+        return self.tokens >= 1 and time.monotonic() >= self.paused_until
+
+    async def acquire(self, priority: int = INTERACTIVE):
+        self._refill()
+        if not self._waiters and self._ready():
+            self.tokens -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self._schedule()
+        await future # a cancelled waiter is skipped when its turn comes
+
+    def pause(self, seconds: float):
+        """Upstream said slow down (429): nobody on this bucket goes for `seconds`."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = min(self.tokens, 0.0)
+        if self._waiters:
+            self._schedule(force=True)
+
+    def _schedule(self, force: bool = False):
+        if self._timer is not None:
+            if not force:
+                return
+            self._timer.cancel()
+        self._refill()
+        wait = max((1 - self.tokens) / self.rate, self.paused_until - time.monotonic(), 0.0)
+        self._timer = asyncio.get_running_loop().call_later(wait, self._grant)
+
+    def _grant(self):
+        self._timer = None
+        self._refill()
+        while self._waiters and self._ready():
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self.tokens -= 1
+            future.set_result(None)
+        # Drop cancelled waiters so they don't keep the timer running
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+        if self._waiters:
+            self._schedule()
+
+    def waiting(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+
+class OutboundScheduler:
+    """
+    One gate for every call to Backboard, TwelveLabs and other upstream APIs.
+    Calls are keyed "provider/model"; the most specific configured limit applies
+    ("backboard/anthropic/claude-opus-4-20250514", then "backboard/anthropic", then "backboard")
+    and unconfigured keys are not throttled. 429s, 5xx and transient network errors are
+    retried with jittered exponential backoff, honoring Retry-After.
+    Limits are for the whole deployment: each of the `workers` processes serving it
+    enforces an equal share. Shopify is not routed through here: its cost limit is per
+    shop, and ShopifyClient paces each shop from the throttle status Shopify returns.
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[float, float]], max_retries: int = 4, workers: int = 1):
+        self.limits = limits
+        self.max_retries = max_retries
+        self.workers = max(1, workers)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Bind to the server's loop so worker threads can wait their turn on it."""
+        self._loop = loop
+
+    def _limit_key(self, key: str) -> Optional[str]:
+        parts = key.split("/")
+        for end in range(len(parts), 0, -1):
+            candidate = "/".join(parts[:end])
+            if candidate in self.limits:
+                return candidate
+        return None
+
+    def _bucket(self, key: str) -> Optional[TokenBucket]:
+        limit_key = self._limit_key(key)
+        if limit_key is None:
+            return None
+        if limit_key not in self._buckets:
+            rate, burst = self.limits[limit_key]
+            # A bucket never grants with less than one token of room
+            self._buckets[limit_key] = TokenBucket(rate / self.workers, max(1.0, burst / self.workers))
+        return self._buckets[limit_key]
+
+    def _count(self, key: str, name: str):
+        counters = self._stats.setdefault(key, {"calls": 0, "retries": 0, "throttled": 0, "failures": 0})
+        counters[name] += 1
+
+    async def acquire(self, key: str, priority: Optional[int] = None):
+        bucket = self._bucket(key)
+        if bucket is not None:
+            await bucket.acquire(request_priority.get() if priority is None else priority)
+
+    def _penalize(self, key: str, seconds: float):
+        bucket = self._bucket(key)
+        if bucket is not None:
+            bucket.pause(seconds)
+
+    def _pause(self, key: str, seconds: float):
+        """Pause the key's bucket from the loop or from a worker thread."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self._penalize, key, seconds)
+            return
+        self._penalize(key, seconds)
+
+    async def call(self, key: str, work: Callable[[], Awaitable[Any]], priority: Optional[int] = None) -> Any:
+        """Run `work()` once a token is free, retrying throttling and server errors."""
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(key, priority)
+            self._count(key, "calls")
+            try:
+                return await work()
+            except Exception as e:
+                delay = self._retry_delay(key, e, attempt)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+
+    def call_sync(self, key: str, work: Callable[[], Any], priority: Optional[int] = None) -> Any:
+        """Blocking variant for SDK calls made from worker threads."""
+        priority = request_priority.get() if priority is None else priority
+        for attempt in range(self.max_retries + 1):
+            self._acquire_from_thread(key, priority)
+            self._count(key, "calls")
+            try:
+                return work()
+            except Exception as e:
+                delay = self._retry_delay(key, e, attempt)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+
+    def _acquire_from_thread(self, key: str, priority: int):
+        if self._loop is None or self._loop.is_closed() or self._bucket(key) is None:
+            return # not serving (scripts, tests): retries still apply, throttling doesn't
+        asyncio.run_coroutine_threadsafe(self.acquire(key, priority), self._loop).result()
+
+    def _retry_delay(self, key: str, exc: Exception, attempt: int) -> Optional[float]:
+        retryable, status, retry_after = classify_error(exc)
+        if not retryable or attempt >= self.max_retries:
+            if retryable:
+                self._count(key, "failures")
+            return None
+
+        delay = retry_after if retry_after is not None else backoff_delay(attempt)
+        if status == 429:
+            self._count(key, "throttled")
+            self._pause(key, delay)
+        self._count(key, "retries")
+        logger.warning("Outbound %s: %s, retry %d in %.1fs", key, status or type(exc).__name__, attempt + 1, delay)
+        return delay
+
+    def stats(self) -> Dict:
+        return {
+            "calls": self._stats,
+            "waiting": {key: bucket.waiting() for key, bucket in self._buckets.items()},
+        }
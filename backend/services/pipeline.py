@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from services.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Stage:
+    name: str
+    run: Callable[[Dict[str, Any]], Awaitable[Any]] # gets the results of the stages finished so far
+    after: Tuple[str, ...] = () # stages that must finish first
+    skip: Optional[Callable[[Dict[str, Any]], Optional[str]]] = None # a reason not to run, or None
+
+
+class StageTimings:
+    """Rolling per-stage durations and outcome counts across pipeline runs."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._outcomes: Dict[str, Dict[str, int]] = {}
+
+    def record(self, stage: str, status: str, seconds: float = None):
+        outcomes = self._outcomes.setdefault(stage, {"done": 0, "failed": 0, "skipped": 0})
+        outcomes[status] += 1
+        if seconds is not None:
+            self._samples.setdefault(stage, deque(maxlen=self.window)).append(seconds)
+
+    def stats(self) -> Dict:
+        stats = {}
+        for stage, outcomes in self._outcomes.items():
+            samples = sorted(self._samples.get(stage, ()))
+            stats[stage] = dict(outcomes)
+            if samples:
+                stats[stage]["p50"] = round(samples[len(samples) // 2], 3)
+                stats[stage]["p95"] = round(samples[min(len(samples) - 1, int(0.95 * len(samples)))], 3)
+        return stats
+
+
+def _check_graph(stages: List[Stage]):
+    """Fail fast on duplicate names, unknown dependencies and cycles, which would otherwise deadlock a run."""
+    names = [stage.name for stage in stages]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate stage names: {duplicates}")
+    for stage in stages:
+        missing = [dep for dep in stage.after if dep not in names]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown stages: {missing}")
+
+    # Topological sort: whatever is never freed of its dependencies sits on a cycle
+    waiting = {stage.name: set(stage.after) for stage in stages}
+    ready = [name for name, deps in waiting.items() if not deps]
+    while ready:
+        done = ready.pop()
+        del waiting[done]
+        for name, deps in waiting.items():
+            if done in deps:
+                deps.discard(done)
+                if not deps:
+                    ready.append(name)
+    if waiting:
+        raise ValueError(f"Stage dependencies form a cycle through: {sorted(waiting)}")
+
+
+class Pipeline:
+    """
+    Runs stages as a dependency graph: each stage starts as soon as everything it comes
+    after has finished, so independent stages run concurrently. A stage whose dependency
+    failed or was skipped is skipped too, which is how a pipeline stops early.
+    """
+
+    def __init__(self, name: str, stages: List[Stage], timings: StageTimings = None):
+        _check_graph(stages)
+        self.name = name
+        self.stages = stages
+        self.timings = timings or StageTimings()
+
+    async def _timed(self, stage: Stage, results: Dict[str, Any]) -> Tuple[str, float, Any]:
+        started = time.perf_counter()
+        try:
+            with span(f"pipeline.{stage.name}"):
+                result = await stage.run(results)
+        except Exception as e:
+            logger.warning("Pipeline '%s' stage '%s' failed: %s", self.name, stage.name, e)
+            return "failed", time.perf_counter() - started, str(e) or type(e).__name__
+        return "done", time.perf_counter() - started, result
+
+    async def run(self) -> AsyncIterator[Dict]:
+        """
+        Yield one {"stage", "status", ...} event per stage as it settles: "done" with its
+        "result", "failed" with an "error", or "skipped" with a "reason"; every run stage
+        also has its "seconds". Stages still running when the consumer stops are cancelled.
+        """
+        pending = {stage.name: stage for stage in self.stages}
+        running: Dict[asyncio.Task, Stage] = {}
+        results: Dict[str, Any] = {}
+        status: Dict[str, str] = {}
+        try:
+            while pending or running:
+                # Start (or skip) every stage whose dependencies have all settled
+                ready = [stage for stage in pending.values() if all(dep in status for dep in stage.after)]
+                while ready:
+                    for stage in ready:
+                        del pending[stage.name]
+                        blocked = [dep for dep in stage.after if status[dep] != "done"]
+                        reason = f"{blocked[0]} {status[blocked[0]]}" if blocked else stage.skip and stage.skip(results)
+                        if reason:
+                            status[stage.name] = "skipped"
+                            self.timings.record(stage.name, "skipped")
+                            yield {"stage": stage.name, "status": "skipped", "reason": reason}
+                        else:
+                            running[asyncio.create_task(self._timed(stage, results))] = stage
+                    # Skipping a stage can settle the dependencies of the ones after it
+                    ready = [stage for stage in pending.values() if all(dep in status for dep in stage.after)]
+                if not running:
+                    break
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    stage = running.pop(task)
+                    outcome, seconds, value = task.result()
+                    status[stage.name] = outcome
+                    self.timings.record(stage.name, outcome, seconds)
+                    event = {"stage": stage.name, "status": outcome, "seconds": round(seconds, 3)}
+                    if outcome == "done":
+                        results[stage.name] = value
+                        event["result"] = value
+                    else:
+                        event["error"] = value
+                    yield event
+        finally:
+            for task in running:
+                task.cancel()
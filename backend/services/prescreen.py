@@ -0,0 +1,64 @@
+import zlib
+from typing import Dict, Optional
+import numpy as np
+from services.product_index import terms
+
+# Only two vectors exist per comparison, so they can be wide enough that collisions are rare
+PRESCREEN_DIMENSIONS = 1 << 16
+
+def hashed_vector(text: str, dimensions: int = PRESCREEN_DIMENSIONS) -> np.ndarray:
+    """Unit-length vector of signed, sublinear counts of hashed words and word bigrams."""
+    words = terms(text)
+    counts: Dict[str, int] = {}
+    for term in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+        counts[term] = counts.get(term, 0) + 1
+
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for term, count in counts.items():
+        digest = zlib.crc32(term.encode("utf-8"))
+        vector[digest % dimensions] += (-1.0 if digest & 0x80000000 else 1.0) * (1.0 + np.log(count))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class PreScreen:
+    """
+    Local first pass over a video summary before the comparison LLM call.
+    Summaries whose wording barely overlaps the manifesto are clear No's, and very close
+    ones clear Yes's; only the band in between is worth a model round trip.
+    Thresholds come from scripts/evaluate_prescreen.py run against past model verdicts;
+    no_below <= 0 and yes_above > 1 turn either side off.
+    """
+
+    def __init__(self, no_below: float, yes_above: float, dimensions: int = PRESCREEN_DIMENSIONS):
+        self.no_below = no_below
+        self.yes_above = yes_above
+        self.dimensions = dimensions
+        self._manifesto: Optional[str] = None
+        self._manifesto_vector: Optional[np.ndarray] = None
+        self._stats = {"screened": 0, "yes": 0, "no": 0, "ambiguous": 0}
+
+    def score(self, manifesto: str, summary: str) -> float:
+        if manifesto != self._manifesto:
+            self._manifesto, self._manifesto_vector = manifesto, hashed_vector(manifesto, self.dimensions)
+        return float(self._manifesto_vector @ hashed_vector(summary, self.dimensions))
+
+    def screen(self, manifesto: str, summary: str) -> Optional[Dict]:
+        """A {"verdict", "reason", "score"} decided locally, or None when the model has to judge."""
+        if not manifesto or not summary:
+            return None # nothing to compare against: leave it to the model
+        score = self.score(manifesto, summary)
+        self._stats["screened"] += 1
+        if self.no_below > 0 and score < self.no_below:
+            self._stats["no"] += 1
+            reason = f"Pre-screen: the video shares almost none of the manifesto's themes (similarity {score:.2f})."
+            return {"verdict": "No", "reason": reason, "score": round(score, 4)}
+        if self.yes_above <= 1 and score >= self.yes_above:
+            self._stats["yes"] += 1
+            reason = f"Pre-screen: the video closely matches the manifesto's themes (similarity {score:.2f})."
+            return {"verdict": "Yes", "reason": reason, "score": round(score, 4)}
+        self._stats["ambiguous"] += 1
+        return None
+
+    def stats(self) -> Dict:
+        return {**self._stats, "no_below": self.no_below, "yes_above": self.yes_above}
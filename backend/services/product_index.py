@@ -0,0 +1,344 @@
+import asyncio
+import json
+import logging
+import math
+import re
+import threading
+import time
+import zlib
+from typing import AsyncIterable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from services.db import connect
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it its of on or our that the this to with you your".split()
+)
+# Titles, tags and types say more about a product than its description copy
+FIELD_WEIGHTS = (("title", 2.0), ("tags", 2.0), ("product_type", 1.5), ("description", 1.0))
+
+def terms(text: str) -> List[str]:
+    """Lowercased words without stopwords."""
+    return [word for word in TOKEN_PATTERN.findall(text.lower()) if word not in STOPWORDS]
+
+def product_text(product: Dict) -> Dict[str, str]:
+    tags = product.get("tags") or []
+    return {
+        "title": product.get("title") or "",
+        "tags": " ".join(tags) if isinstance(tags, list) else str(tags),
+        "product_type": product.get("product_type") or "",
+        "description": product.get("description") or "",
+    }
+
+def product_line(product: Dict, max_description: int = 200) -> str:
+    tags = product.get("tags") or []
+    line = f"- Product: {product['title']} | Tags: {tags}"
+    if product.get("description"):
+        line += f" | {product['description'][:max_description]}"
+    return line
+
+
+class ShopIndex:
+    """
+    One shop's catalog as sparse rows of signed hashed term weights (1 + log tf, field-weighted)
+    with document frequencies kept alongside. Rows are packed into flat (row, column, value)
+    arrays when scored, so TF-IDF scores come from a few vectorized passes over the non-zeros
+    and memory follows the terms products have, not the bucket count. Removal swaps in the last row.
+    """
+
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+        self.ids: List[str] = []
+        self.products: List[Dict] = []
+        self.position: Dict[str, int] = {}
+        self.rows: List[Tuple[np.ndarray, np.ndarray]] = [] # (columns, values) per product
+        self.df = np.zeros(dimensions, dtype=np.int32)
+        self._packed: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None # reset on every change
+        self._norms: Optional[np.ndarray] = None # per-row TF-IDF norms; reset when df changes
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def vectorize(self, fields: Dict[str, str], weights: Iterable[Tuple[str, float]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (columns, values) of the hashed, sublinear term weights for some text fields.
+        Each term also gets a sign from its hash, so terms that collide in a bucket tend
+        to cancel out in dot products instead of adding up.
+        """
+        counts: Dict[str, float] = {}
+        for name, weight in weights:
+            for term in terms(fields.get(name, "")):
+                counts[term] = counts.get(term, 0.0) + weight
+
+        buckets: Dict[int, float] = {}
+        for term, count in counts.items():
+            digest = zlib.crc32(term.encode("utf-8"))
+            column = digest % self.dimensions
+            sign = -1.0 if digest & 0x80000000 else 1.0
+            buckets[column] = buckets.get(column, 0.0) + sign * (1.0 + math.log(count))
+        columns = np.fromiter(buckets.keys(), dtype=np.int32, count=len(buckets))
+        values = np.fromiter(buckets.values(), dtype=np.float32, count=len(buckets))
+        return columns, values
+
+    def upsert(self, product: Dict):
+        columns, values = self.vectorize(product_text(product), FIELD_WEIGHTS)
+        row = self.position.get(product["id"])
+        if row is None:
+            self.position[product["id"]] = len(self.ids)
+            self.ids.append(product["id"])
+            self.products.append(product)
+            self.rows.append((columns, values))
+        else:
+            self.df[self.rows[row][0]] -= 1
+            self.rows[row] = (columns, values)
+            self.products[row] = product
+        self.df[columns] += 1
+        self._changed()
+
+    def remove(self, product_id: str) -> bool:
+        row = self.position.pop(product_id, None)
+        if row is None:
+            return False
+        self.df[self.rows[row][0]] -= 1
+        last = len(self.ids) - 1
+        if row != last:
+            self.ids[row], self.products[row], self.rows[row] = self.ids[last], self.products[last], self.rows[last]
+            self.position[self.ids[row]] = row
+        self.ids.pop()
+        self.products.pop()
+        self.rows.pop()
+        self._changed()
+        return True
+
+    def _changed(self):
+        self._packed = None
+        self._norms = None
+
+    def packed(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Every non-zero as (row, column, value), rebuilt after a change."""
+        if self._packed is None:
+            lengths = [len(columns) for columns, _ in self.rows]
+            self._packed = (
+                np.repeat(np.arange(len(self.rows), dtype=np.int32), lengths),
+                np.concatenate([columns for columns, _ in self.rows] or [np.zeros(0, dtype=np.int32)]),
+                np.concatenate([values for _, values in self.rows] or [np.zeros(0, dtype=np.float32)]),
+            )
+        return self._packed
+
+    def idf(self) -> np.ndarray:
+        return (np.log((1 + len(self.ids)) / (1 + self.df)) + 1).astype(np.float32)
+
+    def norms(self, idf: np.ndarray) -> np.ndarray:
+        if self._norms is None:
+            rows, columns, values = self.packed()
+            self._norms = np.sqrt(np.bincount(rows, np.square(values * idf[columns]), minlength=len(self.ids)))
+            self._norms[self._norms == 0] = 1
+        return self._norms
+
+    def top_k(self, text: str, k: int) -> List[Tuple[int, float]]:
+        """(row, cosine score) of the k products closest to `text`; products sharing no term are left out."""
+        if not self.ids or k <= 0:
+            return []
+        columns, values = self.vectorize({"text": text}, (("text", 1.0),))
+        if not len(columns):
+            return []
+        idf = self.idf()
+        query = values * idf[columns]
+        weights = np.zeros(self.dimensions, dtype=np.float32)
+        weights[columns] = query * idf[columns] # the query, times the idf the product side is missing
+        rows, product_columns, product_values = self.packed()
+        scores = np.bincount(rows, product_values * weights[product_columns], minlength=len(self.ids)) / self.norms(idf)
+        scores /= np.linalg.norm(query)
+        return self._best(scores, k)
+
+    def representative(self, k: int) -> List[Tuple[int, float]]:
+        """Products closest to the catalog's centroid: what the store is mostly about."""
+        if not self.ids:
+            return []
+        idf = self.idf()
+        rows, columns, values = self.packed()
+        normalized = values * idf[columns] / self.norms(idf)[rows]
+        centroid = np.bincount(columns, normalized, minlength=self.dimensions) / len(self.ids)
+        return self._best(np.bincount(rows, normalized * centroid[columns], minlength=len(self.ids)), k, keep_zero=True)
+
+    def _best(self, scores: np.ndarray, k: int, keep_zero: bool = False) -> List[Tuple[int, float]]:
+        k = min(k, len(scores))
+        rows = np.argpartition(-scores, k - 1)[:k]
+        rows = rows[np.argsort(-scores[rows], kind="stable")]
+        return [(int(row), float(scores[row])) for row in rows if keep_zero or scores[row] > 0]
+
+
+class ProductIndex:
+    """
+    Per-shop product relevance index for prompt building.
+    Products live in the shared SQLite database (so every worker sees the same catalog);
+    each process keeps a NumPy `ShopIndex` per shop, rebuilt when another process has
+    written a newer version and otherwise updated in place by full scans and webhooks.
+    """
+
+    def __init__(self, path: str = None, dimensions: int = 4096):
+        self.path = path
+        self.dimensions = dimensions
+        self._shops: Dict[str, Tuple[int, ShopIndex]] = {}
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS catalog_products (
+                    shop TEXT NOT NULL,
+                    product_id TEXT NOT NULL,
+                    product TEXT NOT NULL,
+                    PRIMARY KEY (shop, product_id)
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS catalog_index_versions (
+                    shop TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _connect(self):
+        return connect(self.path)
+
+    def _version(self, conn, shop: str) -> int:
+        row = conn.execute("SELECT version FROM catalog_index_versions WHERE shop = ?", (shop,)).fetchone()
+        return row["version"] if row else 0
+
+    def _bump(self, conn, shop: str) -> int:
+        version = self._version(conn, shop) + 1
+        conn.execute(
+            "INSERT OR REPLACE INTO catalog_index_versions (shop, version, updated_at) VALUES (?, ?, ?)",
+            (shop, version, time.time()),
+        )
+        return version
+
+    def _index(self, shop: str) -> ShopIndex:
+        """The shop's in-memory index, reloaded if its stored version moved on. Call with the lock held."""
+        with self._connect() as conn:
+            return self._load(conn, shop)
+
+    def _load(self, conn, shop: str) -> ShopIndex:
+        version = self._version(conn, shop)
+        loaded = self._shops.get(shop)
+        if loaded is not None and loaded[0] == version:
+            return loaded[1]
+        rows = conn.execute("SELECT product FROM catalog_products WHERE shop = ?", (shop,)).fetchall()
+        index = ShopIndex(self.dimensions)
+        for row in rows:
+            index.upsert(json.loads(row["product"]))
+        self._shops[shop] = (version, index)
+        return index
+
+    def replace(self, shop: str, products: Iterable[Dict]):
+        """Swap in a full catalog scan."""
+        index = ShopIndex(self.dimensions)
+        for product in products:
+            index.upsert(product)
+        self._store(shop, index)
+
+    def _store(self, shop: str, index: ShopIndex):
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM catalog_products WHERE shop = ?", (shop,))
+            conn.executemany(
+                "INSERT OR REPLACE INTO catalog_products (shop, product_id, product) VALUES (?, ?, ?)",
+                ((shop, product["id"], json.dumps(product)) for product in index.products),
+            )
+            self._shops[shop] = (self._bump(conn, shop), index)
+        logger.info("Indexed %d products for %s", len(index), shop)
+
+    def upsert(self, shop: str, products: List[Dict]):
+        with self._lock:
+            with self._connect() as conn:
+                # Load inside the write transaction so another worker's write can't land between
+                # reading the index and tagging it with the version this write bumps to
+                conn.execute("BEGIN IMMEDIATE")
+                index = self._load(conn, shop)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO catalog_products (shop, product_id, product) VALUES (?, ?, ?)",
+                    [(shop, product["id"], json.dumps(product)) for product in products],
+                )
+                version = self._bump(conn, shop)
+            for product in products:
+                index.upsert(product)
+            self._shops[shop] = (version, index)
+
+    def remove(self, shop: str, product_ids: List[str]):
+        with self._lock:
+            with self._connect() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                index = self._load(conn, shop)
+                conn.executemany(
+                    "DELETE FROM catalog_products WHERE shop = ? AND product_id = ?",
+                    [(shop, product_id) for product_id in product_ids],
+                )
+                version = self._bump(conn, shop)
+            for product_id in product_ids:
+                index.remove(product_id)
+            self._shops[shop] = (version, index)
+
+    def size(self, shop: str) -> int:
+        with self._lock:
+            return len(self._index(shop))
+
+    def top_k(self, shop: str, text: str, k: int) -> List[Dict]:
+        """The k products most relevant to `text` (e.g. a video summary), best first, with scores."""
+        with self._lock:
+            index = self._index(shop)
+            return [{**index.products[row], "score": round(score, 4)} for row, score in index.top_k(text, k)]
+
+    def representative(self, shop: str, k: int) -> List[Dict]:
+        with self._lock:
+            index = self._index(shop)
+            return [index.products[row] for row, _ in index.representative(k)]
+
+    async def areplace(self, shop: str, products: AsyncIterable[Dict], batch: int = 250) -> int:
+        """Swap in a catalog scan as it streams in, a page at a time; returns the product count."""
+        index = ShopIndex(self.dimensions)
+        pending: List[Dict] = []
+        async for product in products:
+            pending.append(product)
+            if len(pending) >= batch:
+                await asyncio.to_thread(_upsert_all, index, pending)
+                pending = []
+        await asyncio.to_thread(_upsert_all, index, pending)
+        await asyncio.to_thread(self._store, shop, index)
+        return len(index)
+
+    async def aupsert(self, shop: str, products: List[Dict]):
+        await asyncio.to_thread(self.upsert, shop, products)
+
+    async def aremove(self, shop: str, product_ids: List[str]):
+        await asyncio.to_thread(self.remove, shop, product_ids)
+
+    async def atop_k(self, shop: str, text: str, k: int) -> List[Dict]:
+        return await asyncio.to_thread(self.top_k, shop, text, k)
+
+    async def arepresentative(self, shop: str, k: int) -> List[Dict]:
+        return await asyncio.to_thread(self.representative, shop, k)
+
+
+def _upsert_all(index: ShopIndex, products: List[Dict]):
+    for product in products:
+        index.upsert(product)
+
+
+def webhook_product(payload: Dict) -> Dict:
+    """A REST products/create or products/update webhook body, normalized like a catalog scan."""
+    from services.shopify import html_to_text
+    tags = payload.get("tags") or ""
+    return {
+        "id": payload.get("admin_graphql_api_id") or f"gid://shopify/Product/{payload['id']}",
+        "title": payload.get("title") or "",
+        "description": html_to_text(payload.get("body_html")),
+        "tags": [tag.strip() for tag in tags.split(",") if tag.strip()] if isinstance(tags, str) else tags,
+        "product_type": payload.get("product_type") or "",
+        "updated_at": payload.get("updated_at"),
+    }
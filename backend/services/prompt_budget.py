@@ -0,0 +1,101 @@
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Set, Tuple
+from services.cache import content_hash
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4 # rough English average; close enough for budgeting without a tokenizer
+TRUNCATION_MARK = " [...]"
+
+def count_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+@dataclass
+class PromptSection:
+    name: str
+    text: str
+    priority: int = 0 # when over budget, lower priorities are cut first
+    required: bool = False # never cut (the task itself, the item being judged)
+    static: bool = False # same on every call: sent once per thread, then referred to
+    in_assistant: bool = False # already in the assistant's instructions: never sent
+    reference: str = "" # what replaces a static section the thread has already seen
+
+    @property
+    def key(self) -> str:
+        return content_hash(f"{self.name}\n{self.text}")
+
+
+class PromptBudget:
+    """
+    Builds a prompt from prioritized sections within a per-call token budget.
+    Static context (the manifesto) goes into a thread once; later messages on the same
+    thread only refer to it. Lower-priority context is truncated, then dropped, until the
+    prompt fits. Tokens saved both ways are logged and counted.
+    """
+
+    def __init__(self, name: str, max_tokens: int):
+        self.name = name
+        self.max_tokens = max_tokens
+        self._stats = {"calls": 0, "tokens_sent": 0, "saved_dedup": 0, "saved_truncated": 0}
+
+    def build(self, sections: List[PromptSection], seen: Set[str] = frozenset()) -> Tuple[str, Set[str]]:
+        """(prompt, keys of the static sections it carries) for a thread that has already seen `seen`."""
+        texts: Dict[int, str] = {}
+        carried: Set[str] = set()
+        saved_dedup = 0
+        for index, section in enumerate(sections):
+            if section.in_assistant or (section.static and section.key in seen):
+                texts[index] = section.reference
+                saved_dedup += max(0, count_tokens(section.text) - count_tokens(section.reference))
+                continue
+            texts[index] = section.text
+            if section.static:
+                carried.add(section.key)
+
+        saved_truncated = 0
+        overflow = sum(count_tokens(text) for text in texts.values()) - self.max_tokens
+        cuttable = sorted((i for i, s in enumerate(sections) if not s.required), key=lambda i: sections[i].priority)
+        for index in cuttable:
+            if overflow <= 0:
+                break
+            before = count_tokens(texts[index])
+            texts[index] = truncate(texts[index], before - overflow)
+            cut = before - count_tokens(texts[index])
+            saved_truncated += cut
+            overflow -= cut
+            if sections[index].static:
+                carried.discard(sections[index].key) # a cut copy doesn't count as sent
+
+        prompt = "\n\n".join(text for _, text in sorted(texts.items()) if text)
+        self._count(count_tokens(prompt), saved_dedup, saved_truncated)
+        if saved_dedup or saved_truncated:
+            logger.debug(
+                "Prompt '%s': %d tokens, saved %d already in context and %d truncated",
+                self.name, count_tokens(prompt), saved_dedup, saved_truncated,
+            )
+        if overflow > 0:
+            logger.warning("Prompt '%s': required context is %d tokens over the %d budget", self.name, overflow, self.max_tokens)
+        return prompt, carried
+
+    def _count(self, sent: int, saved_dedup: int, saved_truncated: int):
+        self._stats["calls"] += 1
+        self._stats["tokens_sent"] += sent
+        self._stats["saved_dedup"] += saved_dedup
+        self._stats["saved_truncated"] += saved_truncated
+
+    def stats(self) -> Dict:
+        return dict(self._stats)
+
+
+def truncate(text: str, max_tokens: int) -> str:
+    """Cut to roughly `max_tokens` at a line or word boundary; too little room drops it entirely."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    limit = max_tokens * CHARS_PER_TOKEN - len(TRUNCATION_MARK)
+    if limit < 40:
+        return ""
+    head = text[:limit]
+    cut = max(head.rfind("\n"), head.rfind(" "))
+    return (head[:cut] if cut > limit // 2 else head).rstrip() + TRUNCATION_MARK
@@ -0,0 +1,260 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import html
+import json
+import logging
+import re
+import time
+from typing import AsyncIterator, Dict, Optional
+import httpx
+from services.outbound import backoff_delay, retry_after_seconds
+from services.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+SHOPIFY_API_VERSION = "2026-01"
+
+PRODUCT_FIELDS = "id title descriptionHtml tags productType updatedAt"
+
+def products_page_query(fields: str) -> str:
+    return f"""
+    query Products($first: Int!, $after: String) {{
+        products(first: $first, after: $after) {{
+            edges {{ node {{ {fields} }} }}
+            pageInfo {{ hasNextPage endCursor }}
+        }}
+    }}
+    """
+
+SHOP_QUERY = """
+{
+    shop { name description }
+    productsCount { count }
+}
+"""
+
+def bulk_run_mutation(fields: str) -> str:
+    return f'''
+    mutation {{
+        bulkOperationRunQuery(query: """{{ products {{ edges {{ node {{ {fields} }} }} }} }}""") {{
+            bulkOperation {{ id status }}
+            userErrors {{ field message }}
+        }}
+    }}
+    '''
+
+BULK_STATUS_QUERY = """
+query BulkStatus($id: ID!) {
+    node(id: $id) { ... on BulkOperation { id status errorCode objectCount url } }
+}
+"""
+
+class ShopifyError(Exception):
+    pass
+
+
+def verify_webhook(body: bytes, signature: Optional[str], secret: str) -> bool:
+    """Check X-Shopify-Hmac-Sha256: base64 HMAC-SHA256 of the raw body with the app secret."""
+    if not signature:
+        return False
+    digest = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).digest()
+    return hmac.compare_digest(base64.b64encode(digest).decode("ascii"), signature)
+
+def html_to_text(fragment: Optional[str]) -> str:
+    text = re.sub(r"<[^>]+>", " ", fragment or "")
+    return re.sub(r"\s+", " ", html.unescape(text)).strip()
+
+def normalize_product(node: Dict) -> Dict:
+    return {
+        "id": node["id"],
+        "title": node.get("title", ""),
+        "description": html_to_text(node.get("descriptionHtml")),
+        "tags": node.get("tags") or [],
+        "product_type": node.get("productType") or "",
+        "updated_at": node.get("updatedAt"),
+    }
+
+
+class ThrottleState:
+    """
+    Client-side view of a shop's GraphQL cost bucket, refreshed from every response's
+    `extensions.cost.throttleStatus`, so we wait for points to restore instead of getting THROTTLED.
+    """
+
+    def __init__(self):
+        self.maximum = 1000.0
+        self.available = 1000.0
+        self.restore_rate = 50.0
+        self.updated_at = time.monotonic()
+
+    def estimate(self) -> float:
+        elapsed = time.monotonic() - self.updated_at
+        return min(self.maximum, self.available + elapsed * self.restore_rate)
+
+    def delay_for(self, cost: float) -> float:
+        missing = cost - self.estimate()
+        return max(0.0, missing / self.restore_rate)
+
+    def update(self, status: Dict):
+        self.maximum = float(status.get("maximumAvailable", self.maximum))
+        self.available = float(status.get("currentlyAvailable", self.available))
+        self.restore_rate = float(status.get("restoreRate", self.restore_rate)) or 1.0
+        self.updated_at = time.monotonic()
+
+
+class ShopifyClient:
+    """
+    Async Shopify Admin GraphQL client on one pooled HTTP connection pool.
+    Small catalogs are paged with cursors; catalogs at or above `bulk_threshold`
+    products go through the Bulk Operations API and are streamed back as JSONL.
+    """
+
+    def __init__(
+        self,
+        http: httpx.AsyncClient,
+        page_size: int = 100,
+        bulk_threshold: int = 2000,
+        max_retries: int = 5,
+        bulk_timeout: float = 1800.0,
+    ):
+        self.http = http
+        self.page_size = page_size
+        self.bulk_threshold = bulk_threshold
+        self.max_retries = max_retries
+        self.bulk_timeout = bulk_timeout # seconds a bulk operation may run before the scan gives up
+        self._throttles: Dict[str, ThrottleState] = {}
+
+    async def aclose(self):
+        await self.http.aclose()
+
+    async def query(self, shop: str, token: str, query: str, variables: Dict = None, cost: float = 10) -> Dict:
+        """Run one GraphQL query, waiting out the cost bucket and retrying THROTTLED responses."""
+        url = f"https://{shop}/admin/api/{SHOPIFY_API_VERSION}/graphql.json"
+        headers = {
+            "Content-Type": "application/json",
+            "X-Shopify-Access-Token": token,
+        }
+        throttle = self._throttles.setdefault(shop, ThrottleState())
+
+        for attempt in range(self.max_retries + 1):
+            delay = throttle.delay_for(cost)
+            if delay:
+                await asyncio.sleep(delay)
+
+            with span("shopify.query", shop=shop):
+                response = await self.http.post(url, json={"query": query, "variables": variables or {}}, headers=headers)
+            if response.status_code == 429 or response.status_code >= 500:
+                delay = retry_after_seconds(response.headers)
+                await asyncio.sleep(delay if delay is not None else backoff_delay(attempt))
+                continue
+            if response.status_code != 200:
+                raise ShopifyError(f"Shopify API Error {response.status_code}: {response.text}")
+
+            body = response.json()
+            status = body.get("extensions", {}).get("cost", {}).get("throttleStatus")
+            if status:
+                throttle.update(status)
+
+            errors = body.get("errors") or []
+            if any(error.get("extensions", {}).get("code") == "THROTTLED" for error in errors):
+                continue # the cost bucket, just refreshed from this response, paces the retry
+            if errors:
+                raise ShopifyError(f"Shopify GraphQL Error: {errors}")
+            return body.get("data", {})
+
+        raise ShopifyError("Shopify API throttled too many times")
+
+    async def shop_info(self, shop: str, token: str) -> Dict:
+        data = await self.query(shop, token, SHOP_QUERY)
+        return {
+            "name": data.get("shop", {}).get("name", ""),
+            "description": data.get("shop", {}).get("description") or "No description",
+            "product_count": (data.get("productsCount") or {}).get("count", 0),
+        }
+
+    async def iter_catalog(
+        self,
+        shop: str,
+        token: str,
+        product_count: int = None,
+        fields: str = PRODUCT_FIELDS,
+    ) -> AsyncIterator[Dict]:
+        """
+        Stream every product, choosing pagination or a bulk operation by catalog size.
+        `fields` narrows the selection when only a few attributes are needed.
+        """
+        if product_count is None:
+            product_count = (await self.shop_info(shop, token))["product_count"]
+
+        if product_count >= self.bulk_threshold:
+            logger.info("Catalog has %d products, using a bulk operation", product_count)
+            products = self.iter_products_bulk(shop, token, fields)
+        else:
+            products = self.iter_products(shop, token, fields)
+
+        async for product in products:
+            yield product
+
+    async def iter_products(self, shop: str, token: str, fields: str = PRODUCT_FIELDS) -> AsyncIterator[Dict]:
+        cursor = None
+        while True:
+            data = await self.query(
+                shop,
+                token,
+                products_page_query(fields),
+                {"first": self.page_size, "after": cursor},
+                cost=self.page_size + 2,
+            )
+            products = data.get("products", {})
+            for edge in products.get("edges", []):
+                yield normalize_product(edge["node"])
+
+            page_info = products.get("pageInfo", {})
+            if not page_info.get("hasNextPage"):
+                return
+            cursor = page_info.get("endCursor")
+
+    async def iter_products_bulk(
+        self,
+        shop: str,
+        token: str,
+        fields: str = PRODUCT_FIELDS,
+        poll_interval: float = 1.0,
+    ) -> AsyncIterator[Dict]:
+        data = await self.query(shop, token, bulk_run_mutation(fields))
+        result = data.get("bulkOperationRunQuery", {})
+        if result.get("userErrors"):
+            raise ShopifyError(f"Bulk operation rejected: {result['userErrors']}")
+        operation_id = result["bulkOperation"]["id"]
+
+        deadline = time.monotonic() + self.bulk_timeout
+        while True:
+            operation = (await self.query(shop, token, BULK_STATUS_QUERY, {"id": operation_id}, cost=1)).get("node") or {}
+            status = operation.get("status")
+            if status == "COMPLETED":
+                break
+            if status in ("FAILED", "CANCELED", "EXPIRED"):
+                raise ShopifyError(f"Bulk operation {status}: {operation.get('errorCode')}")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ShopifyError(f"Bulk operation {operation_id} still {status} after {self.bulk_timeout:.0f}s")
+            await asyncio.sleep(min(poll_interval, remaining))
+            poll_interval = min(poll_interval * 1.5, 10.0)
+
+        if not operation.get("url"):
+            return # no products at all
+
+        # The result file can be huge; parse it line by line as it downloads
+        async with self.http.stream("GET", operation["url"]) as response:
+            if response.status_code != 200:
+                # e.g. an expired signed URL, which answers with an XML error body
+                raise ShopifyError(f"Bulk operation result download failed: {response.status_code}")
+            async for line in response.aiter_lines():
+                if line.strip():
+                    try:
+                        product = json.loads(line)
+                    except ValueError as e:
+                        raise ShopifyError(f"Bulk operation result is not JSONL: {e}") from e
+                    yield normalize_product(product)
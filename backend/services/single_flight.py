@@ -0,0 +1,65 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """
+    Collapses concurrent identical calls into one: the first caller for a key starts the
+    work and everyone arriving while it runs awaits the same result (or exception).
+    The work is cancelled only once every caller waiting on it has gone away.
+    Nothing is cached after it finishes; that is the result caches' job.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+        self._stats = {"calls": 0, "executed": 0, "coalesced": 0, "cancelled": 0, "saved_seconds": 0.0}
+
+    async def do(self, key: str, work: Callable[[], Awaitable[Any]]) -> Any:
+        self._stats["calls"] += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self._stats["executed"] += 1
+            task = asyncio.ensure_future(self._run(key, work))
+            self._inflight[key] = task
+        else:
+            self._stats["coalesced"] += 1
+            logger.debug("Single-flight '%s': joined in-flight call", self.name)
+            joined_at = time.perf_counter()
+            task.add_done_callback(lambda _: self._saved(joined_at))
+
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            # A caller that goes away must not cancel the work the others are waiting on...
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+                if not task.done():
+                    # ...but once the last one has, nobody wants the result
+                    self._stats["cancelled"] += 1
+                    self._inflight.pop(key, None)
+                    task.cancel()
+
+    async def _run(self, key: str, work: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            return await work()
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+
+    def _saved(self, joined_at: float):
+        # Upstream time a coalesced caller didn't spend on its own call (at least the time it waited)
+        self._stats["saved_seconds"] += time.perf_counter() - joined_at
+
+    def stats(self) -> Dict:
+        return {
+            **self._stats,
+            "saved_seconds": round(self._stats["saved_seconds"], 3),
+            "in_flight": len(self._inflight),
+        }
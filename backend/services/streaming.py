@@ -0,0 +1,78 @@
+import asyncio
+import contextvars
+import json
+import logging
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no", # keep reverse proxies from buffering the stream
+}
+
+def sse_event(event: str, data: Any) -> str:
+    """One server-sent event; data is JSON so tokens with newlines stay on one line."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events: AsyncIterable[str]) -> StreamingResponse:
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS)
+
+async def result_events(items: AsyncIterator) -> AsyncIterator[str]:
+    """
+    Turn a service stream into SSE. Services yield text tokens (str) and finish with one
+    dict, the same result the non-streaming endpoint returns, which becomes the `done` event.
+    Errors become an `error` event since the 200 status has already been sent.
+    """
+    try:
+        async for item in items:
+            if isinstance(item, dict):
+                yield sse_event("done", item)
+            else:
+                yield sse_event("token", {"text": item})
+    except Exception as e:
+        logger.error("Stream Error: %s", e)
+        yield sse_event("error", {"error": str(e) or type(e).__name__})
+
+async def iterate_in_thread(iterable: Iterable) -> AsyncIterator:
+    """
+    Consume a blocking iterator in a worker thread and yield its items on the event loop.
+    The worker always runs the iterator to the end, so whatever it persists once finished
+    still gets written if the client disconnects halfway through.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    end = object()
+
+    def put(item, error=None):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (item, error))
+        except RuntimeError:
+            pass # loop already closed; nobody is listening
+
+    def produce():
+        try:
+            for item in iterable:
+                put(item)
+        except BaseException as e:
+            put(end, e)
+        else:
+            put(end)
+
+    # run_in_executor doesn't carry context over like to_thread does; keep the request id
+    worker = loop.run_in_executor(None, contextvars.copy_context().run, produce)
+    while True:
+        item, error = await queue.get()
+        if item is end:
+            await worker
+            if error is not None:
+                raise error
+            return
+        yield item
+
+async def backboard_content(chunks: AsyncIterator[Dict]) -> AsyncIterator[str]:
+    """Text deltas from a `stream=True` Backboard add_message response."""
+    async for chunk in chunks:
+        if chunk.get("type") == "content_streaming" and chunk.get("content"):
+            yield chunk["content"]
@@ -0,0 +1,285 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Request id of the HTTP request being served; copied into worker threads by asyncio.to_thread
+request_id: ContextVar[str] = ContextVar("request_id", default="-")
+# Spans finished so far in the current request, for its summary log line
+_request_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_spans", default=None)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+logger = logging.getLogger(__name__)
+
+def route_template(scope) -> str:
+    """The matched route's path template ("/api/campaign/video/{filename}"), so ids in paths don't become one series each."""
+    route = scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {value:g}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {value:.6f}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {} # bucket counts..., +Inf count, sum
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            series = self._series.setdefault(labels, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets + (float("inf"),), series):
+                    le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                    lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {count:g}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {series[-1]:.6f}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {series[-2]:g}")
+        return lines
+
+
+class Collected:
+    """
+    A metric read at scrape time from counters a component already keeps (its `stats()`),
+    instead of being updated as things happen. `collect()` returns (label values, value) pairs.
+    """
+
+    def __init__(self, name: str, help: str, kind: str, labels: Iterable[str], collect: Callable[[], Iterable[Tuple[Tuple[str, ...], float]]]):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.label_names = tuple(labels)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in sorted(self.collect()):
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {value:g}")
+        return lines
+
+
+class Metrics:
+    """
+    The process's counters and histograms in Prometheus text format. Each worker process
+    keeps its own; scrape every worker (or sum them) when running more than one.
+    """
+
+    def __init__(self):
+        self.stage_seconds = Histogram(
+            "shopecho_stage_seconds", "Duration of instrumented pipeline stages.", ("stage", "outcome"),
+        )
+        self.http_seconds = Histogram(
+            "shopecho_http_request_seconds", "HTTP request duration, including streamed bodies.", ("method", "route"),
+        )
+        self.http_requests = Counter(
+            "shopecho_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"),
+        )
+        self.log_messages = Counter(
+            "shopecho_log_messages_total", "Log records emitted, by level.", ("level",),
+        )
+        self.startup_seconds = Gauge(
+            "shopecho_startup_seconds", "Cold start: importing the app, and the lifespan up to taking traffic.", ("phase",),
+        )
+
+        self.collected: List[Collected] = []
+
+    def add(self, metric: Collected):
+        self.collected.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in (self.stage_seconds, self.http_seconds, self.http_requests, self.log_messages, self.startup_seconds, *self.collected):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def span(name: str, /, **fields):
+    """
+    Time a stage: observed in shopecho_stage_seconds (by outcome), added to the request's
+    summary line and logged at DEBUG with the request id and any extra `fields`.
+    Works the same in async code and in worker threads.
+    """
+    from config import get_metrics
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        get_metrics().stage_seconds.observe(seconds, name, outcome)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((name, seconds))
+        if logger.isEnabledFor(logging.DEBUG):
+            details = "".join(f" {key}={value}" for key, value in fields.items())
+            logger.debug("span %s %s %.3fs%s", name, outcome, seconds, details)
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamps each record with the request id (on the thread that logged it) and counts it."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        from config import get_metrics
+        record.request_id = request_id.get()
+        get_metrics().log_messages.inc(record.levelname)
+        return True
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop() # flushes what is still queued
+
+def _restart_listener():
+    """The listener thread doesn't survive fork(): give each forked worker its own queue and thread."""
+    global _listener
+    if _listener is None:
+        return
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    _queue_handler.queue = records
+    _listener = logging.handlers.QueueListener(records, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+def configure_logging(level: str = "INFO"):
+    """
+    Route every log record through a queue to a background thread that does the console
+    writes, so request handlers only pay for an enqueue. Safe to call more than once.
+    """
+    global _listener, _queue_handler
+    root = logging.getLogger()
+    root.setLevel(level.upper())
+    if _listener is not None:
+        return
+
+    console = logging.StreamHandler(sys.stderr)
+    console.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(name)s [%(request_id)s] %(message)s"))
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    _queue_handler = logging.handlers.QueueHandler(records)
+    _queue_handler.addFilter(RequestContextFilter())
+    root.addHandler(_queue_handler)
+
+    _listener = logging.handlers.QueueListener(records, console, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_stop_listener)
+    os.register_at_fork(after_in_child=_restart_listener) # preforked workers (serve.py)
+
+
+class RequestTelemetry:
+    """
+    ASGI middleware: gives every HTTP request an id (from X-Request-ID or a new one, echoed
+    back in the response), records its duration and status per route, and logs one line
+    per request with the spans it ran.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        rid = headers.get(b"x-request-id", b"").decode("latin-1")[:64] or uuid.uuid4().hex[:16]
+        rid_token = request_id.set(rid)
+        spans_token = _request_spans.set([])
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", rid.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            from config import get_metrics
+            seconds = time.perf_counter() - started
+            path = route_template(scope)
+            metrics = get_metrics()
+            metrics.http_seconds.observe(seconds, scope["method"], path)
+            metrics.http_requests.inc(scope["method"], path, str(status))
+
+            spans = _request_spans.get() or []
+            totals: Dict[str, float] = {}
+            for name, elapsed in spans:
+                totals[name] = totals.get(name, 0.0) + elapsed
+            breakdown = " ".join(f"{name}={elapsed:.3f}" for name, elapsed in totals.items())
+            logger.info("%s %s %d %.3fs%s", scope["method"], scope["path"], status, seconds, f" | {breakdown}" if breakdown else "")
+            _request_spans.reset(spans_token)
+            request_id.reset(rid_token)
@@ -1,139 +1,357 @@
-from twelvelabs import TwelveLabs
-from twelvelabs.core.api_error import ApiError
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Iterator, List
+from config import DEFAULT_SHOP
+from services.artifact_store import ArtifactStore
+from services.asset_registry import AssetRegistry, is_youtube_url
+from services.cache import ResultCache, content_key
+from services.outbound import OutboundScheduler, batch_priority
+from services.indexing import IndexingCancelled, IndexingTimeout, IndexingWaiter, backoff_intervals
+from services.streaming import iterate_in_thread
+from services.telemetry import span
 import asyncio
+import logging
+import threading
 import time
-import re
+
+if TYPE_CHECKING:
+    from twelvelabs import TwelveLabs # imported on first use: the SDK is slow to load
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_PROMPT = "Provide a theme analysis of this video. If videos include snow, extreme sports, or the outdoors, translate those ideas into untamed spirits and connection to nature. If the brand is ARC'TERYX, heavily discuss the untamed spirit, mythical adventure, and profound connection to the wild.. Use 3 short sentences."
+
+# YouTube links can't be uploaded by URL; unregistered ones fall back to the arcteryx video
+FALLBACK_YOUTUBE_VIDEO_ID = "696c0736058486b3c418d29d"
+
+def _span_stage(name: str):
+    return span(f"twelvelabs.{name}")
+
+def _with_spans(stage):
+    """A caller's own stage timer (a job's) that records every step as a span too."""
+    if stage is _span_stage:
+        return stage
+
+    @contextmanager
+    def both(name: str):
+        with stage(name), _span_stage(name):
+            yield
+    return both
+
+# index name -> id, shared by every service instance so the index list is scanned once per process
+_index_ids: Dict[str, str] = {}
+_index_lock = threading.Lock()
 
 class TwelveLabsService:
-    def __init__(self, twelve_labs_api_key: str):
-        self.client = TwelveLabs(api_key=twelve_labs_api_key)
+    def __init__(
+        self,
+        twelve_labs_api_key: str = None,
+        shop: str = DEFAULT_SHOP,
+        client: "TwelveLabs" = None,
+        registry: AssetRegistry = None,
+        cache: ResultCache = None,
+        artifacts: ArtifactStore = None,
+        waiter: IndexingWaiter = None,
+        outbound: OutboundScheduler = None,
+    ):
+        from config import get_config, get_asset_registry, get_result_cache, get_artifact_store, get_twelvelabs_client, get_indexing_waiter, get_outbound_scheduler
+        if client is None:
+            if twelve_labs_api_key:
+                from twelvelabs import TwelveLabs
+                client = TwelveLabs(api_key=twelve_labs_api_key)
+            else:
+                client = get_twelvelabs_client()
+        self.client = client
+        self.shop = shop
+        self.registry = registry or get_asset_registry()
+        self.cache = cache or get_result_cache("analysis")
+        self.artifacts = artifacts or get_artifact_store()
+        self.waiter = waiter or get_indexing_waiter()
+        self.outbound = outbound or get_outbound_scheduler()
+        settings = get_config()
+        self.index_timeout = settings["twelvelabs_index_timeout_seconds"]
+        self.poll_initial = settings["twelvelabs_poll_initial_seconds"]
+        self.poll_max = settings["twelvelabs_poll_max_seconds"]
+        self._cancelled = threading.Event()
+        self._wakes = set() # one event per indexing wait in progress
+
+    def cancel(self):
+        """Stop every indexing wait this service is blocked in (they raise IndexingCancelled)."""
+        self._cancelled.set()
+        for wake in list(self._wakes):
+            wake.set()
 
     async def analyze_video(
         self,
         video_url: str,
     ):
-        prompt: str = "Provide a theme analysis of this video. If videos include snow, extreme sports, or the outdoors, translate those ideas into untamed spirits and connection to nature. If the brand is ARC'TERYX, heavily discuss the untamed spirit, mythical adventure, and profound connection to the wild.. Use 3 short sentences."
         """
         Analyze a video using Pegasus.
         This runs blocking SDK calls in a worker thread.
         """
-        if re.search(r'youtube\.com|youtu\.be', video_url, re.IGNORECASE):
-            return await asyncio.to_thread(self._analyze_existing_sync, video_url, prompt)
-        return await asyncio.to_thread(self._analyze_sync, video_url, prompt)
+        try:
+            return await asyncio.to_thread(self.analyze_video_sync, video_url)
+        except asyncio.CancelledError:
+            # The worker thread can't be cancelled, but it can stop waiting on the index
+            self.cancel()
+            raise
 
-    def _analyze_existing_sync(self, video_url:str, prompt: str):
-        if video_url == "https://www.youtube.com/watch?v=KhLensmQfEQ": # walmart
-            video_id = "696c12c8684c0432bbde7e69"
-        else:
-            video_id = "696c0736058486b3c418d29d" # arcteryx
+    async def stream_analysis(self, video_url: str) -> AsyncIterator:
+        """Async view of iter_analysis_sync; the summary is still saved if the client goes away."""
+        async for item in iterate_in_thread(self.iter_analysis_sync(video_url)):
+            yield item
 
-        print(f"Uploading video from YouTube: {video_url}")
-        text_stream = self.client.analyze_stream(
-            video_id = video_id,
-            prompt=prompt
-        )
-        print(prompt)
+    def analyze_video_sync(self, video_url: str, stage=_span_stage, save_summary: bool = True):
+        """
+        Blocking variant used by background jobs.
+        `stage(name)` is a context manager used to time each step.
+        """
+        stage = _with_spans(stage)
+        video_id = self._resolve_video_sync(video_url, stage)
+        return self._analyze_existing_sync(video_id, ANALYSIS_PROMPT, stage, save_summary)
 
-        full_text = ""
-        for event in text_stream:
-            if event.event_type == "text_generation":
-                full_text += event.text
-                print(event.text, end="", flush=True)
+    async def analyze_batch(self, video_urls: List[str], concurrency: int) -> AsyncIterator[Dict]:
+        """
+        Analyze many videos at once, at most `concurrency` in flight, yielding one
+        {"url", "status", "analysis" | "error"} result per URL in completion order.
+        Batch results only fill the analysis cache; the shop's summary is left alone
+        until a single video is picked through /analyze.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
 
+        async def analyze(video_url: str) -> Dict:
+            # Batch work yields upstream capacity to interactive requests
+            with batch_priority():
+                async with semaphore:
+                    try:
+                        result = await asyncio.to_thread(self.analyze_video_sync, video_url, save_summary=False)
+                        return {"url": video_url, "status": "succeeded", "analysis": result["analysis"]}
+                    except Exception as e:
+                        logger.warning("Batch analysis failed for %s: %s", video_url, e)
+                        return {"url": video_url, "status": "failed", "error": str(e) or type(e).__name__}
+
+        # Resolve the index once up front instead of racing every upload into indexes.list()
+        await asyncio.to_thread(self._prepare_batch, video_urls)
+
+        tasks = [asyncio.create_task(analyze(url)) for url in video_urls]
         try:
-            with open("SUMMARY.md", "w") as f:
-                f.write(full_text)
-        except Exception as e:
-            print(f"File Write Error: {e}")
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            if not all(task.done() for task in tasks):
+                self.cancel()
+            for task in tasks:
+                task.cancel()
+
+    def iter_analysis_sync(self, video_url: str) -> Iterator:
+        """
+        Streaming variant: yields text as Pegasus generates it, then the same
+        {"analysis": ...} dict analyze_video_sync returns. Blocking; run it in a thread.
+        """
+        video_id = self._resolve_video_sync(video_url)
+        yield from self._iter_existing_sync(video_id, ANALYSIS_PROMPT)
+
+    def _prepare_batch(self, video_urls: List[str]):
+        if not all(is_youtube_url(url) or self.registry.get(url) for url in video_urls):
+            self.get_or_create_index()
+
+    def _resolve_video_sync(self, video_url: str, stage=_span_stage) -> str:
+        """Indexed video id for a URL, uploading and indexing it first if needed."""
+        with stage("registry_lookup"):
+            entry = self.registry.get(video_url)
+
+        if entry and entry["status"] == "ready":
+            return entry["indexed_asset_id"]
+        if entry and entry["status"] == "indexing":
+            # A previous request uploaded it but never saw it finish; resume the wait
+            with stage("indexing"):
+                self._wait_for_registered(video_url, entry["index_id"], entry["indexed_asset_id"])
+            return entry["indexed_asset_id"]
+        if is_youtube_url(video_url):
+            logger.warning("No indexed asset registered for %s, using fallback video", video_url)
+            return FALLBACK_YOUTUBE_VIDEO_ID
+        return self._upload_sync(video_url, stage)
+
+    def _analyze_existing_sync(self, video_id: str, prompt: str, stage=_span_stage, save_summary: bool = True):
+        # Same indexed video + same prompt always yields a reusable analysis
+        key = content_key(video_id, prompt)
+        with stage("cache_lookup"):
+            full_text = self.cache.get(key)
+
+        if full_text is None:
+            logger.debug("Analyzing indexed video: id=%s", video_id)
+            with stage("analyze"):
+                full_text = self._stream_analysis(video_id, prompt)
+            self.cache.set(key, full_text)
+
+        if save_summary:
+            with stage("persist"):
+                self._save_summary(full_text)
         
         return {"analysis": full_text}
 
+    def _iter_existing_sync(self, video_id: str, prompt: str) -> Iterator:
+        key = content_key(video_id, prompt)
+        full_text = self.cache.get(key)
 
-    def _analyze_sync(self, video_url: str, prompt: str):
-        index_id = self.get_or_create_index()
+        if full_text is not None:
+            yield full_text
+        else:
+            logger.debug("Analyzing indexed video: id=%s", video_id)
+            parts = []
+            with span("twelvelabs.analyze"):
+                for text in self._iter_tokens(video_id, prompt):
+                    parts.append(text)
+                    yield text
+            full_text = "".join(parts)
+            self.cache.set(key, full_text)
 
-        print(f"Uploading video from URL: {video_url}")
-        asset = self.client.assets.create(
-            method="url",
-            url=video_url
-        )
-        print(f"Created asset: id={asset.id}")
+        with span("twelvelabs.persist"):
+            self._save_summary(full_text)
+        yield {"analysis": full_text}
 
-        indexed_asset = self.client.indexes.indexed_assets.create(
-            index_id=index_id,
-            asset_id=asset.id
-        )
-        print(f"Created indexed asset: id={indexed_asset.id}")
+    def _upload_sync(self, video_url: str, stage=_span_stage) -> str:
+        with stage("index_lookup"):
+            index_id = self.get_or_create_index()
 
-        print("Waiting for indexing to complete...")
-        while True:
-            indexed_asset = self.client.indexes.indexed_assets.retrieve(
-                index_id=index_id,
-                indexed_asset_id=indexed_asset.id
+        with stage("upload"):
+            logger.info("Uploading video from URL: %s", video_url)
+            asset = self.outbound.call_sync(
+                "twelvelabs",
+                lambda: self.client.assets.create(method="url", url=video_url),
             )
+            logger.debug("Created asset: id=%s", asset.id)
 
-            print(f"  Status={indexed_asset.status}")
+            indexed_asset = self.outbound.call_sync(
+                "twelvelabs",
+                lambda: self.client.indexes.indexed_assets.create(index_id=index_id, asset_id=asset.id),
+            )
+            logger.debug("Created indexed asset: id=%s", indexed_asset.id)
+            self.registry.record(video_url, indexed_asset.id, index_id=index_id, asset_id=asset.id)
 
-            if indexed_asset.status == "ready":
-                break
-            if indexed_asset.status == "failed":
-                raise RuntimeError("Video indexing failed")
+        with stage("indexing"):
+            self._wait_for_registered(video_url, index_id, indexed_asset.id)
 
-            time.sleep(5)
+        return indexed_asset.id
 
-        print("Indexing complete!")
+    def _wait_for_registered(self, video_url: str, index_id: str, indexed_asset_id: str):
+        try:
+            self._wait_for_indexing(index_id, indexed_asset_id)
+        except (IndexingTimeout, IndexingCancelled):
+            raise # still "indexing": the next request resumes the wait
+        except RuntimeError:
+            self.registry.set_status(video_url, "failed")
+            raise
+        self.registry.set_status(video_url, "ready")
 
-        text_stream = self.client.analyze_stream(
-            video_id=indexed_asset.id,
-            prompt=prompt
+    def _iter_tokens(self, video_id: str, prompt: str) -> Iterator[str]:
+        text_stream = self.outbound.call_sync(
+            "twelvelabs/analyze",
+            lambda: self.client.analyze_stream(video_id=video_id, prompt=prompt),
         )
 
-
-        full_text = ""
         for event in text_stream:
             if event.event_type == "text_generation":
-                full_text += event.text
-                print(event.text, end="", flush=True)
+                yield event.text
+
+    def _stream_analysis(self, video_id: str, prompt: str) -> str:
+        return "".join(self._iter_tokens(video_id, prompt))
 
+    def _save_summary(self, full_text: str):
         try:
-            with open("SUMMARY.md", "w") as f:
-                f.write(full_text)
+            self.artifacts.put(self.shop, "summary", full_text)
         except Exception as e:
-            print(f"File Write Error: {e}")
-        return {"analysis": full_text}
+            logger.error("Artifact Write Error: %s", e)
+
+    def _wait_for_indexing(self, index_id: str, indexed_asset_id: str):
+        """
+        Poll with growing intervals until the asset is ready, the deadline passes or the wait
+        is cancelled. An indexing webhook (see IndexingWaiter) cuts the current interval short.
+        """
+        logger.debug("Waiting for indexing of %s", indexed_asset_id)
+        deadline = time.monotonic() + self.index_timeout
+        intervals = backoff_intervals(self.poll_initial, 1.5, self.poll_max)
+
+        wake = threading.Event()
+        self._wakes.add(wake)
+        try:
+            with self.waiter.watch(indexed_asset_id, wake):
+                while True:
+                    if self._cancelled.is_set() or self.waiter.closed:
+                        raise IndexingCancelled(f"Stopped waiting for indexed asset {indexed_asset_id}")
+
+                    indexed_asset = self.outbound.call_sync(
+                        "twelvelabs",
+                        lambda: self.client.indexes.indexed_assets.retrieve(
+                            index_id=index_id,
+                            indexed_asset_id=indexed_asset_id
+                        ),
+                    )
+
+                    logger.debug("Indexed asset %s: status=%s", indexed_asset_id, indexed_asset.status)
+
+                    if indexed_asset.status == "ready":
+                        break
+                    if indexed_asset.status == "failed":
+                        raise RuntimeError("Video indexing failed")
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise IndexingTimeout(f"Indexed asset {indexed_asset_id} not ready after {self.index_timeout:.0f}s")
+                    wake.wait(min(next(intervals), remaining))
+                    wake.clear()
+        finally:
+            self._wakes.discard(wake)
+
+        logger.debug("Indexing complete: %s", indexed_asset_id)
+        return indexed_asset
 
 
     def get_or_create_index(self, index_name: str = "video-analysis-index"):
+        if index_name in _index_ids:
+            return _index_ids[index_name]
+        # One thread lists (and if needed creates) the index; concurrent uploads wait for its id
+        with _index_lock:
+            if index_name not in _index_ids:
+                _index_ids[index_name] = self._find_or_create_index(index_name)
+            return _index_ids[index_name]
+
+    def _find_or_create_index(self, index_name: str):
+        from twelvelabs.core.api_error import ApiError
         try:
-            for idx in self.client.indexes.list():
+            for idx in self._list_indexes():
                 if idx.index_name == index_name:
-                    print(f"Using existing index: id={idx.id}")
+                    logger.info("Using existing index: id=%s", idx.id)
                     return idx.id
         except Exception as e:
-            print(f"Index list failed (continuing): {e}")
+            logger.warning("Index list failed (continuing): %s", e)
 
         try:
-            index = self.client.indexes.create(
-                index_name=index_name,
-                models=[
-                    {
-                        "model_name": "pegasus1.2",
-                        "model_options": ["visual", "audio"],
-                    }
-                ],
+            index = self.outbound.call_sync(
+                "twelvelabs",
+                lambda: self.client.indexes.create(
+                    index_name=index_name,
+                    models=[
+                        {
+                            "model_name": "pegasus1.2",
+                            "model_options": ["visual", "audio"],
+                        }
+                    ],
+                ),
             )
-            print(f"Created index: id={index.id}")
+            logger.info("Created index: id=%s", index.id)
             return index.id
 
         except ApiError as e:
             if e.status_code == 409:
-                print("Index already exists (race condition). Fetching existing index...")
+                logger.info("Index already exists (race condition). Fetching existing index...")
 
-                for idx in self.client.indexes.list():
+                for idx in self._list_indexes():
                     if idx.index_name == index_name:
-                        print(f"Using existing index after conflict: id={idx.id}")
+                        logger.info("Using existing index after conflict: id=%s", idx.id)
                         return idx.id
 
             raise
 
-
+    def _list_indexes(self):
+        # The pager fetches lazily; drain it inside the scheduled call so retries cover every page
+        return self.outbound.call_sync("twelvelabs", lambda: list(self.client.indexes.list()))
@@ -0,0 +1,16 @@
+import pytest
+import config
+
+@pytest.fixture
+def settings(monkeypatch, tmp_path):
+    """Fresh config read from the environment, with local state in a temp dir."""
+    monkeypatch.setenv("SHOPECHO_DATA_DIR", str(tmp_path))
+
+    def load(**env):
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        config.get_config.cache_clear()
+        return config.get_config()
+
+    yield load
+    config.get_config.cache_clear()
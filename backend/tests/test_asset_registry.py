@@ -0,0 +1,32 @@
+import pytest
+from services.asset_registry import canonicalize_video_url, is_youtube_url
+
+WATCH = "https://www.youtube.com/watch?v=KhLensmQfEQ"
+
+@pytest.mark.parametrize("url", [
+    "https://youtu.be/KhLensmQfEQ",
+    "https://youtu.be/KhLensmQfEQ?si=abc123",
+    "https://www.youtube.com/shorts/KhLensmQfEQ",
+    "https://www.youtube.com/embed/KhLensmQfEQ",
+    "https://m.youtube.com/watch?v=KhLensmQfEQ&feature=share",
+    "https://youtube.com/watch?utm_source=x&v=KhLensmQfEQ&pp=yg",
+    "http://WWW.YouTube.com/watch?v=KhLensmQfEQ#t=30",
+    "youtube.com/watch?v=KhLensmQfEQ",
+    "www.youtube.com/watch?v=KhLensmQfEQ",
+    "youtu.be/KhLensmQfEQ",
+    "  youtube.com/shorts/KhLensmQfEQ/  ",
+])
+def test_youtube_links_collapse_to_one_watch_url(url):
+    assert canonicalize_video_url(url) == WATCH
+    assert is_youtube_url(url)
+
+def test_other_urls_lose_tracking_params_fragments_and_trailing_slashes():
+    assert canonicalize_video_url("https://cdn.example.com/videos/promo.mp4/?utm_campaign=x&b=2&a=1#top") == (
+        "https://cdn.example.com/videos/promo.mp4?a=1&b=2"
+    )
+    assert canonicalize_video_url("cdn.example.com/promo.mp4") == "https://cdn.example.com/promo.mp4"
+    assert canonicalize_video_url("http://cdn.example.com:8080/promo.mp4") == "http://cdn.example.com:8080/promo.mp4"
+
+@pytest.mark.parametrize("url", ["https://www.youtube.com/watch?v=short", "https://www.youtube.com/channel/abc", "https://example.com/watch?v=KhLensmQfEQ"])
+def test_not_a_youtube_video(url):
+    assert not is_youtube_url(url)
@@ -0,0 +1,80 @@
+import pytest
+from services import cache as cache_module
+from services.cache import ResultCache
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "time", clock.time)
+    return clock
+
+def make(tmp_path, **kwargs) -> ResultCache:
+    return ResultCache("test", path=str(tmp_path / "cache.db"), **kwargs)
+
+def test_entries_expire_in_both_tiers(tmp_path, clock):
+    cache = make(tmp_path, ttl_seconds=60)
+    cache.set("a", {"x": 1})
+    cache.set("b", 2, ttl_seconds=300)
+    clock.now += 59
+    assert cache.get("a") == {"x": 1}
+
+    clock.now += 2
+    assert cache.get("a") is None
+    assert make(tmp_path, ttl_seconds=60).get("a") is None # gone from the disk tier too
+    assert cache.get("b") == 2 # its own TTL
+    stats = cache.stats()
+    assert (stats["expirations"], stats["disk_entries"]) == (1, 1)
+
+def test_memory_tier_evicts_least_recently_used(tmp_path, clock):
+    cache = make(tmp_path, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a") # now b is the oldest
+    cache.set("c", 3)
+    assert list(cache._memory) == ["a", "c"]
+    assert cache.stats()["evictions"] == 1
+
+def test_evicted_entries_fall_back_to_the_disk_tier(tmp_path, clock):
+    cache = make(tmp_path, max_entries=1)
+    cache.set("a", [1, 2])
+    cache.set("b", [3])
+    assert cache.get("a") == [1, 2]
+    assert "a" in cache._memory # promoted back into memory
+    assert cache.get("a") == [1, 2]
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 0)
+
+    # Another worker sharing the database sees the entry without having set it
+    assert make(tmp_path).get("b") == [3]
+
+def test_disk_tier_keeps_the_most_recently_used(tmp_path, clock):
+    cache = make(tmp_path, max_entries=1, max_disk_entries=2)
+    for key in ("a", "b"):
+        cache.set(key, key)
+        clock.now += 1
+    cache.get("a") # read from disk, so b is now the least recently used there
+    clock.now += 1
+    cache.set("c", "c")
+    fresh = make(tmp_path)
+    assert [fresh.get(key) for key in ("a", "b", "c")] == ["a", None, "c"]
+
+def test_generation_change_drops_only_that_scope(tmp_path, clock):
+    cache = make(tmp_path)
+    assert cache.ensure_generation("manifesto-v1", "shop-a") is False # first sighting
+    cache.set("a1", "yes", scope="shop-a")
+    cache.set("b1", "no", scope="shop-b")
+
+    assert cache.ensure_generation("manifesto-v1", "shop-a") is False
+    assert cache.get("a1") == "yes"
+
+    assert cache.ensure_generation("manifesto-v2", "shop-a") is True
+    assert cache.get("a1") is None
+    assert make(tmp_path).get("a1") is None
+    assert cache.get("b1") == "no"
@@ -0,0 +1,99 @@
+import asyncio
+from types import SimpleNamespace
+from services.catalog_fingerprint import CatalogFingerprint, CatalogFingerprintStore
+from services.manifesto import ManifestoService
+from services.product_index import ProductIndex
+
+PRODUCTS = [
+    {"id": "1", "title": "Beanie", "tags": ["wool", "winter"], "description": "", "updated_at": "2026-01-01"},
+    {"id": "2", "title": "Socks", "tags": ["wool"], "description": "", "updated_at": "2026-01-02"},
+]
+
+def fingerprint(products) -> str:
+    digest = CatalogFingerprint()
+    for product in products:
+        digest.add(product)
+    return digest.hexdigest()
+
+def test_fingerprint_ignores_order_and_tag_order():
+    reordered = [{**PRODUCTS[1]}, {**PRODUCTS[0], "tags": ["winter", "wool"]}]
+    assert fingerprint(PRODUCTS) == fingerprint(reordered)
+    assert fingerprint(PRODUCTS) != fingerprint([{**PRODUCTS[0], "updated_at": "2026-02-01"}, PRODUCTS[1]])
+
+def test_save_clears_stale_only_if_no_webhook_came_in(tmp_path):
+    store = CatalogFingerprintStore(str(tmp_path / "state.db"))
+    store.save("shop", "a", 0)
+    store.mark_stale("shop")
+    generation = store.get("shop")["generation"]
+
+    store.save("shop", "b", generation)
+    assert store.get("shop")["stale"] is False
+
+    store.mark_stale("shop")
+    generation = store.get("shop")["generation"]
+    store.mark_stale("shop") # a webhook while the scan was running
+    store.save("shop", "c", generation)
+    state = store.get("shop")
+    assert state["fingerprint"] == "c"
+    assert state["stale"] is True
+
+class FakeShopify:
+    def __init__(self, products):
+        self.products = products
+        self.scans = 0
+
+    async def shop_info(self, shop, token):
+        return {"name": "Shop", "description": "", "product_count": len(self.products)}
+
+    async def iter_catalog(self, shop, token, product_count=None, fields=None):
+        self.scans += 1
+        for product in self.products:
+            yield product
+
+def manifesto_service(tmp_path, shopify, fingerprints) -> ManifestoService:
+    async def aget(shop, kind):
+        return {"kind": kind}
+
+    async def aread(shop, kind):
+        return "the manifesto"
+
+    return ManifestoService(
+        "shop", "token", client=object(), assistants=object(), threads=object(), models=object(), budget=object(),
+        shopify=shopify,
+        fingerprints=fingerprints,
+        artifacts=SimpleNamespace(aget=aget, aread=aread),
+        products=ProductIndex(str(tmp_path / "state.db"), dimensions=256),
+    )
+
+def test_stale_manifesto_is_checked_with_one_scan(tmp_path):
+    fingerprints = CatalogFingerprintStore(str(tmp_path / "state.db"))
+    fingerprints.save("shop", fingerprint(PRODUCTS), 0)
+    fingerprints.mark_stale("shop")
+    shopify = FakeShopify(PRODUCTS)
+    service = manifesto_service(tmp_path, shopify, fingerprints)
+
+    assert asyncio.run(service.create_manifesto()) == {"manifesto": "the manifesto"}
+    assert shopify.scans == 1
+    assert fingerprints.get("shop")["stale"] is False
+
+def test_changed_catalog_regenerates_from_the_same_scan(tmp_path):
+    fingerprints = CatalogFingerprintStore(str(tmp_path / "state.db"))
+    fingerprints.save("shop", fingerprint(PRODUCTS[:1]), 0)
+    fingerprints.mark_stale("shop")
+    shopify = FakeShopify(PRODUCTS)
+    service = manifesto_service(tmp_path, shopify, fingerprints)
+    prompts = []
+
+    async def generate(store_data):
+        prompts.append(store_data)
+        return "a new manifesto"
+
+    async def save(manifesto):
+        pass
+
+    service._generate_manifesto_with_backboard = generate
+    service._save_manifesto_to_file = save
+    assert asyncio.run(service.create_manifesto())["manifesto"] == "a new manifesto"
+    assert shopify.scans == 1
+    assert "Socks" in prompts[0]
+    assert fingerprints.get("shop")["fingerprint"] == fingerprint(PRODUCTS)
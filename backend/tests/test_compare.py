@@ -0,0 +1,118 @@
+import asyncio
+import json
+import pytest
+from services.compare_manifesto import COMPARISON_ERROR, CompareManifestoService, pack_summaries, parse_packed, parse_verdict
+from services.prescreen import PreScreen
+
+@pytest.mark.parametrize("comparison, verdict, reason", [
+    ("Yes. Rugged and outdoorsy, like the brand.", "Yes", "Rugged and outdoorsy, like the brand."),
+    ("**No** - too glossy.", "No", "too glossy."),
+    ("  yes", "Yes", ""),
+    ("Not a fit for this brand.", None, "Not a fit for this brand."),
+    ("Yesterday's trend, skip it.", None, "Yesterday's trend, skip it."),
+    ("Nobody would call this on brand.", None, "Nobody would call this on brand."),
+    ("The answer is Yes.", None, "The answer is Yes."),
+    ("", None, ""),
+    (None, None, ""),
+])
+def test_parse_verdict_only_reads_a_leading_yes_or_no(comparison, verdict, reason):
+    assert parse_verdict(comparison) == {"verdict": verdict, "reason": reason}
+
+def test_pack_summaries_respects_size_and_characters():
+    assert pack_summaries(["a"] * 7, 3) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert pack_summaries(["a" * 40, "b" * 40, "c" * 40, "d"], 5, max_chars=100) == [[0, 1], [2, 3]]
+    assert pack_summaries(["a" * 500, "b"], 5, max_chars=100) == [[0], [1]] # an oversized summary still gets a pack
+    assert pack_summaries([], 5) == []
+
+def test_parse_packed_reads_the_array():
+    answer = json.dumps([{"id": 0, "verdict": "Yes", "reason": " Fits. "}, {"id": 1, "verdict": "No", "reason": "Off brand."}])
+    assert parse_packed(answer) == {0: {"verdict": "Yes", "reason": "Fits."}, 1: {"verdict": "No", "reason": "Off brand."}}
+
+def test_parse_packed_keeps_what_a_chatty_or_truncated_answer_settles():
+    answer = 'Here are verdicts for summaries [0] and [1]:\n```json\n[{"id": 0, "verdict": "Yes.", "reason": "Fits"}, {"id": 1, "verdict": "N'
+    assert parse_packed(answer) == {0: {"verdict": "Yes", "reason": "Fits"}}
+
+@pytest.mark.parametrize("answer", ["", "I can't help with that.", "[", "[]", '{"id": 0}', "[1, 2, 3]", "null"])
+def test_parse_packed_skips_malformed_answers(answer):
+    assert parse_packed(answer) == {}
+
+def test_parse_packed_skips_items_without_a_usable_id_or_verdict():
+    answer = json.dumps([
+        {"id": "2", "verdict": "No"}, # numeric strings are fine
+        {"id": True, "verdict": "Yes"},
+        {"id": "first", "verdict": "Yes"},
+        {"verdict": "Yes"},
+        {"id": 3, "verdict": "Maybe"},
+        {"id": 4, "verdict": "Not sure yes"},
+        ["id", 5],
+    ])
+    assert parse_packed(answer) == {2: {"verdict": "No", "reason": ""}}
+
+class Artifacts:
+    async def aread(self, shop, kind):
+        return "We make rugged gear for the outdoors."
+
+def test_compare_batch_retries_what_a_packed_answer_leaves_out():
+    service = CompareManifestoService(
+        "", "key", shop="shop", assistants=object(), threads=object(), artifacts=Artifacts(),
+        models=object(), budget=object(), prescreen=PreScreen(no_below=0, yes_above=2),
+    )
+    prompts = []
+
+    async def ask(sections):
+        prompt = sections[-1].text
+        prompts.append(prompt)
+        if "[0]" in prompt: # the packed prompt: 2 is missing, 7 isn't in the pack and 1 is unreadable
+            return json.dumps([{"id": 0, "verdict": "Yes", "reason": "a"}, {"id": 1, "verdict": "Hmm"}, {"id": 7, "verdict": "No"}]), "m/packed"
+        if "summary three" in prompt:
+            raise RuntimeError("upstream down")
+        return "No. Off brand.", "m/single"
+
+    service._ask = ask
+    results = asyncio.run(service.compare_batch(["summary one", "summary two", "summary three"], pack_size=5))
+    assert len(prompts) == 3
+    assert results[0] == {"verdict": "Yes", "reason": "a", "model": "m/packed", "source": "model"}
+    assert results[1] == {"verdict": "No", "reason": "Off brand.", "model": "m/single", "source": "model"}
+    assert results[2] == {"verdict": None, "reason": COMPARISON_ERROR, "error": "upstream down"}
+
+def test_failed_comparison_is_an_error_not_a_verdict(settings):
+    from services.compare_manifesto import ComparisonError, compare_with_cache
+    from services.cache import ResultCache
+    settings()
+    service = CompareManifestoService(
+        "", "key", shop="shop", assistants=object(), threads=object(), artifacts=Artifacts(),
+        models=object(), budget=object(), prescreen=PreScreen(no_below=0, yes_above=2),
+    )
+    saved = []
+
+    async def ask(sections):
+        raise RuntimeError("retries exhausted")
+
+    async def save(comparison):
+        saved.append(comparison)
+
+    service._ask, service._save_comparison = ask, save
+    cache = ResultCache("comparison", path=None)
+    with pytest.raises(ComparisonError):
+        asyncio.run(compare_with_cache(service, "summary one", cache))
+    assert saved == [] and cache.stats()["sets"] == 0
+
+def test_compare_endpoint_answers_502_when_the_model_fails(settings, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from config import get_backboard_client, get_config
+    from routers import compare_manifesto as router
+    from services.compare_manifesto import COMPARISON_ERROR, ComparisonError
+
+    async def failing(service, summary, cache):
+        raise ComparisonError(COMPARISON_ERROR)
+
+    monkeypatch.setattr(router, "compare_with_cache", failing)
+    monkeypatch.setattr(router, "CompareManifestoService", lambda **kwargs: None)
+    app = FastAPI()
+    app.include_router(router.compare_manifesto_router)
+    app.dependency_overrides[get_config] = lambda: settings()
+    app.dependency_overrides[get_backboard_client] = lambda: None
+    app.dependency_overrides[router.get_comparison_cache] = lambda: None
+    response = TestClient(app).post("/api/compare/compare", json={"summary": "A climber on a ridge."})
+    assert (response.status_code, response.json()["detail"]) == (502, COMPARISON_ERROR)
@@ -0,0 +1,26 @@
+import sqlite3
+import pytest
+from services.db import connect
+
+def test_with_block_commits_and_closes(tmp_path):
+    path = str(tmp_path / "state.db")
+    with connect(path) as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.execute("INSERT INTO t VALUES (1)")
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    with connect(path) as conn:
+        assert conn.execute("SELECT x FROM t").fetchone()["x"] == 1
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+def test_with_block_rolls_back_on_error(tmp_path):
+    path = str(tmp_path / "state.db")
+    with connect(path) as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+    with pytest.raises(RuntimeError):
+        with connect(path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("INSERT INTO t VALUES (1)")
+            raise RuntimeError
+    with connect(path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
@@ -0,0 +1,127 @@
+import hashlib
+import hmac
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from services import twelvelabs
+from services.indexing import IndexingCancelled, IndexingTimeout, IndexingWaiter, backoff_intervals, verify_callback
+from services.twelvelabs import TwelveLabsService
+
+SECRET = "whsec_test"
+
+def sign(body: bytes, timestamp: int, secret: str = SECRET) -> str:
+    digest = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+def test_verify_callback():
+    body, now = b'{"data": {"id": "asset-1"}}', int(time.time())
+    assert verify_callback(body, sign(body, now), SECRET)
+    assert not verify_callback(body, sign(body, now - 301), SECRET) # replayed too late
+    assert not verify_callback(body, sign(body, now + 301), SECRET)
+    assert not verify_callback(body, sign(body, now, "other"), SECRET)
+    assert not verify_callback(body + b" ", sign(body, now), SECRET)
+    assert not verify_callback(body, f"t={now}", SECRET)
+    assert not verify_callback(body, "t=soon,v1=abc", SECRET)
+    assert not verify_callback(body, None, SECRET)
+
+def test_backoff_grows_to_its_cap():
+    intervals = backoff_intervals(1, 1.5, 3)
+    assert [next(intervals) for _ in range(5)] == [1, 1.5, 2.25, 3, 3]
+
+class Assets:
+    """indexes.indexed_assets.retrieve, answering from a list of statuses (the last one repeats)."""
+
+    def __init__(self, *statuses):
+        self.statuses = list(statuses)
+        self.calls = 0
+
+    def retrieve(self, index_id, indexed_asset_id):
+        self.calls += 1
+        status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        return SimpleNamespace(status=status)
+
+class Outbound:
+    def call_sync(self, key, call):
+        return call()
+
+@pytest.fixture
+def service(settings):
+    settings()
+    def make(*statuses, timeout=60.0, initial=1.0, maximum=5.0):
+        assets = Assets(*statuses)
+        client = SimpleNamespace(indexes=SimpleNamespace(indexed_assets=assets))
+        service = TwelveLabsService(
+            client=client, registry=object(), cache=object(), artifacts=object(), waiter=IndexingWaiter(), outbound=Outbound(),
+        )
+        service.index_timeout, service.poll_initial, service.poll_max = timeout, initial, maximum
+        return service, assets
+    return make
+
+@pytest.fixture
+def fake_clock(monkeypatch):
+    """Waits return at once and move a fake monotonic clock forward by their timeout instead."""
+    clock = {"now": 0.0, "waits": []}
+
+    class Event(threading.Event):
+        def wait(self, timeout=None):
+            clock["waits"].append(timeout)
+            clock["now"] += timeout
+            return super().wait(0)
+
+    monkeypatch.setattr(twelvelabs.threading, "Event", Event)
+    monkeypatch.setattr(twelvelabs.time, "monotonic", lambda: clock["now"])
+    return clock
+
+def test_polls_back_off_until_ready(service, fake_clock):
+    service, assets = service("pending", "indexing", "indexing", "indexing", "ready", initial=1.0, maximum=2.0)
+    assert service._wait_for_indexing("index", "asset-1").status == "ready"
+    assert assets.calls == 5
+    assert fake_clock["waits"] == [1.0, 1.5, 2.0, 2.0]
+
+def test_deadline_raises_indexing_timeout(service, fake_clock):
+    service, assets = service("indexing", timeout=10.0, initial=4.0, maximum=4.0)
+    with pytest.raises(IndexingTimeout):
+        service._wait_for_indexing("index", "asset-1")
+    assert fake_clock["waits"] == [4.0, 4.0, 2.0] # the last wait is cut to the deadline
+    assert service.waiter.waiting() == 0
+
+def test_failed_indexing_raises(service, fake_clock):
+    service, _ = service("indexing", "failed")
+    with pytest.raises(RuntimeError, match="indexing failed"):
+        service._wait_for_indexing("index", "asset-1")
+
+def wait_in_thread(service):
+    outcome = {}
+
+    def run():
+        try:
+            outcome["asset"] = service._wait_for_indexing("index", "asset-1")
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    for _ in range(200):
+        if service.waiter.waiting():
+            break
+        time.sleep(0.01)
+    return thread, outcome
+
+def test_cancel_stops_the_wait(service):
+    service, _ = service("indexing", initial=30.0)
+    thread, outcome = wait_in_thread(service)
+    service.cancel()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert isinstance(outcome["error"], IndexingCancelled)
+
+def test_callback_wakes_the_waiter_early(service):
+    service, assets = service("indexing", "ready", initial=30.0)
+    thread, outcome = wait_in_thread(service)
+    started = time.monotonic()
+    assert service.waiter.notify(["asset-1"]) == 1
+    thread.join(5)
+    assert time.monotonic() - started < 2 # not the 30s interval
+    assert outcome["asset"].status == "ready" and assets.calls == 2
+    assert service.waiter.notify(["asset-1"]) == 0 # no one left waiting
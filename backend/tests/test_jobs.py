@@ -0,0 +1,60 @@
+import asyncio
+import os
+from services.db import connect
+from services.jobs import JobManager, JobStore
+
+def left_by(store: JobStore, pid: int, status: str = "running") -> str:
+    """A job a worker process left unfinished."""
+    job = store.create("test", {"pid": pid})
+    with connect(store.path) as conn:
+        conn.execute("UPDATE jobs SET owner = ?, status = ? WHERE id = ?", (pid, status, job["id"]))
+    return job["id"]
+
+def test_claim_takes_only_the_dead_workers_jobs(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    dead = [left_by(store, 101), left_by(store, 101, "queued")]
+    alive = left_by(store, 202)
+    finished = left_by(store, 101)
+    store.finish(finished, result="done")
+
+    assert store.claim(101) == dead
+    assert store.get(dead[0])["owner"] == os.getpid()
+    assert store.get(alive)["owner"] == 202
+    assert store.claim(101) == []
+
+def test_replacement_worker_resumes_what_the_dead_one_left(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    dead, alive = left_by(store, 101), left_by(store, 202)
+    manager = JobManager(store, max_workers=1)
+    ran = []
+
+    def handler(payload, stage):
+        ran.append(payload["pid"])
+        return "ok"
+
+    manager.register("test", handler)
+    loop = asyncio.new_event_loop()
+    try:
+        manager.start(loop, owner=101)
+        manager._executor.shutdown(wait=True) # let the resumed jobs finish
+        manager.shutdown()
+    finally:
+        loop.close()
+    assert ran == [101]
+    assert store.get(dead)["status"] == "succeeded"
+    assert store.get(alive)["status"] == "running"
+
+def test_long_polls_leave_no_events_behind(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    stuck = store.create("test", {})
+    manager = JobManager(store)
+
+    async def main():
+        manager._loop = asyncio.get_running_loop()
+        polls = [manager.wait(stuck["id"], 0.2) for _ in range(3)]
+        results = await asyncio.gather(*polls, manager.wait("no-such-job", 0.2))
+        return results
+
+    results = asyncio.run(main())
+    assert [job["status"] for job in results[:3]] == ["queued"] * 3 and results[3] is None
+    assert manager._events == {} and manager._waiters == {}
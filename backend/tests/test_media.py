@@ -0,0 +1,64 @@
+import os
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from config import get_config, get_video_index
+from services.media_index import MediaIndex
+
+VIDEO = bytes(range(256)) * 40 # 10240 bytes
+
+@pytest.fixture
+def videos(tmp_path):
+    (tmp_path / "promo.mp4").write_bytes(VIDEO)
+    (tmp_path / "notes.txt").write_text("not a video")
+    return MediaIndex(str(tmp_path), extensions=(".mp4",))
+
+@pytest.fixture
+def client(settings, videos):
+    from routers.campaign import campaign_router
+    app = FastAPI()
+    app.include_router(campaign_router)
+    app.dependency_overrides[get_config] = lambda: settings()
+    app.dependency_overrides[get_video_index] = lambda: videos
+    return TestClient(app)
+
+def test_range_gets_the_requested_bytes(client):
+    response = client.get("/api/campaign/video/promo.mp4", headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 100-199/{len(VIDEO)}"
+    assert response.content == VIDEO[100:200]
+
+def test_open_and_suffix_ranges(client):
+    response = client.get("/api/campaign/video/promo.mp4", headers={"Range": "bytes=10000-"})
+    assert response.content == VIDEO[10000:]
+    response = client.get("/api/campaign/video/promo.mp4", headers={"Range": "bytes=-40"})
+    assert response.content == VIDEO[-40:]
+
+def test_unsatisfiable_range(client):
+    response = client.get("/api/campaign/video/promo.mp4", headers={"Range": f"bytes={len(VIDEO)}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(VIDEO)}"
+
+def test_conditional_get_is_not_modified(client):
+    etag = client.get("/api/campaign/video/promo.mp4").headers["etag"]
+    assert client.get("/api/campaign/video/promo.mp4", headers={"If-None-Match": etag}).status_code == 304
+
+def test_only_indexed_names_are_served(client):
+    assert client.get("/api/campaign/video/notes.txt").status_code == 404
+    assert client.get("/api/campaign/video/..%2Fpromo.mp4").status_code == 404
+
+def test_replaced_file_gets_fresh_headers(client, tmp_path):
+    etag = client.get("/api/campaign/video/promo.mp4").headers["etag"]
+    path = tmp_path / "promo.mp4"
+    path.write_bytes(VIDEO[:5000])
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    response = client.get("/api/campaign/video/promo.mp4", headers={"Range": "bytes=4000-"})
+    assert response.headers["content-range"] == "bytes 4000-4999/5000"
+    assert response.content == VIDEO[4000:5000]
+    assert client.get("/api/campaign/video/promo.mp4", headers={"If-None-Match": etag}).status_code == 200
+
+def test_deleted_file_is_not_found(client, tmp_path):
+    (tmp_path / "promo.mp4").unlink()
+    assert client.get("/api/campaign/video/promo.mp4").status_code == 404
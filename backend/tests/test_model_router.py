@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+from services import model_router
+from services.model_router import CircuitBreaker, LatencyPolicy, LLMUnavailable, ModelRoute, ModelRouter
+
+SLOW = ModelRoute("slow", "model")
+FAST = ModelRoute("fast", "model")
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(model_router.time, "monotonic", clock)
+    return clock
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failures=3, cooldown=30)
+    breaker.failure("p")
+    breaker.failure("p")
+    breaker.success("p") # resets the streak
+    breaker.failure("p")
+    breaker.failure("p")
+    assert breaker.allow("p")
+    breaker.failure("p")
+    assert breaker.state("p") == "open"
+    assert not breaker.allow("p")
+
+def test_breaker_lets_one_trial_through_after_the_cooldown(clock):
+    breaker = CircuitBreaker(failures=1, cooldown=30)
+    breaker.failure("p")
+    clock.now += 31
+    assert breaker.state("p") == "half-open"
+    assert breaker.allow("p")
+    assert not breaker.allow("p") # the trial is still out
+    breaker.failure("p") # and failed: open again straight away
+    assert breaker.state("p") == "open"
+    clock.now += 31
+    assert breaker.allow("p")
+    breaker.success("p")
+    assert breaker.state("p") == "closed"
+
+def router(timeout: float, hedge: bool = False, failures: int = 1) -> ModelRouter:
+    policy = LatencyPolicy([SLOW, FAST], timeout=timeout, hedge=hedge)
+    return ModelRouter({"test": policy}, breaker=CircuitBreaker(failures=failures))
+
+async def send(route: ModelRoute) -> str:
+    await asyncio.sleep(10 if route is SLOW else 0)
+    return route.name
+
+def test_abandoning_a_slow_route_is_not_a_failure():
+    models = router(timeout=0.2) # falls back after half the budget
+    result, route = asyncio.run(models.run("test", send))
+    assert route is FAST
+    assert models.breaker.state("slow") == "closed"
+
+def test_hard_timeouts_count_against_the_provider():
+    models = ModelRouter({"test": LatencyPolicy([SLOW], timeout=0.05)}, breaker=CircuitBreaker(failures=1))
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(models.run("test", send))
+    assert models.breaker.state("slow") == "open"
+
+def test_errors_count_and_fall_through():
+    models = router(timeout=5)
+
+    async def flaky(route: ModelRoute) -> str:
+        if route is SLOW:
+            raise RuntimeError("boom")
+        return route.name
+
+    result, route = asyncio.run(models.run("test", flaky))
+    assert route is FAST
+    assert models.breaker.state("slow") == "open"
@@ -0,0 +1,58 @@
+import asyncio
+import time
+from services.outbound import BATCH, INTERACTIVE, OutboundScheduler, TokenBucket, parse_rate_limits
+
+def test_parse_rate_limits():
+    assert parse_rate_limits("backboard/anthropic=1:3, twelvelabs=2") == {
+        "backboard/anthropic": (1.0, 3.0),
+        "twelvelabs": (2.0, 2.0),
+    }
+    assert parse_rate_limits("") == {}
+
+def test_bucket_grants_the_burst_then_paces_at_the_rate():
+    async def main():
+        bucket = TokenBucket(rate=50, burst=3)
+        started = time.monotonic()
+        for _ in range(3):
+            await bucket.acquire()
+        burst = time.monotonic() - started
+        for _ in range(5):
+            await bucket.acquire()
+        return burst, time.monotonic() - started
+
+    burst, total = asyncio.run(main())
+    assert burst < 0.01
+    assert 0.08 <= total < 0.5 # five more tokens at 50/s
+
+def test_interactive_waiters_go_before_batch():
+    async def main():
+        bucket = TokenBucket(rate=100, burst=1)
+        await bucket.acquire() # empty it
+        order = []
+
+        async def take(name, priority):
+            await bucket.acquire(priority)
+            order.append(name)
+
+        await asyncio.gather(take("batch-1", BATCH), take("batch-2", BATCH), take("interactive", INTERACTIVE))
+        return order
+
+    assert asyncio.run(main()) == ["interactive", "batch-1", "batch-2"]
+
+def test_pause_holds_everyone():
+    async def main():
+        bucket = TokenBucket(rate=1000, burst=5)
+        bucket.pause(0.1)
+        started = time.monotonic()
+        await bucket.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(main()) >= 0.09
+
+def test_limits_are_split_between_workers():
+    scheduler = OutboundScheduler(parse_rate_limits("backboard=10:20,twelvelabs=1:2"), workers=4)
+    bucket = scheduler._bucket("backboard/anthropic/claude")
+    assert (bucket.rate, bucket.burst) == (2.5, 5.0)
+    bucket = scheduler._bucket("twelvelabs")
+    assert (bucket.rate, bucket.burst) == (0.25, 1.0) # never below one token of room
+    assert scheduler._bucket("elevenlabs") is None
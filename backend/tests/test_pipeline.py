@@ -0,0 +1,81 @@
+import asyncio
+import time
+import pytest
+from services.pipeline import Pipeline, Stage, StageTimings
+
+def run(pipeline: Pipeline):
+    async def main():
+        return [event async for event in pipeline.run()]
+    return asyncio.run(main())
+
+def stage(name, after=(), delay=0.0, log=None, fail=False, skip=None):
+    async def work(results):
+        log.append(("start", name, sorted(results)))
+        await asyncio.sleep(delay)
+        if fail:
+            raise RuntimeError(f"{name} broke")
+        return name.upper()
+    return Stage(name, work, tuple(after), skip)
+
+def test_stages_start_after_their_dependencies_and_see_their_results():
+    log = []
+    events = run(Pipeline("test", [
+        stage("render", ["script", "voice"], log=log),
+        stage("script", log=log),
+        stage("voice", ["script"], log=log),
+    ]))
+    assert [start[1] for start in log] == ["script", "voice", "render"]
+    assert log[-1] == ("start", "render", ["script", "voice"])
+    assert [(event["stage"], event["status"]) for event in events] == [("script", "done"), ("voice", "done"), ("render", "done")]
+    assert events[-1]["result"] == "RENDER"
+
+def test_independent_stages_run_concurrently():
+    log = []
+    started = time.monotonic()
+    run(Pipeline("test", [stage("a", delay=0.2, log=log), stage("b", delay=0.2, log=log), stage("c", ["a", "b"], log=log)]))
+    assert time.monotonic() - started < 0.35 # not 0.4 back to back
+    assert log[2] == ("start", "c", ["a", "b"])
+
+def test_failure_skips_everything_downstream():
+    log = []
+    timings = StageTimings()
+    events = run(Pipeline("test", [
+        stage("script", log=log, fail=True),
+        stage("voice", ["script"], log=log),
+        stage("render", ["voice"], log=log),
+        stage("thumbnail", log=log),
+    ], timings))
+    by_stage = {event["stage"]: event for event in events}
+    assert by_stage["script"] == {"stage": "script", "status": "failed", "seconds": by_stage["script"]["seconds"], "error": "script broke"}
+    assert by_stage["voice"]["reason"] == "script failed"
+    assert by_stage["render"]["reason"] == "voice skipped"
+    assert by_stage["thumbnail"]["status"] == "done"
+    assert sorted(start[1] for start in log) == ["script", "thumbnail"]
+    assert timings.stats()["render"]["skipped"] == 1
+
+def test_skip_condition_sees_earlier_results():
+    log = []
+    events = run(Pipeline("test", [
+        stage("script", log=log),
+        stage("voice", ["script"], log=log, skip=lambda results: "no script" if results["script"] != "SCRIPT" else None),
+        stage("music", ["script"], log=log, skip=lambda results: "muted"),
+    ]))
+    statuses = {event["stage"]: event["status"] for event in events}
+    assert statuses == {"script": "done", "voice": "done", "music": "skipped"}
+
+def test_unknown_dependency_is_rejected():
+    with pytest.raises(ValueError, match="unknown stages"):
+        Pipeline("test", [Stage("render", lambda results: None, ("script",))])
+
+@pytest.mark.parametrize("edges", [
+    {"a": ("a",)},
+    {"a": ("b",), "b": ("a",)},
+    {"start": (), "a": ("start", "c"), "b": ("a",), "c": ("b",), "end": ("c",)},
+])
+def test_cycles_are_rejected_up_front(edges):
+    with pytest.raises(ValueError, match="cycle"):
+        Pipeline("test", [Stage(name, lambda results: None, after) for name, after in edges.items()])
+
+def test_duplicate_stage_names_are_rejected():
+    with pytest.raises(ValueError, match="Duplicate"):
+        Pipeline("test", [Stage("a", lambda results: None), Stage("a", lambda results: None)])
@@ -0,0 +1,34 @@
+import os
+from services.prescreen import PreScreen
+
+MANIFESTO = open(os.path.join(os.path.dirname(__file__), "..", "MANIFESTO.md"), encoding="utf-8").read()
+
+ON_BRAND = (
+    "Climbers haul their packs up a granite ridge at dawn, then camp beneath glaciers deep in the "
+    "wilderness. Wind, snow and long approaches test them, and the gear quietly holds up."
+)
+
+def test_on_brand_summary_is_not_auto_rejected_by_default(settings, monkeypatch):
+    monkeypatch.delenv("PRESCREEN_NO_BELOW", raising=False)
+    monkeypatch.delenv("PRESCREEN_YES_ABOVE", raising=False)
+    env = settings()
+    screen = PreScreen(env["prescreen_no_below"], env["prescreen_yes_above"])
+    # Uncalibrated, the similarity can't tell these apart: both go to the model
+    assert screen.screen(MANIFESTO, ON_BRAND) is None
+    assert screen.screen(MANIFESTO, "A pasta recipe with garlic and basil.") is None
+
+def test_negative_scores_are_not_rejected_when_off():
+    screen = PreScreen(no_below=0, yes_above=2)
+    screen.score = lambda manifesto, summary: -0.2 # signed hashing can score below zero
+    assert screen.screen(MANIFESTO, ON_BRAND) is None
+
+def test_thresholds_settle_the_clear_cases():
+    screen = PreScreen(no_below=0.5, yes_above=0.9)
+    assert screen.screen("alpine climbing in the wild", "alpine climbing in the wild")["verdict"] == "Yes"
+    assert screen.screen("alpine climbing in the wild", "pasta garlic basil recipe")["verdict"] == "No"
+    assert screen.stats()["screened"] == 2
+
+def test_missing_text_is_left_to_the_model():
+    screen = PreScreen(no_below=0.5, yes_above=0.9)
+    assert screen.screen("", ON_BRAND) is None
+    assert screen.screen(MANIFESTO, "") is None
@@ -0,0 +1,88 @@
+import asyncio
+import numpy as np
+import pytest
+from services.product_index import ProductIndex, ShopIndex
+
+PRODUCTS = [
+    {"id": "1", "title": "Merino wool beanie", "tags": ["winter", "wool"], "description": "Warm knit hat."},
+    {"id": "2", "title": "Wool hiking socks", "tags": ["hiking", "wool"], "description": "Cushioned socks."},
+    {"id": "3", "title": "Trail running shoes", "tags": ["running"], "description": "Grippy soles for trails."},
+    {"id": "4", "title": "Ceramic mug", "tags": [], "description": ""},
+]
+
+def dense_scores(index: ShopIndex, text: str) -> np.ndarray:
+    """The same cosine scores from a dense matrix, as a reference."""
+    weights = np.zeros((len(index), index.dimensions), dtype=np.float32)
+    for row, (columns, values) in enumerate(index.rows):
+        weights[row, columns] = values
+    idf = index.idf()
+    documents = weights * idf
+    columns, values = index.vectorize({"text": text}, (("text", 1.0),))
+    query = np.zeros(index.dimensions, dtype=np.float32)
+    query[columns] = values * idf[columns]
+    norms = np.linalg.norm(documents, axis=1)
+    norms[norms == 0] = 1
+    return documents @ query / norms / np.linalg.norm(query)
+
+def test_sparse_scores_match_dense():
+    index = ShopIndex(64) # few buckets, so terms collide too
+    for product in PRODUCTS:
+        index.upsert(product)
+    expected = dense_scores(index, "warm wool socks for hiking")
+    for row, score in index.top_k("warm wool socks for hiking", 4):
+        assert score == pytest.approx(expected[row], abs=1e-5)
+    assert index.ids[index.top_k("warm wool socks for hiking", 1)[0][0]] == "2"
+
+def test_updates_and_removals_keep_document_frequencies():
+    index = ShopIndex(1024)
+    for product in PRODUCTS:
+        index.upsert(product)
+    index.upsert({**PRODUCTS[0], "title": "Cotton cap", "tags": ["summer"]})
+    index.remove("2")
+    fresh = ShopIndex(1024)
+    for product in [{**PRODUCTS[0], "title": "Cotton cap", "tags": ["summer"]}, PRODUCTS[2], PRODUCTS[3]]:
+        fresh.upsert(product)
+    assert np.array_equal(index.df, fresh.df)
+    assert sorted(index.ids) == ["1", "3", "4"]
+    assert [index.ids[row] for row, _ in index.top_k("trail running", 3)] == ["3"]
+
+def test_representative_products_come_first():
+    index = ShopIndex(1024)
+    for product in PRODUCTS:
+        index.upsert(product)
+    ranked = [index.ids[row] for row, _ in index.representative(4)]
+    assert ranked[-1] == "4" # no terms, nothing in common with the rest
+    assert set(ranked[:2]) == {"1", "2"} # the wool products share the most
+
+def test_replace_streams_the_catalog(tmp_path):
+    products = ProductIndex(str(tmp_path / "products.db"), dimensions=1024)
+
+    async def scan():
+        for product in PRODUCTS:
+            yield product
+
+    assert asyncio.run(products.areplace("shop", scan(), batch=3)) == 4
+    assert products.size("shop") == 4
+    # Another process sees the stored catalog
+    other = ProductIndex(str(tmp_path / "products.db"), dimensions=1024)
+    assert [product["id"] for product in other.top_k("shop", "ceramic mug", 1)] == ["4"]
+
+def test_webhook_writes_from_another_worker_are_not_lost(tmp_path):
+    path = str(tmp_path / "products.db")
+    ours, theirs = ProductIndex(path, dimensions=1024), ProductIndex(path, dimensions=1024)
+    ours.replace("shop", PRODUCTS[:1])
+    connect = ours._connect
+    extra = iter(PRODUCTS[1:3])
+
+    def racing_connect():
+        # Another worker writes just before each connection this one opens
+        product = next(extra, None)
+        if product is not None:
+            theirs.upsert("shop", [product])
+        return connect()
+
+    ours._connect = racing_connect
+    ours.upsert("shop", [PRODUCTS[3]])
+    ours._connect = connect
+    stored = {product["id"] for product in ProductIndex(path, dimensions=1024).representative("shop", 10)}
+    assert {product["id"] for product in ours.representative("shop", 10)} == stored
@@ -0,0 +1,57 @@
+import asyncio
+from types import SimpleNamespace
+from services.compare_manifesto import CompareManifestoService
+from services.prompt_budget import PromptBudget, PromptSection, TRUNCATION_MARK, count_tokens, truncate
+
+def test_fits_without_cuts():
+    budget = PromptBudget("test", 100)
+    prompt, carried = budget.build([PromptSection("a", "alpha"), PromptSection("b", "beta")])
+    assert prompt == "alpha\n\nbeta"
+    assert carried == set()
+
+def test_lowest_priority_is_cut_first_and_required_never():
+    budget = PromptBudget("test", 120)
+    sections = [
+        PromptSection("task", "Judge this. " * 10, required=True),
+        PromptSection("low", "low priority context " * 40, priority=0),
+        PromptSection("high", "high priority context " * 10, priority=1),
+    ]
+    prompt, _ = budget.build(sections)
+    assert "Judge this. " * 10 in prompt
+    assert "high priority context " * 10 in prompt
+    assert count_tokens(prompt) <= 120
+    assert budget.stats()["saved_truncated"] > 0
+
+def test_static_sections_are_sent_once_per_thread():
+    budget = PromptBudget("test", 1000)
+    sections = [PromptSection("manifesto", "the manifesto " * 20, static=True, reference="(see above)"), PromptSection("q", "question")]
+    first, carried = budget.build(sections)
+    second, _ = budget.build(sections, seen=carried)
+    assert "the manifesto" in first
+    assert second == "(see above)\n\nquestion"
+
+def test_truncated_static_section_is_not_counted_as_sent():
+    budget = PromptBudget("test", 30)
+    sections = [PromptSection("manifesto", "word " * 200, static=True), PromptSection("q", "question", required=True)]
+    _, carried = budget.build(sections)
+    assert carried == set()
+
+def test_truncate_cuts_at_a_word_and_drops_tiny_remainders():
+    text = "lorem ipsum dolor " * 50
+    cut = truncate(text, 20)
+    assert cut.endswith(TRUNCATION_MARK) and count_tokens(cut) <= 20
+    assert truncate(text, 5) == ""
+    assert truncate("short", 5) == "short"
+
+def test_comparison_keeps_the_summary_when_the_manifesto_is_over_budget():
+    artifacts = SimpleNamespace(aread=lambda shop, kind: asyncio.sleep(0, "brand values " * 10000))
+    service = CompareManifestoService(
+        "A climber crosses a glacier at dawn.", None, shop="test",
+        assistants=object(), threads=object(), artifacts=artifacts, models=object(),
+        budget=PromptBudget("compare", 4000), prescreen=object(),
+    )
+    sections = asyncio.run(service._comparison_sections(service.summary))
+    prompt, _ = service.budget.build(sections)
+    assert "A climber crosses a glacier at dawn." in prompt
+    assert "brand values" in prompt # cut to fit, not dropped
+    assert count_tokens(prompt) <= 4000
@@ -0,0 +1,45 @@
+import asyncio
+import json
+import httpx
+import pytest
+from services.shopify import ShopifyClient, ShopifyError
+
+RESULT_URL = "https://storage.example.com/bulk/result.jsonl"
+
+def bulk_client(status: str = "COMPLETED", download=None, bulk_timeout: float = 5.0) -> ShopifyClient:
+    """A client whose shop runs one bulk operation that reports `status`, served by `download`."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url == RESULT_URL:
+            return download(request)
+        query = json.loads(request.content)["query"]
+        if "bulkOperationRunQuery" in query:
+            data = {"bulkOperationRunQuery": {"bulkOperation": {"id": "gid://shopify/BulkOperation/1", "status": "CREATED"}, "userErrors": []}}
+        else:
+            data = {"node": {"status": status, "url": RESULT_URL if status == "COMPLETED" else None}}
+        return httpx.Response(200, json={"data": data})
+
+    return ShopifyClient(httpx.AsyncClient(transport=httpx.MockTransport(handler)), bulk_timeout=bulk_timeout)
+
+def collect(client: ShopifyClient, poll_interval: float = 0.01):
+    async def main():
+        return [product async for product in client.iter_products_bulk("shop.myshopify.com", "token", poll_interval=poll_interval)]
+    return asyncio.run(main())
+
+def test_bulk_result_is_streamed_as_products():
+    lines = "\n".join(json.dumps({"id": f"gid://shopify/Product/{i}", "title": f"Product {i}"}) for i in range(3))
+    products = collect(bulk_client(download=lambda request: httpx.Response(200, text=lines + "\n")))
+    assert [product["title"] for product in products] == ["Product 0", "Product 1", "Product 2"]
+
+def test_stuck_bulk_operation_hits_the_deadline():
+    with pytest.raises(ShopifyError, match="still RUNNING"):
+        collect(bulk_client("RUNNING", bulk_timeout=0.05))
+
+def test_failed_result_download_is_a_shopify_error():
+    expired = lambda request: httpx.Response(403, text="<Error><Code>AccessDenied</Code></Error>")
+    with pytest.raises(ShopifyError, match="403"):
+        collect(bulk_client(download=expired))
+
+def test_undecodable_result_is_a_shopify_error():
+    with pytest.raises(ShopifyError, match="not JSONL"):
+        collect(bulk_client(download=lambda request: httpx.Response(200, text="<html>maintenance</html>\n")))
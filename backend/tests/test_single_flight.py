@@ -0,0 +1,65 @@
+import asyncio
+from services.single_flight import SingleFlight
+
+def test_identical_calls_share_one_run():
+    flight = SingleFlight("test")
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", work) for _ in range(3)))
+
+    assert asyncio.run(main()) == ["result"] * 3
+    assert runs == [1]
+    assert flight.stats()["coalesced"] == 2
+
+def test_work_survives_until_the_last_waiter_leaves():
+    flight = SingleFlight("test")
+
+    async def main():
+        started, stopped = asyncio.Event(), asyncio.Event()
+
+        async def work():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                stopped.set()
+                raise
+
+        first = asyncio.create_task(flight.do("key", work))
+        second = asyncio.create_task(flight.do("key", work))
+        await started.wait()
+
+        first.cancel()
+        await asyncio.sleep(0)
+        assert not stopped.is_set() # the second caller still wants it
+
+        second.cancel()
+        await asyncio.wait_for(stopped.wait(), 1)
+        assert flight.stats()["in_flight"] == 0
+        assert flight.stats()["cancelled"] == 1
+
+    asyncio.run(main())
+
+def test_a_new_call_after_cancellation_starts_fresh_work():
+    flight = SingleFlight("test")
+
+    async def main():
+        async def slow():
+            await asyncio.sleep(10)
+
+        async def fast():
+            return "fresh"
+
+        abandoned = asyncio.create_task(flight.do("key", slow))
+        await asyncio.sleep(0)
+        abandoned.cancel()
+        await asyncio.sleep(0)
+        return await flight.do("key", fast)
+
+    assert asyncio.run(main()) == "fresh"
@@ -0,0 +1,38 @@
+import config
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from services.telemetry import RequestTelemetry
+
+def test_http_metrics_are_labelled_by_route_template(settings):
+    settings()
+    config.get_metrics.cache_clear()
+    router = APIRouter(prefix="/api/campaign")
+
+    @router.get("/video/{filename}")
+    async def video(filename: str):
+        return {}
+
+    app = FastAPI()
+    app.include_router(router)
+    app.add_middleware(RequestTelemetry)
+    client = TestClient(app)
+    client.get("/api/campaign/video/a.mp4")
+    client.get("/api/campaign/video/b.mp4")
+    client.get("/nowhere")
+
+    rendered = config.get_metrics().render()
+    assert 'shopecho_http_requests_total{method="GET",route="/api/campaign/video/{filename}",status="200"} 2' in rendered
+    assert 'route="unmatched",status="404"' in rendered
+    assert "a.mp4" not in rendered
+
+def test_component_stats_are_exported(settings):
+    settings()
+    config.get_metrics.cache_clear()
+    config.get_prescreen.cache_clear()
+    config.get_prescreen()._stats["yes"] = 3
+
+    rendered = config.get_metrics().render()
+    assert "# TYPE shopecho_prescreen_total counter" in rendered
+    assert 'shopecho_prescreen_total{verdict="yes"} 3' in rendered
+    for name in ("shopecho_outbound_calls_total", "shopecho_llm_breaker_open", "shopecho_prompt_tokens_total", "shopecho_pipeline_stages_total"):
+        assert f"# TYPE {name} " in rendered
@@ -0,0 +1,73 @@
+import base64
+import hashlib
+import hmac
+import json
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from config import get_config, get_fingerprint_store, get_product_index
+from routers.manifesto import manifesto_router
+from services.catalog_fingerprint import CatalogFingerprintStore
+from services.product_index import ProductIndex
+
+SECRET = "shpss_test"
+
+def signed(body: bytes, **headers) -> dict:
+    digest = hmac.new(SECRET.encode(), body, hashlib.sha256).digest()
+    return {"X-Shopify-Hmac-Sha256": base64.b64encode(digest).decode(), "X-Shopify-Shop-Domain": "shop", **headers}
+
+@pytest.fixture
+def manifesto_app(settings, tmp_path):
+    app = FastAPI()
+    app.include_router(manifesto_router)
+    app.dependency_overrides[get_config] = lambda: settings(SHOPIFY_API_SECRET=SECRET)
+    app.dependency_overrides[get_fingerprint_store] = lambda: CatalogFingerprintStore(str(tmp_path / "state.db"))
+    app.dependency_overrides[get_product_index] = lambda: ProductIndex(str(tmp_path / "state.db"), dimensions=256)
+    return app
+
+@pytest.fixture
+def manifesto_client(manifesto_app):
+    return TestClient(manifesto_app)
+
+@pytest.mark.parametrize("body", [b"{not json", b"[1, 2]", b'"text"'])
+def test_products_webhook_rejects_bad_bodies(manifesto_client, body):
+    response = manifesto_client.post("/api/manifesto/webhooks/products", content=body, headers=signed(body))
+    assert response.status_code == 400
+
+def test_products_webhook_rejects_bad_signatures(manifesto_client):
+    body = b'{"id": 7}'
+    headers = {**signed(body), "X-Shopify-Hmac-Sha256": "forged"}
+    assert manifesto_client.post("/api/manifesto/webhooks/products", content=body, headers=headers).status_code == 401
+    headers.pop("X-Shopify-Hmac-Sha256")
+    assert manifesto_client.post("/api/manifesto/webhooks/products", content=body, headers=headers).status_code == 401
+
+def test_products_webhook_is_refused_without_a_secret(manifesto_app, settings):
+    manifesto_app.dependency_overrides[get_config] = lambda: settings(SHOPIFY_API_SECRET="")
+    body = b'{"id": 7}'
+    response = TestClient(manifesto_app).post("/api/manifesto/webhooks/products", content=body, headers=signed(body))
+    assert response.status_code == 503
+
+def test_products_webhook_indexes_the_product(manifesto_client, tmp_path):
+    body = json.dumps({"id": 7, "title": "Wool socks", "tags": "wool, hiking"}).encode()
+    response = manifesto_client.post(
+        "/api/manifesto/webhooks/products", content=body, headers=signed(body, **{"X-Shopify-Topic": "products/create"}),
+    )
+    assert response.status_code == 200
+    assert ProductIndex(str(tmp_path / "state.db"), dimensions=256).size("shop") == 1
+
+@pytest.fixture
+def twelvelabs_client(settings):
+    settings(TWELVELABS_WEBHOOK_SECRET="")
+    from routers.twelvelabs import twelvelabs_router # registers its job handler with the job manager
+    app = FastAPI()
+    app.include_router(twelvelabs_router)
+    return TestClient(app)
+
+@pytest.mark.parametrize("body", [b"{not json", b"[1, 2]", b"null"])
+def test_indexing_callback_rejects_bad_bodies(twelvelabs_client, body):
+    assert twelvelabs_client.post("/api/twelvelabs/webhooks/indexing", content=body).status_code == 400
+
+def test_indexing_callback_accepts_the_event_envelope(twelvelabs_client):
+    response = twelvelabs_client.post("/api/twelvelabs/webhooks/indexing", json={"data": {"id": "asset-1"}})
+    assert response.status_code == 200
+    assert response.json()["woken"] == 0
@@ -1,16 +1,52 @@
 import type { ActionFunctionArgs } from "@remix-run/node";
+import { authenticate } from "../shopify.server";
+
+const BACKEND_URL = "http://localhost:8000/api/twelvelabs";
+const MAX_WAIT_MS = 15 * 60 * 1000; // upload, indexing and analysis of a long video
+const POLL_SECONDS = 25;
+
+function backendError(error: string, status = 502) {
+  return Response.json({ status: "error", error }, { status });
+}
 
 export async function action({ request }: ActionFunctionArgs) {
-  const body = await request.json();
-  
-  const response = await fetch("http://localhost:8000/api/twelvelabs/analyze", {
+  const { session } = await authenticate.admin(request);
+  const body = { ...(await request.json()), shop: session.shop };
+
+  // Queue the analysis, then long-poll the job instead of holding one request open through indexing
+  const submitted = await fetch(`${BACKEND_URL}/analyze/jobs`, {
     method: "POST",
     headers: {
       "Content-Type": "application/json",
     },
     body: JSON.stringify(body),
   });
-  
-  const data = await response.json();
-  return Response.json(data);
-}
\ No newline at end of file
+  if (!submitted.ok) {
+    return backendError(`Could not queue the analysis (${submitted.status})`);
+  }
+  const { job_id: jobId } = await submitted.json();
+  if (!jobId) {
+    return backendError("The backend did not return a job id");
+  }
+
+  const deadline = Date.now() + MAX_WAIT_MS;
+  while (Date.now() < deadline) {
+    const wait = Math.min(POLL_SECONDS, Math.ceil((deadline - Date.now()) / 1000));
+    const response = await fetch(`${BACKEND_URL}/jobs/${jobId}?wait=${wait}`);
+    if (!response.ok) {
+      return backendError(`Could not read analysis job ${jobId} (${response.status})`);
+    }
+    const { job } = await response.json();
+    if (!job) {
+      return backendError(`Analysis job ${jobId} was not returned`);
+    }
+
+    if (job.status === "succeeded") {
+      return Response.json({ status: "success", data: job.result });
+    }
+    if (job.status === "failed") {
+      return backendError(job.error);
+    }
+  }
+  return backendError(`Analysis job ${jobId} is still running; try again later`, 504);
+}
@@ -1,8 +1,11 @@
 import { data, type ActionFunctionArgs } from "@remix-run/node";
+import { authenticate } from "../shopify.server";
 
 export const action = async ({ request }: ActionFunctionArgs) => {
+    const { session } = await authenticate.admin(request);
+    const shop = encodeURIComponent(session.shop);
 
-    const response = await fetch("http://localhost:8000/api/campaign/email", {
+    const response = await fetch(`http://localhost:8000/api/campaign/email?shop=${shop}`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
     });
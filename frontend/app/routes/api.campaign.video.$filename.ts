@@ -1,26 +1,49 @@
 import { type LoaderFunctionArgs } from "@remix-run/node";
 
-export const loader = async ({ params }: LoaderFunctionArgs) => {
+// Byte ranges and conditional requests go through so the player can seek and reuse its cache
+const FORWARDED_REQUEST_HEADERS = ["range", "if-range", "if-none-match", "if-modified-since"];
+const FORWARDED_RESPONSE_HEADERS = [
+    "content-type",
+    "content-length",
+    "content-range",
+    "accept-ranges",
+    "etag",
+    "last-modified",
+    "cache-control",
+];
+
+export const loader = async ({ request, params }: LoaderFunctionArgs) => {
     const { filename } = params;
 
     if (!filename) {
         throw new Response("Missing filename", { status: 400 });
     }
 
+    const headers = new Headers();
+    for (const name of FORWARDED_REQUEST_HEADERS) {
+        const value = request.headers.get(name);
+        if (value) headers.set(name, value);
+    }
+
     const response = await fetch(
-        `http://localhost:8000/api/campaign/video/${encodeURIComponent(filename)}`
+        `http://localhost:8000/api/campaign/video/${encodeURIComponent(filename)}`,
+        { headers }
     );
 
-    if (!response.ok) {
+    if (!response.ok && response.status !== 304) {
         const text = await response.text();
         throw new Response(text, { status: response.status });
     }
 
-    // Stream the video through Remix
-    return new Response(response.body, {
-        headers: {
-            "Content-Type": "video/mp4",
-            "Cache-Control": "public, max-age=31536000",
-        },
+    const responseHeaders = new Headers();
+    for (const name of FORWARDED_RESPONSE_HEADERS) {
+        const value = response.headers.get(name);
+        if (value) responseHeaders.set(name, value);
+    }
+
+    // Stream the video (or the requested range) through Remix
+    return new Response(response.status === 304 ? null : response.body, {
+        status: response.status,
+        headers: responseHeaders,
     });
 };
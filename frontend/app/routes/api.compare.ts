@@ -1,7 +1,9 @@
 import type { ActionFunctionArgs } from "@remix-run/node";
+import { authenticate } from "../shopify.server";
 
 export async function action({ request }: ActionFunctionArgs) {
-  const body = await request.json();
+  const { session } = await authenticate.admin(request);
+  const body = { ...(await request.json()), shop: session.shop };
   
   const response = await fetch("http://localhost:8000/api/compare/compare", {
     method: "POST",
@@ -12,5 +14,5 @@ export async function action({ request }: ActionFunctionArgs) {
   });
   
   const data = await response.json();
-  return Response.json(data);
+  return Response.json(data, { status: response.status });
 }
\ No newline at end of file
@@ -0,0 +1,23 @@
+import type { ActionFunctionArgs } from "@remix-run/node";
+import { authenticate } from "../shopify.server";
+
+export const action = async ({ request }: ActionFunctionArgs) => {
+    // Keep the raw body so the backend can verify the HMAC itself
+    const rawBody = await request.clone().text();
+    const { topic, shop } = await authenticate.webhook(request);
+    console.log(`Received ${topic} webhook for ${shop}`);
+
+    // Marks the shop's catalog fingerprint stale; the manifesto is rechecked on next request
+    await fetch("http://localhost:8000/api/manifesto/webhooks/products", {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json",
+            "X-Shopify-Topic": request.headers.get("X-Shopify-Topic") ?? "",
+            "X-Shopify-Shop-Domain": request.headers.get("X-Shopify-Shop-Domain") ?? shop,
+            "X-Shopify-Hmac-Sha256": request.headers.get("X-Shopify-Hmac-Sha256") ?? "",
+        },
+        body: rawBody,
+    });
+
+    return new Response();
+};